@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app import cache
+from app.metrics import ADMISSION_CONCURRENCY_LIMIT, RATE_LIMIT_DECISIONS
+
+
+class TokenBucket:
+    """Локальный token bucket: rate токенов в секунду, не больше burst"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now: Optional[float] = None) -> float:
+        """0, если токен взят, иначе через сколько секунд он появится"""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _ClientState:
+    __slots__ = ("lease", "lease_expires_at", "denied_until", "bucket", "refill")
+
+    def __init__(self):
+        self.lease = 0            # токены, заранее взятые из общего bucket в Redis
+        self.lease_expires_at = 0.0
+        self.denied_until = 0.0   # до этого момента общий bucket клиента пуст
+        self.bucket: Optional[TokenBucket] = None
+        self.refill: Optional[asyncio.Future] = None  # идущий запрос аренды в Redis
+
+
+class RateLimiter:
+    """Ограничение частоты запросов клиента: token bucket в Redis с локальной арендой
+
+    Общий для всех реплик bucket клиента хранится в Redis, но токены берутся
+    из него пачками по lease штук: следующие запросы клиента решаются локально
+    без обращения к Redis. Одновременные запросы клиента ждут одну аренду, а не
+    идут в Redis каждый. Пустой bucket тоже запоминается локально до момента
+    пополнения. Неизрасходованная аренда сгорает через lease_ttl секунд, поэтому
+    превышение лимита не больше lease токенов на воркер. Без Redis каждый воркер
+    считает свой локальный bucket.
+    """
+
+    def __init__(self, rate: float, burst: float, lease: int, lease_ttl: float, max_clients: int):
+        self.rate = rate
+        self.burst = burst
+        self.lease = max(1, min(lease, int(burst)))
+        self.lease_ttl = lease_ttl
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[str, _ClientState]" = OrderedDict()
+
+    def _state(self, client_id: str) -> _ClientState:
+        state = self._clients.get(client_id)
+        if state is None:
+            state = self._clients[client_id] = _ClientState()
+            if len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client_id)
+        return state
+
+    async def check(self, client_id: str) -> Tuple[bool, float]:
+        """(разрешён ли запрос, через сколько секунд повторить)"""
+        state = self._state(client_id)
+        while True:
+            now = time.monotonic()
+            if state.denied_until > now:
+                RATE_LIMIT_DECISIONS.labels(source="local").inc()
+                return False, state.denied_until - now
+            if state.lease > 0 and state.lease_expires_at > now:
+                state.lease -= 1
+                RATE_LIMIT_DECISIONS.labels(source="local").inc()
+                return True, 0.0
+            if state.refill is None:
+                break
+            await asyncio.shield(state.refill)
+
+        state.refill = asyncio.get_running_loop().create_future()
+        try:
+            result = await cache.take_tokens(self._redis_key(client_id), self.rate, self.burst, self.lease)
+        finally:
+            state.refill.set_result(None)
+            state.refill = None
+        now = time.monotonic()
+        if result is None:
+            # Redis недоступен: решаем по локальному bucket воркера
+            if state.bucket is None:
+                state.bucket = TokenBucket(self.rate, self.burst)
+            retry_after = state.bucket.take(now)
+            RATE_LIMIT_DECISIONS.labels(source="local").inc()
+            return retry_after == 0, retry_after
+
+        RATE_LIMIT_DECISIONS.labels(source="redis").inc()
+        granted, remaining = result
+        if granted == 0:
+            retry_after = (1 - remaining) / self.rate
+            state.denied_until = now + retry_after
+            return False, retry_after
+        state.lease = granted - 1
+        state.lease_expires_at = now + self.lease_ttl
+        return True, 0.0
+
+    @staticmethod
+    def _redis_key(client_id: str) -> str:
+        # API-ключи не попадают в Redis в открытом виде
+        return f"ratelimit:{hashlib.sha1(client_id.encode()).hexdigest()[:20]}"
+
+
+class AdaptiveConcurrencyLimit:
+    """Предел одновременных запросов воркера по схеме AIMD
+
+    Пока задержка ответов (короткое скользящее среднее) не превышает базовую
+    (длинное среднее) больше чем в tolerance раз, предел растёт примерно на
+    единицу за каждые limit завершённых запросов — но только если он реально
+    используется хотя бы наполовину. При росте задержки предел умножается на
+    backoff, не чаще раза за текущую задержку. Запросы сверх предела не ждут в
+    очереди, а сразу отклоняются.
+    """
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int,
+                 tolerance: float = 2.0, backoff: float = 0.9):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.limit = float(max(min_limit, min(max_limit, initial)))
+        self.inflight = 0
+        self.rejected = 0
+        self._short_latency: Optional[float] = None
+        self._long_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        ADMISSION_CONCURRENCY_LIMIT.set(self.current_limit)
+
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+
+    def try_acquire(self) -> bool:
+        if self.inflight >= self.current_limit:
+            self.rejected += 1
+            return False
+        self.inflight += 1
+        return True
+
+    def release(self, latency: Optional[float]):
+        """Завершение запроса; latency None — запрос прерван, задержка неизвестна"""
+        inflight = self.inflight
+        self.inflight -= 1
+        if latency is None:
+            return
+        if self._long_latency is None:
+            self._short_latency = self._long_latency = latency
+        else:
+            self._short_latency += (latency - self._short_latency) * 0.1
+            self._long_latency += (latency - self._long_latency) * 0.002
+
+        previous = self.current_limit
+        now = time.monotonic()
+        if self._short_latency > self._long_latency * self.tolerance:
+            if now - self._last_decrease >= self._short_latency:
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif inflight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        if self.current_limit != previous:
+            ADMISSION_CONCURRENCY_LIMIT.set(self.current_limit)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.current_limit,
+            "inflight": self.inflight,
+            "rejected": self.rejected,
+            "latency_short_ms": round(self._short_latency * 1000, 2) if self._short_latency is not None else None,
+            "latency_long_ms": round(self._long_latency * 1000, 2) if self._long_latency is not None else None,
+        }
+
+
+def retry_after_header(seconds: float) -> str:
+    """Retry-After в целых секундах, не меньше одной"""
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,174 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from app import config, tracing
+from app.batching import BatchLoader, BatchLoadError
+from app.metrics import AGGREGATION_STAGE_TIME
+from app.products import get_products
+from app.upstream import fetch_service
+
+
+class StageTimer:
+    """Замеры этапов агрегации: смещение начала и длительность относительно старта
+
+    Каждый этап — также span трассы запроса (aggregate.<этап>).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            with tracing.span(f"aggregate.{stage}"):
+                yield
+        finally:
+            duration = time.perf_counter() - start
+            AGGREGATION_STAGE_TIME.labels(stage=stage).observe(duration)
+            self.spans[stage] = {
+                "start_ms": round((start - self.started) * 1000, 2),
+                "duration_ms": round(duration * 1000, 2)
+            }
+
+
+async def _fetch_users_batch(user_ids: list) -> Optional[Dict[str, dict]]:
+    users = await fetch_service(
+        "user_service",
+        f"{config.USER_SERVICE_URL}/users/batch",
+        method="POST",
+        json={"user_ids": user_ids},
+        hedge=True
+    )
+    if users is None:
+        return None
+    return {user["id"]: user for user in users}
+
+
+async def _fetch_orders_batch(user_ids: list) -> Optional[Dict[str, list]]:
+    return await fetch_service(
+        "order_service",
+        f"{config.ORDER_SERVICE_URL}/orders/batch-by-user",
+        method="POST",
+        json={"user_ids": user_ids},
+        hedge=True
+    )
+
+
+# Запросы одновременно собираемых профилей объединяются в один batch на микросервис
+user_loader = BatchLoader(
+    "user_service",
+    _fetch_users_batch,
+    window=config.USER_BATCH_WINDOW_MS / 1000,
+    max_batch_size=config.USER_BATCH_MAX_SIZE,
+)
+orders_loader = BatchLoader(
+    "order_service",
+    _fetch_orders_batch,
+    window=config.ORDER_BATCH_WINDOW_MS / 1000,
+    max_batch_size=config.ORDER_BATCH_MAX_SIZE,
+)
+
+
+async def fetch_user(user_id: str) -> Optional[dict]:
+    """Пользователь через batch-загрузчик или отдельным запросом
+
+    None — user-service ответил, что пользователя нет; при ошибке запроса —
+    BatchLoadError, чтобы сбой не выглядел как удалённый пользователь.
+    """
+    if not config.UPSTREAM_BATCHING_ENABLED:
+        # Пакет из одного id: отсутствие пользователя отличается от ошибки, в отличие от GET /users/{id}
+        users = await _fetch_users_batch([user_id])
+        if users is None:
+            raise BatchLoadError("user_service")
+        return users.get(user_id)
+    return await user_loader.load(user_id)
+
+
+async def fetch_orders(user_id: str) -> Optional[list]:
+    """Заказы пользователя через batch-загрузчик или отдельным запросом; None при ошибке"""
+    if not config.UPSTREAM_BATCHING_ENABLED:
+        return await fetch_service(
+            "order_service", f"{config.ORDER_SERVICE_URL}/orders/user/{user_id}", hedge=True
+        )
+    try:
+        orders = await orders_loader.load(user_id)
+    except BatchLoadError:
+        return None
+    return orders if orders is not None else []
+
+
+def extract_product_ids(orders: list) -> list:
+    """ID товаров из заказов без повторов, в порядке появления"""
+    product_ids = {}
+    for order in orders:
+        for item in order.get("items", []):
+            product_id = item.get("product_id")
+            if product_id is not None:
+                product_ids[product_id] = None
+    return list(product_ids)
+
+
+async def collect_profile(user_id: str) -> dict:
+    """Сбор данных профиля конвейером
+
+    Пользователь и заказы запрашиваются параллельно; товары запрашиваются, как
+    только пришли заказы, не дожидаясь ответа user-service.
+    """
+    timer = StageTimer()
+
+    user_error = False
+
+    async def load_user():
+        nonlocal user_error
+        with timer.span("user"):
+            try:
+                return await fetch_user(user_id)
+            except BatchLoadError:
+                user_error = True
+                return None
+
+    async def load_orders_and_products():
+        with timer.span("orders"):
+            orders = await fetch_orders(user_id)
+        if not orders:
+            return orders, {}, True
+        with timer.span("product_ids"):
+            product_ids = extract_product_ids(orders)
+        if not product_ids:
+            return orders, {}, True
+        with timer.span("products"):
+            products, products_ok = await get_products(product_ids)
+        return orders, products, products_ok
+
+    user_task = asyncio.ensure_future(load_user())
+    orders_task = asyncio.ensure_future(load_orders_and_products())
+    try:
+        user_data = await user_task
+        if not user_data:
+            # Без пользователя профиль не нужен — заказы и товары больше не ждём
+            orders_task.cancel()
+            return {"user": None, "user_error": user_error, "spans": timer.spans}
+        orders_data, products_data, products_ok = await orders_task
+    finally:
+        for task in (user_task, orders_task):
+            if not task.done():
+                task.cancel()
+
+    # Недоступные сервисы: профиль отдаётся без их данных (деградированный режим)
+    degraded_services = []
+    if orders_data is None:
+        degraded_services.append("order_service")
+    if not products_ok:
+        degraded_services.append("product_service")
+
+    return {
+        "user": user_data,
+        "orders": orders_data or [],
+        "products": products_data,
+        "degraded_services": degraded_services,
+        "spans": timer.spans
+    }
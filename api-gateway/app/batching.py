@@ -0,0 +1,103 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional
+
+import structlog
+
+from app import tracing
+from app.metrics import BATCH_SIZE, BATCH_WAIT
+
+logger = structlog.get_logger()
+
+
+class BatchLoadError(Exception):
+    """Пакетный запрос к микросервису не удался"""
+
+
+class BatchLoader:
+    """Микро-батчинг в стиле DataLoader
+
+    Ключи, запрошенные одновременными запросами, собираются в течение окна
+    window секунд (или до max_batch_size ключей) и загружаются одним вызовом
+    batch_fn. Повторный запрос ключа, который уже ждёт загрузки, получает тот же
+    future. batch_fn возвращает словарь ключ → значение (отсутствующие ключи
+    получают None) или None при ошибке.
+
+    Пакетный запрос — span в трассе запроса, открывшего окно, со ссылками
+    (links) на спаны остальных запросов пакета.
+    """
+
+    def __init__(self, name: str, batch_fn: Callable[[list], Awaitable[Optional[Dict[Hashable, Any]]]],
+                 window: float, max_batch_size: int):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._queue: Dict[Hashable, asyncio.Future] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._window_started = 0.0
+        self._waiters: list = []
+
+    async def load(self, key: Hashable) -> Any:
+        # Future общий для всех, кто ждёт ключ: отмена одного вызывающего не должна его отменять
+        return await asyncio.shield(self._future_for(key))
+
+    async def load_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        keys = list(dict.fromkeys(keys))
+        values = await asyncio.gather(*(asyncio.shield(self._future_for(key)) for key in keys))
+        return dict(zip(keys, values))
+
+    def _future_for(self, key: Hashable) -> asyncio.Future:
+        future = self._queue.get(key) or self._inflight.get(key)
+        if future is not None:
+            return future
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._queue:
+            self._window_started = time.perf_counter()
+        self._queue[key] = future
+        waiter = tracing.current_span()
+        if waiter is not None and waiter.trace.recording and waiter not in self._waiters:
+            self._waiters.append(waiter)
+        if len(self._queue) >= self.max_batch_size:
+            self._schedule_flush(0)
+        elif self._flush_handle is None:
+            self._schedule_flush(self.window)
+        return future
+
+    def _schedule_flush(self, delay: float):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._flush_handle = loop.call_later(delay, self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        batch, self._queue = self._queue, {}
+        waiters, self._waiters = self._waiters, []
+        if batch:
+            BATCH_WAIT.labels(loader=self.name).observe(time.perf_counter() - self._window_started)
+            self._inflight.update(batch)
+            asyncio.ensure_future(self._dispatch(batch, waiters))
+
+    async def _dispatch(self, batch: Dict[Hashable, asyncio.Future], waiters: list = ()):
+        BATCH_SIZE.labels(loader=self.name).observe(len(batch))
+        try:
+            with tracing.span(f"batch {self.name}", links=waiters, **{"batch.size": len(batch)}):
+                results = await self.batch_fn(list(batch))
+            error = None if results is not None else BatchLoadError(self.name)
+        except Exception as e:
+            logger.error("batch_load_error", loader=self.name, error=str(e))
+            results, error = None, BatchLoadError(str(e))
+        for key, future in batch.items():
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+                # Исключение получат ожидающие; помечаем его, чтобы asyncio не ругался
+                future.exception()
+            else:
+                future.set_result(results.get(key))
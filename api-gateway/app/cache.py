@@ -0,0 +1,856 @@
+import asyncio
+import math
+import random
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+import redis.asyncio as aioredis
+import structlog
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app import config
+from app.codec import get_codec, json_dumps, json_loads
+from app.local_cache import LocalCache
+from app.metrics import (
+    CACHE_BACKEND_REDIS, CACHE_BACKEND_SWITCHES, CACHE_HITS, CACHE_MISSES, SERVICE_ERRORS
+)
+
+logger = structlog.get_logger()
+
+# Состояние кэша заполняется в init_cache() при запуске приложения
+redis_client: Optional[aioredis.Redis] = None
+USE_REDIS = False
+
+# Кодек значений в Redis (CACHE_CODEC)
+codec = get_codec(config.CACHE_CODEC)
+
+# L1: записи, прочитанные из Redis (L2), в памяти процесса
+l1_cache = LocalCache(
+    max_entries=config.L1_CACHE_MAX_ENTRIES,
+    max_bytes=config.L1_CACHE_MAX_BYTES,
+    default_ttl=config.L1_CACHE_TTL,
+    name="l1",
+)
+
+# Кэш вместо Redis, пока тот недоступен: ограничен по записям и байтам, как и L1
+fallback_cache = LocalCache(
+    max_entries=config.FALLBACK_CACHE_MAX_ENTRIES,
+    max_bytes=config.FALLBACK_CACHE_MAX_BYTES,
+    default_ttl=config.FALLBACK_CACHE_MAX_TTL,
+    name="fallback",
+)
+
+
+class CacheCounters:
+    """Счётчики кэша в этом процессе: статистика без обращений к Redis"""
+
+    def __init__(self):
+        self.lookups = 0
+        self.hits = {"l1": 0, "l2": 0}
+        self.writes = 0
+        self.bytes_written = 0
+        self.invalidations = 0
+        self.decode_errors = 0
+
+    def hit(self, tier: str, count: int = 1):
+        self.hits[tier] += count
+
+    def hit_ratio(self) -> float:
+        return sum(self.hits.values()) / self.lookups if self.lookups else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "hits": dict(self.hits),
+            "misses": self.lookups - sum(self.hits.values()),
+            "hit_ratio": round(self.hit_ratio(), 4),
+            "writes": self.writes,
+            "bytes_written": self.bytes_written,
+            "invalidations": self.invalidations,
+            "decode_errors": self.decode_errors
+        }
+
+
+# Счётчики ключей get_cache_entry / set_cache (профили)
+counters = CacheCounters()
+
+# Последний результат подсчёта ключей через SCAN и задача, которая его обновляет
+_scan_result: Optional[dict] = None
+_scan_task: Optional[asyncio.Task] = None
+
+# Идентификатор реплики, чтобы не обрабатывать собственные сообщения инвалидации
+INSTANCE_ID = uuid.uuid4().hex
+_invalidation_task: Optional[asyncio.Task] = None
+_sweeper_task: Optional[asyncio.Task] = None
+_watch_task: Optional[asyncio.Task] = None
+
+# Состояние переключения между Redis и in-memory кэшем
+backend_state = {
+    "backend": None,
+    "since": None,
+    "switches": 0,
+    "last_switch": None,
+    "consecutive_failures": 0,
+    "pool_exhausted": 0,
+    "short_circuited": 0,
+    "reconnect_attempts": 0,
+    "next_reconnect_at": None,
+}
+
+
+class RedisPoolExhausted(RedisConnectionError):
+    """Все соединения пула заняты дольше REDIS_POOL_TIMEOUT — перегрузка шлюза, а не отказ Redis"""
+
+
+class _WaitingConnectionPool(aioredis.BlockingConnectionPool):
+    """Блокирующий пул, который отличает нехватку соединений от недоступного Redis
+
+    В redis-py BlockingConnectionPool соединяется с Redis под своей блокировкой
+    и в пределах того же таймаута ожидания, поэтому недоступный Redis выглядит
+    как ConnectionError("No connection available."), а команды выстраиваются
+    в очередь за одним зависшим подключением. Здесь под блокировкой только
+    ожидание свободного места; RedisPoolExhausted поднимается, лишь когда все
+    max_connections соединений выданы, а ошибки подключения идут как есть.
+    """
+
+    async def get_connection(self, command_name, *keys, **options):
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with self._condition:
+                    await self._condition.wait_for(self.can_get_connection)
+                    try:
+                        connection = self._available_connections.pop()
+                    except IndexError:
+                        connection = self.make_connection()
+                    self._in_use_connections.add(connection)
+        except TimeoutError as err:
+            raise RedisPoolExhausted("No connection available.") from err
+        try:
+            await self.ensure_connection(connection)
+        except BaseException:
+            await self.release(connection)
+            raise
+        return connection
+
+
+def _l1_enabled() -> bool:
+    return USE_REDIS and config.L1_CACHE_ENABLED
+
+
+async def init_cache():
+    """Подключение к Redis и запуск фонового контроля его доступности
+
+    Если Redis ещё не поднялся, шлюз стартует на in-memory кэше и переключится
+    на Redis, когда тот ответит.
+    """
+    global redis_client, _sweeper_task, _watch_task
+    _sweeper_task = asyncio.create_task(_sweep_expired())
+    # Блокирующий пул: при всплеске команда ждёт свободное соединение,
+    # а не получает "Too many connections" и не переключает кэш на память
+    pool = _WaitingConnectionPool(
+        host=config.REDIS_HOST,
+        port=config.REDIS_PORT,
+        db=config.REDIS_DB,
+        password=config.REDIS_PASSWORD,
+        decode_responses=False,
+        max_connections=config.REDIS_MAX_CONNECTIONS,
+        timeout=config.REDIS_POOL_TIMEOUT,
+        socket_connect_timeout=config.REDIS_CONNECT_TIMEOUT,
+        socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+        retry_on_timeout=True,
+    )
+    redis_client = aioredis.Redis.from_pool(pool)
+    if await _redis_healthy():
+        _switch_backend(True, "startup")
+    else:
+        print("  Redis не доступен, использую in-memory кэш")
+        _switch_backend(False, "startup")
+    _watch_task = asyncio.create_task(_watch_redis())
+
+
+async def close_cache():
+    """Остановка фоновых задач и закрытие пула соединений Redis"""
+    global redis_client, USE_REDIS, _invalidation_task, _scan_task, _sweeper_task, _watch_task
+    for task in (_watch_task, _invalidation_task, _scan_task, _sweeper_task):
+        if task is None:
+            continue
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _watch_task = None
+    _invalidation_task = None
+    _scan_task = None
+    _sweeper_task = None
+    USE_REDIS = False
+    if redis_client is not None:
+        try:
+            await redis_client.aclose()
+        except Exception:
+            pass
+        redis_client = None
+    l1_cache.clear()
+    fallback_cache.clear()
+
+
+async def _redis_healthy() -> bool:
+    try:
+        return bool(await asyncio.wait_for(redis_client.ping(), config.REDIS_SOCKET_TIMEOUT))
+    except Exception:
+        return False
+
+
+def _switch_backend(use_redis: bool, reason: str):
+    """Переключение между Redis и in-memory кэшем во время работы"""
+    global USE_REDIS, _invalidation_task
+    previous = backend_state["backend"]
+    backend = "redis" if use_redis else "memory"
+    USE_REDIS = use_redis
+    backend_state.update(backend=backend, since=time.time(), consecutive_failures=0)
+    CACHE_BACKEND_REDIS.set(1 if use_redis else 0)
+    if previous is None:
+        logger.info("cache_backend_selected", backend=backend, reason=reason)
+        if use_redis:
+            logger.info("redis_connected", status="success")
+    else:
+        backend_state["switches"] += 1
+        backend_state["last_switch"] = {"to": backend, "at": backend_state["since"], "reason": reason}
+        CACHE_BACKEND_SWITCHES.labels(to=backend).inc()
+        logger.warning("cache_backend_switched", to=backend, reason=reason)
+    # Содержимое L1 и in-memory кэша могло устареть, пока работал другой бэкенд
+    l1_cache.clear()
+    fallback_cache.clear()
+    if _invalidation_task is not None:
+        _invalidation_task.cancel()
+        _invalidation_task = None
+    if use_redis and config.L1_CACHE_ENABLED:
+        _invalidation_task = asyncio.create_task(_listen_invalidations())
+
+
+# Пока Redis под подозрением (ошибки подряд после последнего успеха), к нему идёт
+# не больше одной команды-пробы за раз и не чаще раза в REDIS_CONNECT_TIMEOUT секунд;
+# до _probe_until остальные команды обходятся без Redis и не ждут таймаутов
+_probe_until = 0.0
+
+
+def _redis_ready() -> bool:
+    """Можно ли сейчас обращаться к Redis на пути запроса
+
+    После ошибки запрос не платит таймаут на каждой операции: пока проба не
+    ответила (но не дольше REDIS_SOCKET_TIMEOUT) и после неудачной пробы,
+    операции сразу обходятся без Redis — промах, пропуск записи, своя
+    блокировка. Ошибки проб доводят счёт до REDIS_FAILURE_THRESHOLD.
+    """
+    global _probe_until
+    if not USE_REDIS:
+        return False
+    if backend_state["consecutive_failures"] == 0:
+        return True
+    now = time.monotonic()
+    if now < _probe_until:
+        backend_state["short_circuited"] += 1
+        return False
+    _probe_until = now + config.REDIS_SOCKET_TIMEOUT
+    return True
+
+
+def _record_redis_success():
+    """Успешная команда: отсчёт ошибок подряд начинается заново"""
+    global _probe_until
+    backend_state["consecutive_failures"] = 0
+    _probe_until = 0.0
+
+
+def _record_redis_failure(error: Optional[BaseException] = None, reason: str = "request_errors"):
+    """Ошибка обращения к Redis; после нескольких подряд — сразу на in-memory кэш
+
+    Нехватка соединений в пуле — перегрузка шлюза, а не отказ Redis: она не
+    считается, доступность Redis в этом случае проверяет фоновый ping.
+    """
+    global _probe_until
+    if isinstance(error, RedisPoolExhausted):
+        backend_state["pool_exhausted"] += 1
+        return
+    backend_state["consecutive_failures"] += 1
+    _probe_until = time.monotonic() + config.REDIS_CONNECT_TIMEOUT
+    if USE_REDIS and backend_state["consecutive_failures"] >= config.REDIS_FAILURE_THRESHOLD:
+        _switch_backend(False, reason)
+
+
+async def _watch_redis():
+    """Проверка Redis в фоне: переход на in-memory кэш и возврат на Redis
+
+    Пока Redis работает, он проверяется каждые REDIS_HEALTH_CHECK_INTERVAL
+    секунд. После отказа переподключение пробуется с экспоненциальной
+    задержкой от REDIS_RECONNECT_MIN_BACKOFF до REDIS_RECONNECT_MAX_BACKOFF.
+    """
+    backoff = config.REDIS_RECONNECT_MIN_BACKOFF
+    while True:
+        if USE_REDIS:
+            await asyncio.sleep(config.REDIS_HEALTH_CHECK_INTERVAL)
+            if not USE_REDIS:
+                continue
+            if await _redis_healthy():
+                backend_state["consecutive_failures"] = 0
+                continue
+            _record_redis_failure(reason="health_check_failed")
+            backoff = config.REDIS_RECONNECT_MIN_BACKOFF
+        else:
+            # Случайный разброс, чтобы реплики не переподключались одновременно
+            delay = backoff * random.uniform(0.5, 1.0)
+            backend_state["next_reconnect_at"] = time.time() + delay
+            await asyncio.sleep(delay)
+            backend_state["reconnect_attempts"] += 1
+            if await _redis_healthy():
+                backend_state["next_reconnect_at"] = None
+                backoff = config.REDIS_RECONNECT_MIN_BACKOFF
+                _switch_backend(True, "reconnected")
+            else:
+                backoff = min(backoff * 2, config.REDIS_RECONNECT_MAX_BACKOFF)
+
+
+def get_backend_state() -> dict:
+    """Текущий бэкенд кэша и история переключений для /health и /api/cache/stats"""
+    return {**backend_state, "redis_configured": f"{config.REDIS_HOST}:{config.REDIS_PORT}"}
+
+
+async def _sweep_expired():
+    """Периодическое удаление просроченных записей, к которым больше не обращаются"""
+    while True:
+        await asyncio.sleep(config.CACHE_SWEEP_INTERVAL)
+        for local_cache in (l1_cache, fallback_cache):
+            try:
+                removed = local_cache.sweep()
+            except Exception as e:
+                logger.error("cache_sweep_error", cache=local_cache.name, error=str(e))
+                continue
+            if removed:
+                logger.debug("cache_swept", cache=local_cache.name, removed=removed)
+
+
+async def _listen_invalidations():
+    """Сброс L1 по сообщениям других реплик шлюза (Redis pub/sub)"""
+    while True:
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(config.CACHE_INVALIDATION_CHANNEL)
+            while True:
+                message = await pubsub.get_message(timeout=1.0)
+                if message is None:
+                    continue
+                origin, _, key = message["data"].decode("utf-8").partition(" ")
+                if origin != INSTANCE_ID:
+                    l1_cache.delete(key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("cache_invalidation_listener_error", error=str(e))
+            # Пока подписка не работает, чужие изменения могли пройти мимо
+            l1_cache.clear()
+            await asyncio.sleep(1.0)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+
+async def _publish_invalidation(key: str):
+    try:
+        await redis_client.publish(config.CACHE_INVALIDATION_CHANNEL, f"{INSTANCE_ID} {key}")
+    except Exception as e:
+        logger.error("cache_invalidation_publish_error", key=key, error=str(e))
+
+
+_UNSET = object()
+
+
+class CacheEntry:
+    """Значение кэша с мягким сроком свежести; жёсткий срок задаёт TTL хранилища
+
+    Значение хранится закодированным (body) и декодируется только при первом
+    обращении к value, поэтому попадание можно отдать клиенту готовыми байтами.
+    Вместе со значением хранятся его ETag и сжатые варианты JSON-тела
+    (кодировка → байты), посчитанные один раз при записи.
+    """
+
+    __slots__ = ("_value", "_body", "soft_expires_at", "delta", "etag", "variants")
+
+    def __init__(self, value: Any, soft_expires_at: float, delta: float = 0.0,
+                 etag: Optional[str] = None, variants: Optional[Dict[str, bytes]] = None):
+        self._value = value
+        self._body: Optional[bytes] = None
+        self.soft_expires_at = soft_expires_at
+        self.delta = delta  # сколько секунд заняла сборка значения
+        self.etag = etag
+        self.variants = variants or {}
+
+    @classmethod
+    def create(cls, value: Any, ttl: float, soft_ttl: Optional[float] = None, delta: float = 0.0) -> "CacheEntry":
+        """Новая запись: свежая soft_ttl секунд (по умолчанию ttl), но не дольше ttl"""
+        return cls(value, time.time() + (ttl if soft_ttl is None else min(soft_ttl, ttl)), delta)
+
+    @classmethod
+    def from_body(cls, body: bytes, soft_expires_at: float, delta: float = 0.0,
+                  etag: Optional[str] = None, variants: Optional[Dict[str, bytes]] = None) -> "CacheEntry":
+        entry = cls(_UNSET, soft_expires_at, delta, etag, variants)
+        entry._body = body
+        return entry
+
+    @property
+    def value(self) -> Any:
+        if self._value is _UNSET:
+            self._value = codec.loads(self._body)
+        return self._value
+
+    @property
+    def body(self) -> bytes:
+        """Значение, закодированное кодеком кэша"""
+        if self._body is None:
+            self._body = codec.dumps(self._value)
+        return self._body
+
+    def json_body(self) -> bytes:
+        """Значение в JSON; для JSON-кодеков — без повторного кодирования"""
+        return self.body if codec.is_json else json_dumps(self.value)
+
+    def size(self) -> int:
+        """Байты значения вместе со сжатыми вариантами"""
+        return len(self.body) + sum(len(data) for data in self.variants.values())
+
+    def is_stale(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) >= self.soft_expires_at
+
+    def should_refresh_early(self, beta: float, now: Optional[float] = None) -> bool:
+        """Вероятностное досрочное обновление (XFetch): чем ближе срок, тем вероятнее"""
+        if beta <= 0 or self.delta <= 0:
+            return False
+        now = now or time.time()
+        return now - self.delta * beta * math.log(1.0 - random.random()) >= self.soft_expires_at
+
+    def dumps(self) -> bytes:
+        # Короткий JSON-заголовок строкой, затем значение и сжатые варианты подряд:
+        # при чтении декодируется только заголовок, а байты нарезаются по длинам из него
+        meta = {
+            "codec": codec.name,
+            "soft_expires_at": self.soft_expires_at,
+            "delta": self.delta
+        }
+        if self.etag:
+            meta["etag"] = self.etag
+        if self.variants:
+            meta["variants"] = {encoding: len(data) for encoding, data in self.variants.items()}
+        return b"".join((json_dumps(meta), b"\n", self.body, *self.variants.values()))
+
+    @classmethod
+    def loads(cls, data: bytes) -> "CacheEntry":
+        header, separator, payload = data.partition(b"\n")
+        if not separator:
+            raise ValueError("Неизвестный формат записи кэша")
+        meta = json_loads(header)
+        if meta.get("codec") != codec.name:
+            # Запись другого кодека (после смены CACHE_CODEC) считаем промахом
+            raise ValueError(f"Запись закодирована кодеком {meta.get('codec')}")
+        lengths = meta.get("variants", {})
+        offset = len(payload) - sum(lengths.values())
+        if offset < 0:
+            raise ValueError("Запись кэша обрезана")
+        body, variants = payload[:offset], {}
+        for encoding, length in lengths.items():
+            variants[encoding] = payload[offset:offset + length]
+            offset += length
+        return cls.from_body(body, meta["soft_expires_at"], meta.get("delta", 0.0), meta.get("etag"), variants)
+
+
+def _decode_entry(key: str, data: bytes) -> Optional[CacheEntry]:
+    try:
+        return CacheEntry.loads(data)
+    except (ValueError, KeyError) as e:
+        counters.decode_errors += 1
+        logger.warning("cache_decode_error", key=key, error=str(e))
+        return None
+
+
+async def get_cache_entry(key: str) -> Optional[CacheEntry]:
+    """Получение записи из кэша: сначала L1 в памяти процесса, затем Redis"""
+    counters.lookups += 1
+    if USE_REDIS:
+        if _l1_enabled():
+            entry = l1_cache.get(key)
+            if entry is not None:
+                CACHE_HITS.labels(cache_type='memory', tier='l1').inc()
+                counters.hit("l1")
+                return entry
+            CACHE_MISSES.labels(cache_type='memory', tier='l1').inc()
+        if not _redis_ready():
+            return None
+        try:
+            start_time = time.time()
+            async with redis_client.pipeline(transaction=False) as pipe:
+                data, ttl_ms = await pipe.get(key).pttl(key).execute()
+            redis_latency = time.time() - start_time
+            _record_redis_success()
+
+            if redis_latency > 0.1:  # Логируем медленные запросы
+                logger.warning("redis_slow_query", key=key, latency=redis_latency)
+
+            entry = _decode_entry(key, data) if data else None
+            if entry is not None:
+                CACHE_HITS.labels(cache_type='redis', tier='l2').inc()
+                counters.hit("l2")
+                if _l1_enabled() and ttl_ms > 0:
+                    # Запись в L1 живёт не дольше, чем в Redis
+                    l1_cache.set(key, entry, size=len(data), ttl=ttl_ms / 1000)
+                return entry
+            CACHE_MISSES.labels(cache_type='redis', tier='l2').inc()
+        except Exception as e:
+            logger.error("redis_get_error", key=key, error=str(e))
+            SERVICE_ERRORS.labels(service_name='redis').inc()
+            _record_redis_failure(e)
+            return None
+    else:
+        entry = fallback_cache.get(key)
+        if entry is not None:
+            CACHE_HITS.labels(cache_type='memory', tier='l2').inc()
+            counters.hit("l2")
+            return entry
+        CACHE_MISSES.labels(cache_type='memory', tier='l2').inc()
+    return None
+
+
+async def get_cache(key: str):
+    """Получение данных из кэша"""
+    entry = await get_cache_entry(key)
+    return entry.value if entry is not None else None
+
+
+async def set_cache(key: str, value: dict, ttl: int = 30,
+                    soft_ttl: Optional[float] = None, delta: float = 0.0):
+    """Сохранение данных в кэш
+
+    ttl — жёсткий срок хранения; soft_ttl — срок свежести, после которого
+    значение ещё отдаётся, но считается устаревшим (по умолчанию равен ttl).
+    """
+    await set_entry(key, CacheEntry.create(value, ttl, soft_ttl, delta), ttl)
+
+
+async def set_entry(key: str, entry: CacheEntry, ttl: int):
+    """Сохранение готовой записи (например, с ETag и сжатыми вариантами) на ttl секунд"""
+    if USE_REDIS:
+        if not _redis_ready():
+            return
+        try:
+            payload = entry.dumps()
+            await redis_client.setex(key, ttl, payload)
+            _record_redis_success()
+            counters.writes += 1
+            counters.bytes_written += len(payload)
+            if _l1_enabled():
+                l1_cache.set(key, entry, size=len(payload), ttl=ttl)
+                await _publish_invalidation(key)
+        except Exception as e:
+            logger.error("redis_set_error", key=key, error=str(e))
+            SERVICE_ERRORS.labels(service_name='redis').inc()
+            _record_redis_failure(e)
+    else:
+        # Размер записи — закодированное значение и сжатые варианты; они же понадобятся при отдаче попадания
+        size = entry.size()
+        fallback_cache.set(key, entry, size=size, ttl=ttl)
+        counters.writes += 1
+        counters.bytes_written += size
+
+
+async def get_many(keys: list) -> dict:
+    """Значения нескольких ключей из Redis одним MGET; без Redis — пустой словарь"""
+    if not keys or not _redis_ready():
+        return {}
+    try:
+        values = await redis_client.mget(keys)
+    except Exception as e:
+        logger.error("redis_mget_error", keys=len(keys), error=str(e))
+        SERVICE_ERRORS.labels(service_name='redis').inc()
+        _record_redis_failure(e)
+        return {}
+    _record_redis_success()
+    found = {}
+    for key, data in zip(keys, values):
+        if not data:
+            continue
+        try:
+            found[key] = codec.loads(data)
+        except ValueError as e:
+            logger.warning("cache_decode_error", key=key, error=str(e))
+    return found
+
+
+async def set_many(values: dict, ttl: int) -> int:
+    """Запись нескольких ключей в Redis одним pipeline; возвращает число записанных байт"""
+    if not values or not _redis_ready():
+        return 0
+    try:
+        written = 0
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                payload = codec.dumps(value)
+                written += len(payload)
+                pipe.setex(key, ttl, payload)
+            await pipe.execute()
+        _record_redis_success()
+        return written
+    except Exception as e:
+        logger.error("redis_mset_error", keys=len(values), error=str(e))
+        SERVICE_ERRORS.labels(service_name='redis').inc()
+        _record_redis_failure(e)
+        return 0
+
+
+async def invalidate(key: str):
+    """Удаление ключа из всех уровней кэша на всех репликах"""
+    counters.invalidations += 1
+    if USE_REDIS:
+        l1_cache.delete(key)
+        try:
+            await redis_client.delete(key)
+            _record_redis_success()
+            if config.L1_CACHE_ENABLED:
+                await _publish_invalidation(key)
+        except Exception as e:
+            logger.error("redis_delete_error", key=key, error=str(e))
+            SERVICE_ERRORS.labels(service_name='redis').inc()
+            _record_redis_failure(e)
+    else:
+        fallback_cache.delete(key)
+
+
+async def invalidate_many(keys: list, publish: bool = True):
+    """Удаление нескольких ключей из всех уровней кэша одним DEL
+
+    publish=False — не рассылать сброс L1 другим репликам, когда каждая из них
+    узнаёт об изменении сама (например, из потока событий).
+    """
+    if not keys:
+        return
+    counters.invalidations += len(keys)
+    if USE_REDIS:
+        for key in keys:
+            l1_cache.delete(key)
+        try:
+            await redis_client.delete(*keys)
+            _record_redis_success()
+            if publish and config.L1_CACHE_ENABLED:
+                for key in keys:
+                    await _publish_invalidation(key)
+        except Exception as e:
+            logger.error("redis_delete_error", keys=len(keys), error=str(e))
+            SERVICE_ERRORS.labels(service_name='redis').inc()
+            _record_redis_failure(e)
+    else:
+        for key in keys:
+            fallback_cache.delete(key)
+
+
+async def delete_keys(keys: list):
+    """Удаление ключей только из Redis (без L1 и счётчиков профилей)"""
+    if not USE_REDIS or not keys:
+        return
+    try:
+        await redis_client.delete(*keys)
+        _record_redis_success()
+    except Exception as e:
+        logger.error("redis_delete_error", keys=len(keys), error=str(e))
+        SERVICE_ERRORS.labels(service_name='redis').inc()
+        _record_redis_failure(e)
+
+
+async def index_add(index_keys: list, member: str, ttl: int):
+    """Добавление member в несколько множеств-индексов одним pipeline; TTL продлевается"""
+    if not index_keys or not _redis_ready():
+        return
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for index_key in index_keys:
+                pipe.sadd(index_key, member)
+                pipe.expire(index_key, ttl)
+            await pipe.execute()
+        _record_redis_success()
+    except Exception as e:
+        logger.error("redis_index_error", keys=len(index_keys), error=str(e))
+        SERVICE_ERRORS.labels(service_name='redis').inc()
+        _record_redis_failure(e)
+
+
+async def index_members(index_key: str) -> list:
+    """Элементы множества-индекса; без Redis или при ошибке — пустой список"""
+    if not USE_REDIS:
+        return []
+    try:
+        members = await redis_client.smembers(index_key)
+    except Exception as e:
+        logger.error("redis_index_error", key=index_key, error=str(e))
+        SERVICE_ERRORS.labels(service_name='redis').inc()
+        _record_redis_failure(e)
+        return []
+    _record_redis_success()
+    return [member.decode("utf-8") for member in members]
+
+
+# Снять блокировку можно только своим токеном
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+async def acquire_lock(key: str, ttl_ms: int) -> Optional[str]:
+    """Короткая блокировка в Redis; без Redis блокировка всегда своя"""
+    token = uuid.uuid4().hex
+    if not _redis_ready():
+        return token
+    try:
+        acquired = await redis_client.set(f"lock:{key}", token, nx=True, px=ttl_ms)
+        _record_redis_success()
+        return token if acquired else None
+    except Exception as e:
+        logger.error("redis_lock_error", key=key, error=str(e))
+        SERVICE_ERRORS.labels(service_name='redis').inc()
+        _record_redis_failure(e)
+        # Redis недоступен — лучше пересобрать ключ, чем ждать
+        return token
+
+
+async def release_lock(key: str, token: str):
+    """Снятие блокировки, если она всё ещё принадлежит нам"""
+    if not _redis_ready():
+        return
+    try:
+        await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, f"lock:{key}", token)
+    except Exception as e:
+        logger.error("redis_unlock_error", key=key, error=str(e))
+
+
+# Token bucket в Redis: пополнение по часам Redis (одинаковым для всех реплик),
+# выдача не больше ARGV[3] токенов за вызов; возвращает выданное и остаток
+_TAKE_TOKENS_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call("time")
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call("hmget", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+redis.call("hset", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("expire", KEYS[1], math.ceil(burst / rate) + 1)
+return {granted, tostring(tokens)}
+"""
+
+
+async def take_tokens(key: str, rate: float, burst: float, count: int) -> Optional[Tuple[int, float]]:
+    """Токены из общего для всех реплик bucket в Redis; None без Redis или при ошибке"""
+    if not _redis_ready():
+        return None
+    try:
+        granted, remaining = await redis_client.eval(_TAKE_TOKENS_SCRIPT, 1, key, rate, burst, count)
+    except Exception as e:
+        logger.error("redis_rate_limit_error", key=key, error=str(e))
+        SERVICE_ERRORS.labels(service_name='redis').inc()
+        _record_redis_failure(e)
+        return None
+    _record_redis_success()
+    return int(granted), float(remaining)
+
+
+async def wait_for_cache(key: str, timeout: float, interval: float) -> Optional[CacheEntry]:
+    """Ожидание, пока другая реплика положит свежую запись в кэш"""
+    if not USE_REDIS:
+        return None
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(interval)
+        if not _redis_ready():
+            return None
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                data, ttl_ms = await pipe.get(key).pttl(key).execute()
+        except Exception as e:
+            logger.error("redis_get_error", key=key, error=str(e))
+            return None
+        entry = _decode_entry(key, data) if data else None
+        if entry is not None:
+            if entry.is_stale():
+                # Устаревшая запись ещё лежит в Redis, ждём свежую
+                continue
+            if _l1_enabled() and ttl_ms > 0:
+                l1_cache.set(key, entry, size=len(data), ttl=ttl_ms / 1000)
+            return entry
+    return None
+
+
+async def _scan_profile_keys(prefix: str) -> dict:
+    """Подсчёт ключей с префиксом инкрементальным SCAN небольшими порциями
+
+    В отличие от KEYS не блокирует Redis на весь keyspace. После
+    CACHE_STATS_SCAN_MAX_KEYS просмотренных ключей подсчёт останавливается, а
+    число ключей оценивается по доле совпадений и DBSIZE.
+    """
+    started = time.time()
+    cursor, scanned, matched = 0, 0, 0
+    prefix_bytes = prefix.encode("utf-8")
+    while True:
+        cursor, keys = await redis_client.scan(cursor=cursor, count=config.CACHE_STATS_SCAN_BATCH)
+        scanned += len(keys)
+        matched += sum(1 for key in keys if key.startswith(prefix_bytes))
+        if cursor == 0 or scanned >= config.CACHE_STATS_SCAN_MAX_KEYS:
+            break
+        # Отдаём управление, чтобы подсчёт не занимал event loop
+        await asyncio.sleep(0)
+    exact = cursor == 0
+    if not exact and scanned:
+        matched = round(matched / scanned * await redis_client.dbsize())
+    return {
+        "keys": matched,
+        "exact": exact,
+        "scanned_keys": scanned,
+        "scanned_at": started,
+        "duration_ms": round((time.time() - started) * 1000, 2)
+    }
+
+
+def scan_stats(prefix: str = "profile:") -> Optional[dict]:
+    """Последний результат подсчёта ключей; устаревший пересчитывается в фоне
+
+    Возвращает None, пока первый подсчёт не завершён или SCAN выключен.
+    """
+    global _scan_task
+    if not (USE_REDIS and config.CACHE_STATS_SCAN_ENABLED):
+        return None
+    fresh = _scan_result is not None and time.time() - _scan_result["scanned_at"] < config.CACHE_STATS_SCAN_INTERVAL
+    if not fresh and (_scan_task is None or _scan_task.done()):
+        _scan_task = asyncio.create_task(_refresh_scan_stats(prefix))
+    return _scan_result
+
+
+async def _refresh_scan_stats(prefix: str):
+    global _scan_result
+    try:
+        _scan_result = await _scan_profile_keys(prefix)
+    except Exception as e:
+        logger.error("redis_scan_error", error=str(e))
+        SERVICE_ERRORS.labels(service_name='redis').inc()
+
+
+async def ping() -> bool:
+    """Проверка доступности Redis без блокировки event loop"""
+    if not USE_REDIS:
+        return False
+    try:
+        return bool(await redis_client.ping())
+    except Exception:
+        return False
@@ -0,0 +1,91 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson есть в requirements.txt
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def json_dumps(value: Any) -> bytes:
+    """Компактный JSON в байтах: orjson, если установлен"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class Codec(ABC):
+    """Сериализация значений кэша в байты и обратно"""
+
+    name = ""
+    # True — закодированное значение уже является JSON и его можно отдать клиенту как есть
+    is_json = False
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        """Значение в байты"""
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Any:
+        """Байты обратно в значение"""
+
+
+class StdlibJsonCodec(Codec):
+    name = "json"
+    is_json = True
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    name = "orjson"
+    is_json = True
+
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+    name = "msgpack"
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+_CODECS = {
+    "json": (StdlibJsonCodec, json),
+    "orjson": (OrjsonCodec, orjson),
+    "msgpack": (MsgpackCodec, msgpack),
+}
+
+
+def get_codec(name: str) -> Codec:
+    """Кодек по имени из настройки CACHE_CODEC"""
+    if name not in _CODECS:
+        raise ValueError(f"Неизвестный кодек кэша: {name}")
+    codec_class, module = _CODECS[name]
+    if module is None:
+        raise RuntimeError(f"Кодек {name} требует пакет {name}, он не установлен")
+    return codec_class()
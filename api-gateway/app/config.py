@@ -0,0 +1,191 @@
+import os
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Чтение булевого флага из переменной окружения"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+# Настройки сервисов
+USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://user-service:8001")
+ORDER_SERVICE_URL = os.getenv("ORDER_SERVICE_URL", "http://order-service:8002")
+PRODUCT_SERVICE_URL = os.getenv("PRODUCT_SERVICE_URL", "http://product-service:8003")
+
+# Пулы соединений к микросервисам
+UPSTREAM_TIMEOUT = _env_float("UPSTREAM_TIMEOUT", 5.0)
+UPSTREAM_MAX_CONNECTIONS = _env_int("UPSTREAM_MAX_CONNECTIONS", 100)
+UPSTREAM_MAX_KEEPALIVE = _env_int("UPSTREAM_MAX_KEEPALIVE", 20)
+UPSTREAM_KEEPALIVE_EXPIRY = _env_float("UPSTREAM_KEEPALIVE_EXPIRY", 30.0)
+UPSTREAM_HTTP2 = _env_bool("UPSTREAM_HTTP2", False)
+
+# Redis
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = _env_int("REDIS_PORT", 6379)
+REDIS_DB = _env_int("REDIS_DB", 0)
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "redispass123")
+# Пул соединений на воркер: больше CONCURRENCY_LIMIT_INITIAL плюс долгоживущие соединения
+# (подписка на инвалидацию L1, XREAD событий изменений, SCAN статистики). Когда свободных
+# нет, команда ждёт соединение до REDIS_POOL_TIMEOUT секунд, а не падает сразу
+REDIS_MAX_CONNECTIONS = _env_int("REDIS_MAX_CONNECTIONS", 128)
+REDIS_POOL_TIMEOUT = _env_float("REDIS_POOL_TIMEOUT", 1.0)
+# Подключение к Redis; меньше REDIS_POOL_TIMEOUT, чтобы недоступный Redis давал быстрый отказ
+REDIS_CONNECT_TIMEOUT = _env_float("REDIS_CONNECT_TIMEOUT", 0.5)
+REDIS_SOCKET_TIMEOUT = _env_float("REDIS_SOCKET_TIMEOUT", 2.0)
+# Контроль доступности Redis и переключение на in-memory кэш во время работы
+REDIS_HEALTH_CHECK_INTERVAL = _env_float("REDIS_HEALTH_CHECK_INTERVAL", 2.0)
+REDIS_FAILURE_THRESHOLD = _env_int("REDIS_FAILURE_THRESHOLD", 3)
+REDIS_RECONNECT_MIN_BACKOFF = _env_float("REDIS_RECONNECT_MIN_BACKOFF", 0.5)
+REDIS_RECONNECT_MAX_BACKOFF = _env_float("REDIS_RECONNECT_MAX_BACKOFF", 30.0)
+
+# In-process L1 кэш перед Redis
+L1_CACHE_ENABLED = _env_bool("L1_CACHE_ENABLED", True)
+L1_CACHE_MAX_ENTRIES = _env_int("L1_CACHE_MAX_ENTRIES", 10000)
+L1_CACHE_MAX_BYTES = _env_int("L1_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+L1_CACHE_TTL = _env_float("L1_CACHE_TTL", 10.0)
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+# Формат значений в Redis: orjson, json (стандартная библиотека) или msgpack
+CACHE_CODEC = os.getenv("CACHE_CODEC", "orjson")
+
+# In-memory кэш на случай недоступности Redis
+FALLBACK_CACHE_MAX_ENTRIES = _env_int("FALLBACK_CACHE_MAX_ENTRIES", 10000)
+FALLBACK_CACHE_MAX_BYTES = _env_int("FALLBACK_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+FALLBACK_CACHE_MAX_TTL = _env_float("FALLBACK_CACHE_MAX_TTL", 600.0)
+# Как часто фоновая задача удаляет просроченные записи in-process кэшей
+CACHE_SWEEP_INTERVAL = _env_float("CACHE_SWEEP_INTERVAL", 30.0)
+
+# /api/cache/stats: подсчёт ключей профилей инкрементальным SCAN с кэшированием результата
+CACHE_STATS_SCAN_ENABLED = _env_bool("CACHE_STATS_SCAN_ENABLED", False)
+CACHE_STATS_SCAN_INTERVAL = _env_float("CACHE_STATS_SCAN_INTERVAL", 60.0)
+CACHE_STATS_SCAN_BATCH = _env_int("CACHE_STATS_SCAN_BATCH", 500)
+CACHE_STATS_SCAN_MAX_KEYS = _env_int("CACHE_STATS_SCAN_MAX_KEYS", 100000)
+
+# Фоновые снимки для /health и /api/system/info
+HEALTH_SAMPLE_INTERVAL = _env_float("HEALTH_SAMPLE_INTERVAL", 5.0)
+HEALTH_CHECK_TIMEOUT = _env_float("HEALTH_CHECK_TIMEOUT", 2.0)
+
+# Как часто воркер обновляет gauge-метрики пулов и предохранителей в multiprocess-режиме
+METRICS_REFRESH_INTERVAL = _env_float("METRICS_REFRESH_INTERVAL", 5.0)
+
+# Single-flight: блокировка на пересборку ключа между репликами
+SINGLEFLIGHT_LOCK_TTL_MS = _env_int("SINGLEFLIGHT_LOCK_TTL_MS", 5000)
+SINGLEFLIGHT_WAIT_TIMEOUT = _env_float("SINGLEFLIGHT_WAIT_TIMEOUT", 3.0)
+SINGLEFLIGHT_POLL_INTERVAL = _env_float("SINGLEFLIGHT_POLL_INTERVAL", 0.05)
+
+# Кэш профилей: мягкий срок свежести и жёсткий срок хранения (stale-while-revalidate)
+PROFILE_CACHE_TTL = _env_int("PROFILE_CACHE_TTL", 30)
+PROFILE_CACHE_STALE_TTL = _env_int("PROFILE_CACHE_STALE_TTL", 120)
+# Коэффициент вероятностного досрочного обновления (XFetch), 0 — выключено
+CACHE_XFETCH_BETA = _env_float("CACHE_XFETCH_BETA", 1.0)
+# Сжатые варианты профиля (br/gzip) считаются один раз при записи в кэш;
+# тела меньше PROFILE_COMPRESSION_MIN_BYTES байт отдаются без сжатия
+PROFILE_COMPRESSION_ENABLED = _env_bool("PROFILE_COMPRESSION_ENABLED", True)
+PROFILE_COMPRESSION_MIN_BYTES = _env_int("PROFILE_COMPRESSION_MIN_BYTES", 1024)
+PROFILE_GZIP_LEVEL = _env_int("PROFILE_GZIP_LEVEL", 6)
+PROFILE_BROTLI_QUALITY = _env_int("PROFILE_BROTLI_QUALITY", 5)
+
+# Предохранители (circuit breaker) микросервисов
+BREAKER_FAILURE_THRESHOLD = _env_float("BREAKER_FAILURE_THRESHOLD", 0.5)
+BREAKER_MIN_REQUESTS = _env_int("BREAKER_MIN_REQUESTS", 10)
+BREAKER_WINDOW = _env_int("BREAKER_WINDOW", 20)
+BREAKER_OPEN_SECONDS = _env_float("BREAKER_OPEN_SECONDS", 10.0)
+BREAKER_SLOW_CALL_SECONDS = _env_float("BREAKER_SLOW_CALL_SECONDS", 2.0)
+
+# Адаптивный таймаут: перцентиль задержки * множитель, в пределах [MIN, UPSTREAM_TIMEOUT]
+ADAPTIVE_TIMEOUT_PERCENTILE = _env_float("ADAPTIVE_TIMEOUT_PERCENTILE", 0.99)
+ADAPTIVE_TIMEOUT_MULTIPLIER = _env_float("ADAPTIVE_TIMEOUT_MULTIPLIER", 3.0)
+ADAPTIVE_TIMEOUT_MIN = _env_float("ADAPTIVE_TIMEOUT_MIN", 0.2)
+
+# Хеджирование: дублирующий запрос, если ответа нет дольше перцентиля задержки
+HEDGE_ENABLED = _env_bool("HEDGE_ENABLED", False)
+HEDGE_PERCENTILE = _env_float("HEDGE_PERCENTILE", 0.95)
+HEDGE_BUDGET_RATIO = _env_float("HEDGE_BUDGET_RATIO", 0.05)
+
+# Лимит частоты запросов клиента (API-ключ или IP): token bucket в Redis с локальной арендой
+RATE_LIMIT_ENABLED = _env_bool("RATE_LIMIT_ENABLED", False)
+RATE_LIMIT_RPS = _env_float("RATE_LIMIT_RPS", 50.0)
+RATE_LIMIT_BURST = _env_float("RATE_LIMIT_BURST", 100.0)
+# Сколько токенов воркер берёт из Redis за раз и сколько секунд их можно тратить
+RATE_LIMIT_LEASE = _env_int("RATE_LIMIT_LEASE", 5)
+RATE_LIMIT_LEASE_TTL = _env_float("RATE_LIMIT_LEASE_TTL", 1.0)
+RATE_LIMIT_MAX_CLIENTS = _env_int("RATE_LIMIT_MAX_CLIENTS", 100000)
+RATE_LIMIT_API_KEY_HEADER = os.getenv("RATE_LIMIT_API_KEY_HEADER", "X-API-Key")
+RATE_LIMIT_TRUST_FORWARDED = _env_bool("RATE_LIMIT_TRUST_FORWARDED", False)
+
+# Адаптивный предел одновременных запросов воркера (AIMD по задержке); лишние — сразу 503
+CONCURRENCY_LIMIT_ENABLED = _env_bool("CONCURRENCY_LIMIT_ENABLED", True)
+CONCURRENCY_LIMIT_INITIAL = _env_int("CONCURRENCY_LIMIT_INITIAL", 100)
+CONCURRENCY_LIMIT_MIN = _env_int("CONCURRENCY_LIMIT_MIN", 10)
+CONCURRENCY_LIMIT_MAX = _env_int("CONCURRENCY_LIMIT_MAX", 1000)
+CONCURRENCY_LATENCY_TOLERANCE = _env_float("CONCURRENCY_LATENCY_TOLERANCE", 2.0)
+CONCURRENCY_BACKOFF_RATIO = _env_float("CONCURRENCY_BACKOFF_RATIO", 0.9)
+
+# Пути без лимитов: пробы оркестратора и сбор метрик
+ADMISSION_EXEMPT_PATHS = tuple(
+    path for path in os.getenv("ADMISSION_EXEMPT_PATHS", "/metrics,/health,/health/live").split(",") if path
+)
+
+# Логи: JSON-строки пишет фоновый поток из ограниченной очереди (LOG_ASYNC=false — сразу в обработчике).
+# Переполнение очереди не тормозит запросы: записи отбрасываются и считаются
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_OUTPUT = os.getenv("LOG_OUTPUT", "stdout")  # stdout, stderr или путь к файлу
+LOG_ASYNC = _env_bool("LOG_ASYNC", True)
+LOG_QUEUE_SIZE = _env_int("LOG_QUEUE_SIZE", 10000)
+LOG_FLUSH_INTERVAL = _env_float("LOG_FLUSH_INTERVAL", 0.1)
+# Повторяющиеся события (одно событие одного сервиса): не больше LOG_SAMPLE_BURST
+# записей за LOG_SAMPLE_WINDOW секунд, остальные отбрасываются; 0 — без ограничения.
+# Ограничиваются только записи от уровня LOG_SAMPLE_LEVEL, а если задан список
+# LOG_SAMPLE_EVENTS (через запятую, допускаются шаблоны вида redis_*_error) — только эти события
+LOG_SAMPLE_WINDOW = _env_float("LOG_SAMPLE_WINDOW", 1.0)
+LOG_SAMPLE_BURST = _env_int("LOG_SAMPLE_BURST", 20)
+LOG_SAMPLE_LEVEL = os.getenv("LOG_SAMPLE_LEVEL", "warning")
+LOG_SAMPLE_EVENTS = tuple(event for event in os.getenv("LOG_SAMPLE_EVENTS", "").split(",") if event)
+
+# Трассировка (W3C traceparent). Head-сэмплинг: доля запросов, трассы которых
+# сохраняются всегда; tail-сэмплинг: медленные (от TRACING_SLOW_MS) и ошибочные
+# трассы сохраняются независимо от доли, пока накладные расходы в бюджете
+TRACING_ENABLED = _env_bool("TRACING_ENABLED", True)
+TRACING_SAMPLE_RATE = _env_float("TRACING_SAMPLE_RATE", 0.01)
+TRACING_TAIL_SAMPLING = _env_bool("TRACING_TAIL_SAMPLING", True)
+TRACING_SLOW_MS = _env_float("TRACING_SLOW_MS", 500.0)
+TRACING_MAX_SPANS = _env_int("TRACING_MAX_SPANS", 64)
+# Бюджет накладных расходов трассировки на запрос (микросекунды, скользящее среднее):
+# при превышении записываются только трассы, отобранные head-сэмплингом
+TRACING_OVERHEAD_BUDGET_US = _env_float("TRACING_OVERHEAD_BUDGET_US", 200.0)
+# Экспорт в OTLP/JSON: строками в файл и/или POST на OTLP/HTTP (http://collector:4318/v1/traces)
+TRACING_EXPORT_PATH = os.getenv("TRACING_EXPORT_PATH", "")
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "")
+TRACING_EXPORT_INTERVAL = _env_float("TRACING_EXPORT_INTERVAL", 1.0)
+TRACING_EXPORT_QUEUE = _env_int("TRACING_EXPORT_QUEUE", 2000)
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "api-gateway")
+
+# Инвалидация кэша по событиям изменений order/product-service (Redis Stream)
+CHANGE_EVENTS_ENABLED = _env_bool("CHANGE_EVENTS_ENABLED", True)
+CHANGE_EVENTS_STREAM = os.getenv("CHANGE_EVENTS_STREAM", "change-events")
+CHANGE_EVENTS_BATCH = _env_int("CHANGE_EVENTS_BATCH", 100)
+# Ожидание новых событий в XREAD; должно быть меньше REDIS_SOCKET_TIMEOUT
+CHANGE_EVENTS_BLOCK_MS = _env_int("CHANGE_EVENTS_BLOCK_MS", 1000)
+
+# Кэш карточек товаров (по product_id)
+PRODUCT_CACHE_TTL = _env_int("PRODUCT_CACHE_TTL", 300)
+PRODUCT_CACHE_MAX_ENTRIES = _env_int("PRODUCT_CACHE_MAX_ENTRIES", 50000)
+PRODUCT_CACHE_MAX_BYTES = _env_int("PRODUCT_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+PRODUCT_BATCH_WINDOW_MS = _env_float("PRODUCT_BATCH_WINDOW_MS", 2.0)
+PRODUCT_BATCH_MAX_SIZE = _env_int("PRODUCT_BATCH_MAX_SIZE", 100)
+
+# Микро-батчинг запросов пользователей и заказов (POST /users/batch, /orders/batch-by-user)
+UPSTREAM_BATCHING_ENABLED = _env_bool("UPSTREAM_BATCHING_ENABLED", True)
+USER_BATCH_WINDOW_MS = _env_float("USER_BATCH_WINDOW_MS", 2.0)
+USER_BATCH_MAX_SIZE = _env_int("USER_BATCH_MAX_SIZE", 100)
+ORDER_BATCH_WINDOW_MS = _env_float("ORDER_BATCH_WINDOW_MS", 2.0)
+ORDER_BATCH_MAX_SIZE = _env_int("ORDER_BATCH_MAX_SIZE", 100)
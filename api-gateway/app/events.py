@@ -0,0 +1,162 @@
+import asyncio
+import time
+from typing import Dict, Iterable, Optional
+
+import structlog
+
+from app import cache, config
+from app.metrics import CHANGE_EVENT_INVALIDATIONS, CHANGE_EVENT_LAG, CHANGE_EVENTS
+from app.products import forget as forget_products
+
+logger = structlog.get_logger()
+
+# Обратный индекс: товар → ключи профилей, в которые он попал
+PRODUCT_INDEX_PREFIX = "product-profiles:"
+
+# Сколько секунд помнить момент инвалидации ключа: дольше сборка профиля не идёт
+_INVALIDATION_MEMORY = 60.0
+
+_task: Optional[asyncio.Task] = None
+_invalidated_at: Dict[str, float] = {}
+_last_pruned = 0.0
+
+state = {
+    "last_id": None,
+    "consumed": 0,
+    "invalidated_profiles": 0,
+    "invalidated_products": 0,
+    "errors": 0,
+    "last_event_at": None,
+}
+
+
+def product_index_key(product_id: str) -> str:
+    return f"{PRODUCT_INDEX_PREFIX}{product_id}"
+
+
+def profile_key(user_id: str) -> str:
+    return f"profile:{user_id}"
+
+
+async def index_profile(cache_key: str, product_ids: Iterable[str], ttl: int):
+    """Запись профиля в обратный индекс по товарам; индекс живёт не дольше профиля"""
+    if not config.CHANGE_EVENTS_ENABLED:
+        return
+    await cache.index_add([product_index_key(product_id) for product_id in product_ids], cache_key, ttl)
+
+
+def invalidated_since(cache_key: str, since: float) -> bool:
+    """Сбрасывался ли ключ после момента since (time.time())
+
+    Профиль, сборка которого началась до изменения, мог прочитать старые данные:
+    такой профиль не кладётся в кэш.
+    """
+    invalidated_at = _invalidated_at.get(cache_key)
+    return invalidated_at is not None and invalidated_at >= since
+
+
+def _split(value: Optional[str]) -> list:
+    return [item for item in (value or "").split(",") if item]
+
+
+async def handle_event(fields: dict):
+    """Сброс кэшей, затронутых одним событием"""
+    event_type = fields.get("type", "unknown")
+    CHANGE_EVENTS.labels(type=event_type).inc()
+    profile_keys = set()
+    if event_type.startswith("order."):
+        profile_keys.update(profile_key(user_id) for user_id in _split(fields.get("user_ids")))
+    elif event_type.startswith("product."):
+        product_id = fields.get("product_id")
+        if product_id:
+            await forget_products([product_id])
+            CHANGE_EVENT_INVALIDATIONS.labels(cache="product").inc()
+            state["invalidated_products"] += 1
+            profile_keys.update(await cache.index_members(product_index_key(product_id)))
+    else:
+        logger.warning("change_event_unknown", type=event_type)
+
+    if profile_keys:
+        now = time.time()
+        for key in profile_keys:
+            _invalidated_at[key] = now
+        # Каждая реплика сама читает поток, рассылать сброс L1 не нужно
+        await cache.invalidate_many(sorted(profile_keys), publish=False)
+        CHANGE_EVENT_INVALIDATIONS.labels(cache="profile").inc(len(profile_keys))
+        state["invalidated_profiles"] += len(profile_keys)
+
+    published_at = fields.get("ts")
+    if published_at:
+        CHANGE_EVENT_LAG.observe(max(0.0, time.time() - float(published_at)))
+    state["consumed"] += 1
+    state["last_event_at"] = time.time()
+
+
+def _prune_invalidations():
+    global _last_pruned
+    now = time.time()
+    if now - _last_pruned < _INVALIDATION_MEMORY:
+        return
+    _last_pruned = now
+    for key, invalidated_at in list(_invalidated_at.items()):
+        if now - invalidated_at > _INVALIDATION_MEMORY:
+            del _invalidated_at[key]
+
+
+async def _consume():
+    """Чтение потока событий (XREAD) в каждом воркере
+
+    Позиция в потоке хранится в памяти: после недоступности Redis чтение
+    продолжается с последнего обработанного события, так что изменения за время
+    сбоя тоже сбросят кэш. При старте читаются только новые события.
+    """
+    stream = config.CHANGE_EVENTS_STREAM
+    while True:
+        if not cache.USE_REDIS:
+            await asyncio.sleep(1.0)
+            continue
+        try:
+            if state["last_id"] is None:
+                latest = await cache.redis_client.xrevrange(stream, count=1)
+                state["last_id"] = latest[0][0].decode() if latest else "0-0"
+            response = await cache.redis_client.xread(
+                {stream: state["last_id"]},
+                count=config.CHANGE_EVENTS_BATCH,
+                block=config.CHANGE_EVENTS_BLOCK_MS
+            )
+            for _, messages in response or ():
+                for message_id, fields in messages:
+                    await handle_event({
+                        name.decode("utf-8"): value.decode("utf-8") for name, value in fields.items()
+                    })
+                    state["last_id"] = message_id.decode()
+            _prune_invalidations()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            state["errors"] += 1
+            logger.error("change_events_error", error=str(e))
+            await asyncio.sleep(1.0)
+
+
+def start():
+    """Запуск потребителя событий изменений"""
+    global _task
+    if config.CHANGE_EVENTS_ENABLED:
+        _task = asyncio.create_task(_consume())
+
+
+async def stop():
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+
+
+def stats() -> dict:
+    return {"enabled": config.CHANGE_EVENTS_ENABLED, "stream": config.CHANGE_EVENTS_STREAM, **state}
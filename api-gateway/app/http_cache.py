@@ -0,0 +1,91 @@
+import gzip
+import hashlib
+from typing import Dict, Iterable, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from app import config
+from app.cache import CacheEntry
+from app.codec import json_dumps
+
+# Порядок предпочтения при одинаковом q в Accept-Encoding
+ENCODINGS = ("br", "gzip")
+
+
+def content_etag(profile: dict) -> str:
+    """Слабый ETag по содержимому профиля
+
+    Хэшируются только данные пользователя, заказов и товаров: metadata меняется
+    при каждой пересборке (aggregated_at, время этапов), и пересобранный без
+    изменений профиль должен сохранить прежний ETag. Поэтому ETag слабый (W/) —
+    байты тела при одинаковом ETag могут отличаться.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in ("user", "orders", "products"):
+        digest.update(json_dumps(profile.get(part)))
+        digest.update(b"\0")
+    digest.update(json_dumps(profile.get("metadata", {}).get("degraded_services", [])))
+    return f'W/"{digest.hexdigest()}"'
+
+
+def compress_variants(body: bytes) -> Dict[str, bytes]:
+    """Сжатые варианты JSON-тела; маленькие тела и бесполезное сжатие пропускаются"""
+    if not config.PROFILE_COMPRESSION_ENABLED or len(body) < config.PROFILE_COMPRESSION_MIN_BYTES:
+        return {}
+    variants = {}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=config.PROFILE_BROTLI_QUALITY)
+    # mtime=0 — одинаковые тела дают одинаковые байты gzip
+    variants["gzip"] = gzip.compress(body, compresslevel=config.PROFILE_GZIP_LEVEL, mtime=0)
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(body)}
+
+
+def prepare(entry: CacheEntry) -> CacheEntry:
+    """ETag и сжатые варианты записи: считаются один раз при сборке профиля"""
+    entry.etag = content_etag(entry.value)
+    entry.variants = compress_variants(entry.json_body())
+    return entry
+
+
+def _strip_weak(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Совпадение If-None-Match с ETag по слабому сравнению (RFC 9110, 13.1.2)"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    expected = _strip_weak(etag)
+    return any(_strip_weak(tag.strip()) == expected for tag in if_none_match.split(","))
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """Лучшая из доступных кодировок по Accept-Encoding; None — отдавать без сжатия"""
+    available = [encoding for encoding in ENCODINGS if encoding in available]
+    if not accept_encoding or not available:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            weights[name] = q
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
@@ -0,0 +1,114 @@
+import time
+from collections import OrderedDict
+from typing import Any, Iterator, Optional
+
+from app.metrics import (
+    LOCAL_CACHE_BYTES, LOCAL_CACHE_ENTRIES, LOCAL_CACHE_EVICTIONS, LOCAL_CACHE_EXPIRATIONS
+)
+
+
+class LocalCache:
+    """In-process LRU-кэш с TTL на запись и ограничением по числу записей и байтам
+
+    default_ttl — наибольший срок жизни записи. С именем name размер кэша и
+    вытеснения экспортируются в метрики local_cache_* с меткой cache.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, default_ttl: float, name: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.name = name
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.size_bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._evictions_metric = LOCAL_CACHE_EVICTIONS.labels(cache=name) if name else None
+        self._expirations_metric = LOCAL_CACHE_EXPIRATIONS.labels(cache=name) if name else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def keys(self) -> list:
+        return list(self._entries.keys())
+
+    def get(self, key: str) -> Optional[Any]:
+        """Значение по ключу; просроченная запись удаляется при обращении"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, size = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self._expired(1)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, size: int, ttl: Optional[float] = None):
+        """Сохранение значения; size — оценка занимаемой памяти в байтах"""
+        ttl = self.default_ttl if ttl is None else min(ttl, self.default_ttl)
+        if ttl <= 0 or size > self.max_bytes:
+            self.delete(key)
+            return
+        self._remove(key)
+        self._entries[key] = (value, time.monotonic() + ttl, size)
+        self.size_bytes += size
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+            if self._evictions_metric is not None:
+                self._evictions_metric.inc()
+
+    def delete(self, key: str) -> bool:
+        return self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def sweep(self) -> int:
+        """Удаление всех просроченных записей; возвращает их число"""
+        now = time.monotonic()
+        expired = [key for key, (_, expires_at, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self._expired(len(expired))
+        return len(expired)
+
+    def update_metrics(self):
+        """Экспорт числа записей и занятых байтов в gauge-метрики"""
+        if self.name:
+            LOCAL_CACHE_ENTRIES.labels(cache=self.name).set(len(self._entries))
+            LOCAL_CACHE_BYTES.labels(cache=self.name).set(self.size_bytes)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+    def _expired(self, count: int):
+        if not count:
+            return
+        self.expirations += count
+        if self._expirations_metric is not None:
+            self._expirations_metric.inc(count)
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.size_bytes -= entry[2]
+        return True
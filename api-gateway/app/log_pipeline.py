@@ -0,0 +1,292 @@
+import atexit
+import fnmatch
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Tuple, Union
+
+import structlog
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson есть в requirements.txt
+    orjson = None
+
+from app import config, tracing
+from app.metrics import LOG_RECORDS_DROPPED, LOG_RECORDS_SUPPRESSED
+
+_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "critical": logging.CRITICAL,
+}
+
+state = {
+    "written": 0,
+    "dropped": 0,
+    "suppressed": 0,
+    "write_errors": 0,
+}
+
+
+class LogWriter:
+    """Запись готовых строк лога из фонового потока
+
+    Обработчик запроса только добавляет строку в ограниченную очередь (deque
+    без блокировок); поток раз в flush_interval секунд пишет всё накопленное
+    одним вызовом write. Переполненная очередь не тормозит запросы: запись
+    отбрасывается и учитывается в счётчике.
+    """
+
+    def __init__(self, stream, max_queue: int, flush_interval: float):
+        self.stream = stream
+        self.max_queue = max_queue
+        self.flush_interval = flush_interval
+        self._queue: Deque[bytes] = deque()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def put(self, line: bytes):
+        if len(self._queue) >= self.max_queue:
+            state["dropped"] += 1
+            LOG_RECORDS_DROPPED.inc()
+            return
+        self._queue.append(line)
+        if self._thread is None:
+            self.start()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        # Поток записи и остановка могут вызвать flush одновременно
+        with self._lock:
+            queue = self._queue
+            if not queue:
+                return
+            lines = [queue.popleft() for _ in range(len(queue))]
+            try:
+                self.stream.write(b"".join(lines))
+                self.stream.flush()
+            except Exception:
+                state["write_errors"] += 1
+                return
+            state["written"] += len(lines)
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+
+class SyncWriter:
+    """Запись строки прямо в обработчике (LOG_ASYNC=false, для сравнения и отладки)"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def put(self, line: bytes):
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
+        state["written"] += 1
+
+    def flush(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+
+class QueueLogger:
+    """Логгер structlog: отрендеренная запись уходит во writer"""
+
+    __slots__ = ("name", "writer")
+
+    def __init__(self, name: str, writer):
+        self.name = name
+        self.writer = writer
+
+    def msg(self, message: Union[str, bytes]):
+        if isinstance(message, str):
+            message = message.encode("utf-8")
+        self.writer.put(message + b"\n")
+
+    debug = info = warning = warn = error = critical = exception = fatal = log = msg
+
+
+class QueueLoggerFactory:
+    """Фабрика логгеров; имя логгера — модуль, из которого логгер впервые использован"""
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def __call__(self, *args) -> QueueLogger:
+        return QueueLogger(args[0] if args else _caller_module(), self.writer)
+
+
+def _caller_module() -> str:
+    # Вызывается один раз на логгер (cache_logger_on_first_use)
+    frame = sys._getframe(1)
+    while frame is not None:
+        name = frame.f_globals.get("__name__", "")
+        if not name.startswith("structlog") and name != __name__:
+            return name
+        frame = frame.f_back
+    return "?"
+
+
+def add_logger_name(logger, method_name, event_dict):
+    event_dict["logger"] = getattr(logger, "name", "?")
+    return event_dict
+
+
+class RepeatSampler:
+    """Ограничение повторяющихся событий: не больше burst записей за window секунд
+
+    Ключ — имя события и сервис (например, service_unavailable для
+    order_service во время сбоя). Лишние записи отбрасываются, их число
+    дописывается полем suppressed в первую запись следующего окна.
+
+    Ограничиваются только записи от уровня min_level и, если задан список
+    events, только совпавшие с ним события: обычные записи вроде
+    profile_aggregated пишутся все.
+    """
+
+    def __init__(self, window: float, burst: int, max_keys: int = 10000,
+                 min_level: str = "warning", events: Iterable[str] = ()):
+        self.window = window
+        self.burst = burst
+        self.max_keys = max_keys
+        self.min_level = _LEVELS.get(min_level.lower(), logging.WARNING)
+        self.events = tuple(events)
+        self._windows: Dict[Tuple, list] = {}
+        self._sampled: Dict[str, bool] = {}
+
+    def _is_sampled(self, event) -> bool:
+        sampled = self._sampled.get(event)
+        if sampled is None:
+            sampled = not self.events or any(fnmatch.fnmatchcase(str(event), pattern) for pattern in self.events)
+            if len(self._sampled) < self.max_keys:
+                self._sampled[event] = sampled
+        return sampled
+
+    def __call__(self, logger, method_name, event_dict):
+        if self.burst <= 0 or _LEVELS.get(event_dict.get("level"), logging.INFO) < self.min_level:
+            return event_dict
+        if not self._is_sampled(event_dict.get("event")):
+            return event_dict
+        key = (event_dict.get("event"), event_dict.get("service"))
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None:
+            if len(self._windows) >= self.max_keys:
+                self._windows.clear()
+            window = self._windows[key] = [now, 0, 0]  # начало окна, записано, отброшено
+        elif now - window[0] >= self.window:
+            if window[2]:
+                event_dict["suppressed"] = window[2]
+            window[0], window[1], window[2] = now, 0, 0
+        if window[1] >= self.burst:
+            window[2] += 1
+            state["suppressed"] += 1
+            LOG_RECORDS_SUPPRESSED.inc()
+            raise structlog.DropEvent
+        window[1] += 1
+        return event_dict
+
+
+def _json_renderer():
+    if orjson is not None:
+        # orjson отдаёт байты — их же и пишет writer, без перекодирования
+        return structlog.processors.JSONRenderer(serializer=orjson.dumps)
+    return structlog.processors.JSONRenderer()
+
+
+def _open_output(output: str):
+    if output == "stdout":
+        return sys.stdout.buffer
+    if output == "stderr":
+        return sys.stderr.buffer
+    return open(output, "ab")
+
+
+_writer = None
+
+
+def configure(level: Optional[str] = None, use_queue: Optional[bool] = None, stream=None):
+    """Настройка structlog: фильтр уровня без обращения к stdlib logging,
+    отбор повторов, рендеринг orjson и запись из фонового потока
+
+    Вызывается до первой записи в лог: логгеры кэшируются при первом использовании.
+    """
+    global _writer
+    level = config.LOG_LEVEL if level is None else level
+    use_queue = config.LOG_ASYNC if use_queue is None else use_queue
+    if _writer is not None:
+        _writer.stop()
+    stream = stream if stream is not None else _open_output(config.LOG_OUTPUT)
+    if use_queue:
+        _writer = LogWriter(stream, config.LOG_QUEUE_SIZE, config.LOG_FLUSH_INTERVAL)
+    else:
+        _writer = SyncWriter(stream)
+    structlog.configure(
+        processors=[
+            structlog.processors.add_log_level,
+            RepeatSampler(config.LOG_SAMPLE_WINDOW, config.LOG_SAMPLE_BURST,
+                          min_level=config.LOG_SAMPLE_LEVEL, events=config.LOG_SAMPLE_EVENTS),
+            add_logger_name,
+            tracing.add_trace_context,
+            structlog.processors.TimeStamper(fmt="iso", utc=True),
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+            _json_renderer(),
+        ],
+        wrapper_class=structlog.make_filtering_bound_logger(_LEVELS.get(level.lower(), logging.INFO)),
+        context_class=dict,
+        logger_factory=QueueLoggerFactory(_writer),
+        cache_logger_on_first_use=True,
+    )
+    return _writer
+
+
+def flush():
+    if _writer is not None:
+        _writer.flush()
+
+
+def stop():
+    """Запись накопленных строк при остановке воркера"""
+    if _writer is not None:
+        _writer.stop()
+
+
+atexit.register(stop)
+
+
+def stats() -> dict:
+    return {
+        "async": isinstance(_writer, LogWriter),
+        "level": config.LOG_LEVEL,
+        "queued": len(_writer) if _writer is not None else 0,
+        "max_queue": config.LOG_QUEUE_SIZE,
+        **state,
+    }
@@ -1,37 +1,65 @@
 from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from datetime import datetime
-import httpx
 import asyncio
-import redis
-import json
+import os
 import time
-import logging
-from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
+from itertools import islice
+from prometheus_client import CONTENT_TYPE_LATEST
 import structlog
 
-# Настройка структурированного логирования
-structlog.configure(
-    processors=[
-        structlog.stdlib.filter_by_level,
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
-    ],
-    context_class=dict,
-    logger_factory=structlog.stdlib.LoggerFactory(),
-    cache_logger_on_first_use=True,
+from app import cache, config, events, http_cache, log_pipeline, sampler, tracing, upstream
+from app.aggregation import collect_profile, extract_product_ids
+from app.metrics import (
+    AGGREGATION_TIME, COALESCED_REQUESTS, MULTIPROCESS, render_metrics
 )
+from app.admission import AdaptiveConcurrencyLimit, RateLimiter
+from app.middleware import AdmissionMiddleware, PrometheusMiddleware, TracingMiddleware
+from app.products import product_cache, product_counters
+from app.singleflight import SingleFlight
+from app.config import USER_SERVICE_URL, ORDER_SERVICE_URL, PRODUCT_SERVICE_URL
+
+# Структурированное логирование: рендеринг orjson, запись из фонового потока
+log_pipeline.configure()
 
 logger = structlog.get_logger()
 
-app = FastAPI(title="API Gateway BFF", version="1.0.0")
+# Агрегации профилей, которые сейчас выполняются в этом процессе
+profile_flight = SingleFlight()
+# Ссылки на фоновые обновления, чтобы задачи не собрал GC
+background_refreshes = set()
+# Периодическое обновление gauge-метрик воркера (multiprocess-режим)
+gauge_refresher = None
+
+app = FastAPI(title="API Gateway BFF", version="1.0.0", default_response_class=ORJSONResponse)
 
+# Допуск запросов: лимит частоты клиента и адаптивный предел одновременных запросов воркера
+rate_limiter = RateLimiter(
+    rate=config.RATE_LIMIT_RPS,
+    burst=config.RATE_LIMIT_BURST,
+    lease=config.RATE_LIMIT_LEASE,
+    lease_ttl=config.RATE_LIMIT_LEASE_TTL,
+    max_clients=config.RATE_LIMIT_MAX_CLIENTS,
+) if config.RATE_LIMIT_ENABLED else None
+concurrency_limit = AdaptiveConcurrencyLimit(
+    initial=config.CONCURRENCY_LIMIT_INITIAL,
+    min_limit=config.CONCURRENCY_LIMIT_MIN,
+    max_limit=config.CONCURRENCY_LIMIT_MAX,
+    tolerance=config.CONCURRENCY_LATENCY_TOLERANCE,
+    backoff=config.CONCURRENCY_BACKOFF_RATIO,
+) if config.CONCURRENCY_LIMIT_ENABLED else None
+
+# Отклонение лишних запросов — до CORS, чтобы и ответы 429/503 получали CORS-заголовки
+app.add_middleware(
+    AdmissionMiddleware,
+    rate_limiter=rate_limiter,
+    concurrency_limit=concurrency_limit,
+    exempt_paths=config.ADMISSION_EXEMPT_PATHS,
+    api_key_header=config.RATE_LIMIT_API_KEY_HEADER,
+    trust_forwarded=config.RATE_LIMIT_TRUST_FORWARDED,
+)
 # Настройка CORS
 app.add_middleware(
     CORSMiddleware,
@@ -40,136 +68,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-# Настройки сервисов
-USER_SERVICE_URL = "http://user-service:8001"
-ORDER_SERVICE_URL = "http://order-service:8002"
-PRODUCT_SERVICE_URL = "http://product-service:8003"
-
-# Prometheus метрики
-REQUEST_COUNT = Counter(
-    'http_requests_total',
-    'Total HTTP requests',
-    ['method', 'endpoint', 'status']
-)
-
-REQUEST_LATENCY = Histogram(
-    'http_request_duration_seconds',
-    'HTTP request latency in seconds',
-    ['method', 'endpoint']
-)
-
-ACTIVE_REQUESTS = Gauge(
-    'http_active_requests',
-    'Active HTTP requests'
-)
-
-CACHE_HITS = Counter(
-    'cache_hits_total',
-    'Total cache hits',
-    ['cache_type']
-)
-
-CACHE_MISSES = Counter(
-    'cache_misses_total',
-    'Total cache misses',
-    ['cache_type']
-)
-
-AGGREGATION_TIME = Histogram(
-    'aggregation_duration_seconds',
-    'Time taken to aggregate data from services'
-)
-
-SERVICE_ERRORS = Counter(
-    'service_errors_total',
-    'Total service errors',
-    ['service_name']
-)
-
-# Подключение к Redis
-try:
-    redis_client = redis.Redis(
-        host='redis',
-        port=6379,
-        db=0,
-        password='redispass123',
-        decode_responses=False,
-        socket_connect_timeout=2,
-        socket_timeout=2,
-        retry_on_timeout=True
-    )
-    redis_client.ping()
-    logger.info("redis_connected", status="success")
-    USE_REDIS = True
-except Exception as e:
-    logger.error("redis_connection_failed", error=str(e))
-    print("  Redis не доступен, использую in-memory кэш")
-    USE_REDIS = False
-    in_memory_cache = {}
-
-def get_cache(key: str):
-    """Получение данных из кэша"""
-    if USE_REDIS:
-        try:
-            start_time = time.time()
-            data = redis_client.get(key)
-            redis_latency = time.time() - start_time
-            
-            if redis_latency > 0.1:  # Логируем медленные запросы
-                logger.warning("redis_slow_query", key=key, latency=redis_latency)
-                
-            if data:
-                CACHE_HITS.labels(cache_type='redis').inc()
-                return json.loads(data.decode('utf-8'))
-            CACHE_MISSES.labels(cache_type='redis').inc()
-        except Exception as e:
-            logger.error("redis_get_error", key=key, error=str(e))
-            SERVICE_ERRORS.labels(service_name='redis').inc()
-            return None
-    else:
-        cached = in_memory_cache.get(key)
-        if cached and time.time() - cached["timestamp"] < 30:
-            CACHE_HITS.labels(cache_type='memory').inc()
-            return cached["data"]
-        CACHE_MISSES.labels(cache_type='memory').inc()
-    return None
-
-def set_cache(key: str, value: dict, ttl: int = 30):
-    """Сохранение данных в кэш"""
-    if USE_REDIS:
-        try:
-            redis_client.setex(key, ttl, json.dumps(value))
-        except Exception as e:
-            logger.error("redis_set_error", key=key, error=str(e))
-            SERVICE_ERRORS.labels(service_name='redis').inc()
-    else:
-        in_memory_cache[key] = {
-            "data": value,
-            "timestamp": time.time()
-        }
-
-async def fetch_service(service_name: str, url: str, timeout: float = 5.0):
-    """Запрос к микросервису с метриками"""
-    try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            start_time = time.time()
-            response = await client.get(url)
-            latency = time.time() - start_time
-            
-            if latency > 1.0:  # Логируем медленные ответы
-                logger.warning("service_slow_response", service=service_name, latency=latency, url=url)
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logger.error("service_error", service=service_name, status_code=response.status_code, url=url)
-                SERVICE_ERRORS.labels(service_name=service_name).inc()
-                return None
-    except Exception as e:
-        logger.error("service_unavailable", service=service_name, error=str(e), url=url)
-        SERVICE_ERRORS.labels(service_name=service_name).inc()
-        return None
+# Трассировка: корневой span запроса, traceparent в запросах к микросервисам
+if config.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware, skip_paths=("/metrics", "/health/live"))
+# Метрики HTTP-запросов с метками по шаблону маршрута
+app.add_middleware(PrometheusMiddleware)
 
 @app.get("/")
 async def root():
@@ -187,7 +90,9 @@ async def root():
         },
         "endpoints": [
             "GET /health - Проверка здоровья",
+            "GET /health/live - Liveness-проба",
             "GET /api/profile/{user_id} - Агрегированный профиль",
+            "GET /api/users, /api/orders, /api/products - Списки (limit, cursor, format=ndjson)",
             "GET /metrics - Prometheus метрики",
             "GET /api/cache/stats - Статистика кэша",
             "GET /api/system/info - Системная информация"
@@ -196,108 +101,47 @@ async def root():
 
 @app.get("/health")
 async def health():
-    """Проверка здоровья системы"""
-    ACTIVE_REQUESTS.inc()
-    
-    services_status = {}
-    health_tasks = []
-    
-    # Проверяем доступность сервисов параллельно
-    services = [
-        ("user_service", f"{USER_SERVICE_URL}/health"),
-        ("order_service", f"{ORDER_SERVICE_URL}/health"),
-        ("product_service", f"{PRODUCT_SERVICE_URL}/health")
-    ]
-    
-    for service_name, url in services:
-        health_tasks.append(fetch_service(service_name, url, timeout=2.0))
-    
-    results = await asyncio.gather(*health_tasks)
-    
-    for (service_name, _), result in zip(services, results):
-        services_status[service_name] = "healthy" if result else "unhealthy"
-    
-    # Проверяем Redis
-    redis_status = "connected" if USE_REDIS else "disconnected"
-    if USE_REDIS:
-        try:
-            redis_client.ping()
-            redis_status = "healthy"
-        except:
-            redis_status = "unhealthy"
-    
-    services_status["redis"] = redis_status
-    
-    ACTIVE_REQUESTS.dec()
+    """Проверка здоровья системы по последнему фоновому снимку"""
+    snapshot = sampler.health_snapshot
+    redis_status = snapshot.get("services", {}).get("redis", "unknown")
     
     return {
         "status": "healthy",
         "service": "api-gateway",
         "timestamp": datetime.now().isoformat(),
         "version": "1.0.0",
-        "services": services_status,
+        "services": snapshot.get("services", {}),
+        "checked_at": snapshot.get("checked_at"),
         "cache": {
-            "type": "redis" if USE_REDIS else "in_memory",
-            "status": redis_status
+            "type": "redis" if cache.USE_REDIS else "in_memory",
+            "status": redis_status,
+            "backend": cache.get_backend_state()
         }
     }
 
-@app.get("/api/profile/{user_id}")
-async def get_user_profile(user_id: str, request: Request):
-    """Агрегированный профиль пользователя с кэшированием на 30 секунд"""
-    ACTIVE_REQUESTS.inc()
-    start_time = time.time()
-    
-    # Ключ для кэша
-    cache_key = f"profile:{user_id}"
-    
-    # Пробуем получить из кэша
-    cached_data = get_cache(cache_key)
-    if cached_data:
-        latency = time.time() - start_time
-        REQUEST_COUNT.labels(method=request.method, endpoint=request.url.path, status=200).inc()
-        REQUEST_LATENCY.labels(method=request.method, endpoint=request.url.path).observe(latency)
-        ACTIVE_REQUESTS.dec()
-        
-        cached_data["metadata"]["cached"] = True
-        cached_data["metadata"]["response_time_ms"] = round(latency * 1000, 2)
-        return cached_data
-    
+@app.get("/health/live")
+async def liveness():
+    """Liveness-проба для оркестратора: процесс жив и обслуживает event loop"""
+    return {"status": "alive"}
+
+async def aggregate_profile(user_id: str, cache_key: str) -> cache.CacheEntry:
+    """Сбор профиля из микросервисов и сохранение в кэш вместе с ETag и сжатыми вариантами"""
     # Начинаем агрегацию
     aggregation_start = time.time()
     
-    # Параллельно запрашиваем данные из сервисов
-    user_task = fetch_service("user_service", f"{USER_SERVICE_URL}/users/{user_id}")
-    orders_task = fetch_service("order_service", f"{ORDER_SERVICE_URL}/orders/user/{user_id}")
-    
-    user_data, orders_data = await asyncio.gather(user_task, orders_task)
+    # Пользователь и заказы параллельно, товары — сразу по приходу заказов
+    profile = await collect_profile(user_id)
+    user_data = profile["user"]
     
     if not user_data:
-        REQUEST_COUNT.labels(method=request.method, endpoint=request.url.path, status=404).inc()
-        ACTIVE_REQUESTS.dec()
+        # 404 — только если user-service ответил, что пользователя нет
+        if profile.get("user_error") or not upstream.is_available("user_service"):
+            raise HTTPException(status_code=503, detail="Сервис пользователей недоступен")
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
-    # Извлекаем ID товаров из заказов
-    product_ids = set()
-    if orders_data:
-        for order in orders_data:
-            for item in order.get("items", []):
-                product_ids.add(item.get("product_id"))
-    
-    # Получаем информацию о товарах
-    products_data = {}
-    if product_ids:
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.post(
-                    f"{PRODUCT_SERVICE_URL}/products/batch",
-                    json={"product_ids": list(product_ids)}
-                )
-                if response.status_code == 200:
-                    products = response.json()
-                    products_data = {p["id"]: p for p in products}
-        except Exception as e:
-            logger.error("batch_products_error", error=str(e))
+    orders_data = profile["orders"]
+    products_data = profile["products"]
+    degraded_services = profile["degraded_services"]
     
     # Замеряем время агрегации
     aggregation_time = time.time() - aggregation_start
@@ -306,155 +150,309 @@ async def get_user_profile(user_id: str, request: Request):
     # Формируем агрегированный ответ
     response = {
         "user": user_data,
-        "orders": orders_data or [],
+        "orders": orders_data,
         "products": products_data,
         "metadata": {
             "user_id": user_id,
-            "orders_count": len(orders_data) if orders_data else 0,
+            "orders_count": len(orders_data),
             "products_count": len(products_data),
             "aggregated_at": datetime.now().isoformat(),
             "aggregation_time_ms": round(aggregation_time * 1000, 2),
-            "cache_ttl": 30,
-            "cached": False,
-            "services_used": 3
+            "stages": profile["spans"],
+            "cache_ttl": config.PROFILE_CACHE_TTL,
+            "cache_stale_ttl": config.PROFILE_CACHE_STALE_TTL,
+            "services_used": 3,
+            "degraded": bool(degraded_services),
+            "degraded_services": degraded_services
         }
     }
     
-    # Сохраняем в кэш на 30 секунд
-    set_cache(cache_key, response)
+    # Профиль свежий PROFILE_CACHE_TTL секунд, затем до PROFILE_CACHE_STALE_TTL отдаётся устаревшим
+    ttl = max(config.PROFILE_CACHE_STALE_TTL, config.PROFILE_CACHE_TTL)
+    with tracing.span("profile.serialize") as span:
+        entry = http_cache.prepare(cache.CacheEntry.create(
+            response, ttl, soft_ttl=config.PROFILE_CACHE_TTL, delta=aggregation_time
+        ))
+        span.set("body.bytes", len(entry.body))
     
-    # Метрики
-    total_time = time.time() - start_time
-    REQUEST_COUNT.labels(method=request.method, endpoint=request.url.path, status=200).inc()
-    REQUEST_LATENCY.labels(method=request.method, endpoint=request.url.path).observe(total_time)
-    ACTIVE_REQUESTS.dec()
+    if degraded_services:
+        # Неполный профиль не кэшируем, чтобы после восстановления сервисов собрать полный
+        return entry
     
-    response["metadata"]["response_time_ms"] = round(total_time * 1000, 2)
+    if events.invalidated_since(cache_key, aggregation_start):
+        # Заказы или товары изменились во время сборки: профиль мог прочитать старые данные
+        return entry
+    
+    await cache.set_entry(cache_key, entry, ttl)
+    # По индексу событие об изменении товара найдёт все профили с ним
+    await events.index_profile(cache_key, extract_product_ids(orders_data), ttl)
+    return entry
+
+async def build_profile(user_id: str, cache_key: str) -> cache.CacheEntry:
+    """Пересборка профиля не более чем одной репликой шлюза одновременно"""
+    token = await cache.acquire_lock(cache_key, config.SINGLEFLIGHT_LOCK_TTL_MS)
+    if token is None:
+        # Ключ уже пересобирает другая реплика — ждём её результат из Redis
+        entry = await cache.wait_for_cache(
+            cache_key, config.SINGLEFLIGHT_WAIT_TIMEOUT, config.SINGLEFLIGHT_POLL_INTERVAL
+        )
+        if entry:
+            COALESCED_REQUESTS.labels(scope='redis').inc()
+            return entry
+        logger.warning("singleflight_wait_timeout", key=cache_key)
+    try:
+        return await aggregate_profile(user_id, cache_key)
+    finally:
+        if token is not None:
+            await cache.release_lock(cache_key, token)
+
+def refresh_profile_in_background(user_id: str, cache_key: str):
+    """Фоновое обновление профиля, пока клиенту отдаётся закэшированная версия"""
+    async def refresh():
+        try:
+            await profile_flight.do(cache_key, lambda: build_profile(user_id, cache_key))
+        except HTTPException as e:
+            if e.status_code == 404:
+                # Пользователь удалён — устаревший профиль больше не отдаём
+                await cache.invalidate(cache_key)
+            else:
+                # Временный сбой: до конца stale-срока отдаётся прежний профиль
+                logger.warning("profile_refresh_failed", user_id=user_id, status_code=e.status_code,
+                               detail=e.detail)
+        except Exception as e:
+            logger.error("profile_refresh_error", user_id=user_id, error=str(e))
+    
+    if cache_key in profile_flight:
+        return
+    task = asyncio.create_task(refresh())
+    background_refreshes.add(task)
+    task.add_done_callback(background_refreshes.discard)
+
+def profile_response(request: Request, entry: cache.CacheEntry, cached: bool,
+                     cache_status: str, latency: float) -> Response:
+    """Ответ с профилем: 304 по If-None-Match, иначе готовые (по возможности сжатые) байты
+
+    Поля конкретного ответа передаются заголовками, а не в теле: тело
+    закэшированного профиля не меняется от запроса к запросу.
+    """
+    headers = {
+        "X-Cache": "HIT" if cached else "MISS",
+        "X-Cache-Status": cache_status,
+        "X-Response-Time-Ms": str(round(latency * 1000, 2)),
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if entry.etag:
+        headers["ETag"] = entry.etag
+        if http_cache.etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=304, headers=headers)
+    encoding = http_cache.negotiate_encoding(request.headers.get("accept-encoding"), entry.variants)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        return Response(content=entry.variants[encoding], media_type="application/json", headers=headers)
+    return Response(content=entry.json_body(), media_type="application/json", headers=headers)
+
+@app.get("/api/profile/{user_id}")
+async def get_user_profile(user_id: str, request: Request):
+    """Агрегированный профиль пользователя с кэшированием (stale-while-revalidate)"""
+    start_time = time.time()
+    
+    # Ключ для кэша
+    cache_key = f"profile:{user_id}"
+    
+    # Пробуем получить из кэша
+    with tracing.span("cache.lookup", **{"cache.key": cache_key}) as span:
+        entry = await cache.get_cache_entry(cache_key)
+        span.set("cache.hit", entry is not None)
+    if entry:
+        # Устаревший профиль отдаём сразу, а пересобираем в фоне;
+        # свежий иногда обновляем досрочно, чтобы обновления не совпадали по времени
+        cache_status = "stale" if entry.is_stale() else "fresh"
+        if cache_status == "stale" or entry.should_refresh_early(config.CACHE_XFETCH_BETA):
+            refresh_profile_in_background(user_id, cache_key)
+        return profile_response(request, entry, True, cache_status, time.time() - start_time)
+    
+    # Одновременные промахи по одному ключу ждут одну агрегацию;
+    # число запросов и задержку пишет PrometheusMiddleware
+    entry = await profile_flight.do(cache_key, lambda: build_profile(user_id, cache_key))
+    total_time = time.time() - start_time
     
     logger.info("profile_aggregated", 
                 user_id=user_id, 
                 response_time_ms=round(total_time * 1000, 2),
                 cached=False)
     
-    return response
+    return profile_response(request, entry, False, "refreshed", total_time)
+
+# Заголовки ответа микросервиса, которые передаются клиенту при проксировании списков
+PROXIED_LIST_HEADERS = ("content-type", "content-encoding", "x-next-cursor")
+
+async def proxy_list(service_name: str, url: str, request: Request):
+    """Проксирование списка микросервиса без буферизации тела
+
+    Параметры limit, cursor и format передаются как есть; ответ (в том числе
+    NDJSON-поток) пересылается клиенту по мере чтения из микросервиса.
+    """
+    upstream_response = await upstream.open_stream(service_name, url, params=request.query_params)
+    if upstream_response is None:
+        raise HTTPException(status_code=503, detail=f"{service_name} недоступен")
+    headers = {
+        name: upstream_response.headers[name]
+        for name in PROXIED_LIST_HEADERS
+        if name in upstream_response.headers
+    }
+    return StreamingResponse(
+        upstream_response.aiter_raw(),
+        status_code=upstream_response.status_code,
+        headers=headers,
+        background=BackgroundTask(upstream_response.aclose)
+    )
+
+@app.get("/api/users")
+async def list_users(request: Request):
+    return await proxy_list("user_service", f"{USER_SERVICE_URL}/users", request)
+
+@app.get("/api/orders")
+async def list_orders(request: Request):
+    return await proxy_list("order_service", f"{ORDER_SERVICE_URL}/orders", request)
+
+@app.get("/api/products")
+async def list_products(request: Request):
+    return await proxy_list("product_service", f"{PRODUCT_SERVICE_URL}/products", request)
+
+def update_gauges():
+    """Обновление gauge-метрик, которые считываются из состояния процесса"""
+    upstream.update_pool_metrics()
+    upstream.update_breaker_metrics()
+    for local_cache in (cache.l1_cache, cache.fallback_cache, product_cache):
+        local_cache.update_metrics()
 
 @app.get("/metrics")
 async def metrics():
     """Endpoint для Prometheus метрик"""
+    update_gauges()
     return Response(
-        content=generate_latest(),
+        content=render_metrics(),
         media_type=CONTENT_TYPE_LATEST
     )
 
 @app.get("/api/cache/stats")
 async def cache_stats():
-    """Статистика кэша"""
-    if USE_REDIS:
+    """Статистика кэша по счётчикам шлюза, без KEYS по всему keyspace Redis"""
+    # Счётчики и L1 — этого воркера; при нескольких воркерах суммы по всем — в /metrics
+    gateway_stats = {
+        "worker_pid": os.getpid(),
+        "profiles": cache.counters.as_dict(),
+        "products": product_counters.as_dict(),
+        "events": events.stats()
+    }
+    l1_stats = {"enabled": config.L1_CACHE_ENABLED, **cache.l1_cache.stats()}
+    if cache.USE_REDIS:
         try:
-            info = redis_client.info()
-            keys = redis_client.keys("profile:*")
-            
+            info = await cache.redis_client.info()
+        except Exception as e:
+            logger.error("redis_info_error", error=str(e))
             return {
                 "cache_type": "redis",
-                "status": "connected",
-                "stats": {
-                    "cached_profiles": len(keys),
-                    "used_memory_human": info.get("used_memory_human", "N/A"),
-                    "connected_clients": info.get("connected_clients", 0),
-                    "instantaneous_ops_per_sec": info.get("instantaneous_ops_per_sec", 0),
-                    "hit_rate": info.get("keyspace_hits", 0) / max(info.get("keyspace_hits", 0) + info.get("keyspace_misses", 1), 1)
-                }
+                "status": "error",
+                "error": str(e),
+                "backend": cache.get_backend_state(),
+                "gateway": gateway_stats
             }
-        except Exception as e:
-            logger.error("redis_info_error", error=str(e))
-            return {"cache_type": "redis", "status": "error", "error": str(e)}
+        
+        scan = cache.scan_stats()
+        keyspace_hits = info.get("keyspace_hits", 0)
+        return {
+            "cache_type": "redis",
+            "status": "connected",
+            "stats": {
+                # Число ключей профилей — по последнему SCAN (None, если он выключен или ещё не прошёл)
+                "cached_profiles": scan["keys"] if scan else None,
+                "scan": scan,
+                "used_memory_human": info.get("used_memory_human", "N/A"),
+                "connected_clients": info.get("connected_clients", 0),
+                "instantaneous_ops_per_sec": info.get("instantaneous_ops_per_sec", 0),
+                "evicted_keys": info.get("evicted_keys", 0),
+                "expired_keys": info.get("expired_keys", 0),
+                # Глобальный hit rate Redis по всем клиентам; hit rate этого шлюза — в gateway
+                "hit_rate": keyspace_hits / max(keyspace_hits + info.get("keyspace_misses", 1), 1)
+            },
+            "l1": l1_stats,
+            "products_l1": product_cache.stats(),
+            "backend": cache.get_backend_state(),
+            "gateway": gateway_stats
+        }
     else:
         return {
             "cache_type": "in_memory",
             "status": "active",
             "stats": {
-                "cached_items": len(in_memory_cache),
-                "keys": list(in_memory_cache.keys())[:10]
-            }
+                "cached_items": len(cache.fallback_cache),
+                "keys": list(islice(cache.fallback_cache, 10)),
+                **cache.fallback_cache.stats()
+            },
+            "backend": cache.get_backend_state(),
+            "gateway": gateway_stats
         }
 
 @app.get("/api/system/info")
 async def system_info():
-    """Системная информация для мониторинга"""
-    import psutil
-    import os
-    
-    process = psutil.Process(os.getpid())
-    memory_info = process.memory_info()
+    """Системная информация для мониторинга по последнему фоновому снимку"""
+    snapshot = sampler.system_snapshot
     
     return {
-        "system": {
-            "cpu_percent": psutil.cpu_percent(interval=0.1),
-            "memory_percent": psutil.virtual_memory().percent,
-            "disk_usage": psutil.disk_usage('/').percent
-        },
-        "process": {
-            "pid": process.pid,
-            "memory_mb": round(memory_info.rss / 1024 / 1024, 2),
-            "cpu_percent": process.cpu_percent(interval=0.1),
-            "threads": process.num_threads(),
-            "connections": len(process.connections())
+        "system": snapshot.get("system", {}),
+        "process": snapshot.get("process", {}),
+        "sampled_at": snapshot.get("sampled_at"),
+        "admission": {
+            "rate_limit": {
+                "enabled": rate_limiter is not None,
+                "rps": config.RATE_LIMIT_RPS,
+                "burst": config.RATE_LIMIT_BURST
+            },
+            "concurrency": concurrency_limit.stats() if concurrency_limit is not None else None
         },
+        "tracing": tracing.stats(),
+        "logging": log_pipeline.stats(),
         "api_gateway": {
-            "redis_connected": USE_REDIS,
-            "cache_type": "redis" if USE_REDIS else "in_memory",
-            "start_time": datetime.fromtimestamp(process.create_time()).isoformat()
+            "redis_connected": cache.USE_REDIS,
+            "cache_type": "redis" if cache.USE_REDIS else "in_memory",
+            "start_time": snapshot.get("start_time")
         }
     }
 
-@app.middleware("http")
-async def prometheus_middleware(request: Request, call_next):
-    """Middleware для сбора метрик Prometheus"""
-    start_time = time.time()
-    
-    try:
-        response = await call_next(request)
-        
-        # Не логируем метрики для самого endpoint /metrics
-        if request.url.path != "/metrics":
-            REQUEST_LATENCY.labels(
-                method=request.method,
-                endpoint=request.url.path
-            ).observe(time.time() - start_time)
-            
-            REQUEST_COUNT.labels(
-                method=request.method,
-                endpoint=request.url.path,
-                status=response.status_code
-            ).inc()
-        
-        return response
-        
-    except Exception as e:
-        logger.error("request_error", 
-                    method=request.method,
-                    path=request.url.path,
-                    error=str(e))
-        
-        REQUEST_COUNT.labels(
-            method=request.method,
-            endpoint=request.url.path,
-            status=500
-        ).inc()
-        
-        raise
+async def refresh_gauges():
+    """Gauge-метрики пулов и предохранителей этого воркера
+
+    /metrics обслуживает один из воркеров, поэтому в multiprocess-режиме
+    остальные обновляют свои значения сами, раз в METRICS_REFRESH_INTERVAL.
+    """
+    while True:
+        update_gauges()
+        await asyncio.sleep(config.METRICS_REFRESH_INTERVAL)
 
 @app.on_event("startup")
 async def startup_event():
     """Действия при запуске приложения"""
-    logger.info("api_gateway_starting", version="1.0.0")
-    
+    global gauge_refresher
+    logger.info("api_gateway_starting", version="1.0.0", multiprocess_metrics=MULTIPROCESS)
+    await cache.init_cache()
+    await upstream.open_clients()
+    await sampler.start()
+    events.start()
+    tracing.start()
+    if MULTIPROCESS:
+        gauge_refresher = asyncio.create_task(refresh_gauges())
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Действия при остановке приложения"""
     logger.info("api_gateway_shutting_down")
-    if USE_REDIS:
-        try:
-            redis_client.close()
-        except:
-            pass
+    if gauge_refresher is not None:
+        gauge_refresher.cancel()
+    await sampler.stop()
+    await events.stop()
+    await tracing.stop()
+    await upstream.close_clients()
+    await cache.close_cache()
+    log_pipeline.stop()
@@ -0,0 +1,231 @@
+import os
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, Gauge, generate_latest, multiprocess
+)
+
+# С несколькими воркерами (gunicorn) метрики пишутся в файлы этого каталога
+# и суммируются по всем процессам при отдаче /metrics
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# Prometheus метрики
+REQUEST_COUNT = Counter(
+    'http_requests_total',
+    'Total HTTP requests',
+    ['method', 'endpoint', 'status']
+)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency in seconds',
+    ['method', 'endpoint']
+)
+
+ACTIVE_REQUESTS = Gauge(
+    'http_active_requests',
+    'Active HTTP requests',
+    multiprocess_mode='livesum'
+)
+
+CACHE_HITS = Counter(
+    'cache_hits_total',
+    'Total cache hits',
+    ['cache_type', 'tier']
+)
+
+CACHE_MISSES = Counter(
+    'cache_misses_total',
+    'Total cache misses',
+    ['cache_type', 'tier']
+)
+
+CACHE_BACKEND_REDIS = Gauge(
+    'cache_backend_redis',
+    'Whether the profile cache is served by Redis (1) or the in-memory fallback (0)',
+    multiprocess_mode='livemin'
+)
+
+CACHE_BACKEND_SWITCHES = Counter(
+    'cache_backend_switches_total',
+    'Runtime switches between Redis and the in-memory cache',
+    ['to']
+)
+
+AGGREGATION_TIME = Histogram(
+    'aggregation_duration_seconds',
+    'Time taken to aggregate data from services'
+)
+
+AGGREGATION_STAGE_TIME = Histogram(
+    'aggregation_stage_duration_seconds',
+    'Time spent in each profile aggregation stage',
+    ['stage']
+)
+
+COALESCED_REQUESTS = Counter(
+    'cache_coalesced_requests_total',
+    'Cache misses served by an aggregation already in flight',
+    ['scope']
+)
+
+SERVICE_ERRORS = Counter(
+    'service_errors_total',
+    'Total service errors',
+    ['service_name']
+)
+
+UPSTREAM_CONNECTIONS_IN_USE = Gauge(
+    'upstream_pool_connections_in_use',
+    'Upstream connections currently serving a request',
+    ['service_name'],
+    multiprocess_mode='livesum'
+)
+
+UPSTREAM_CONNECTIONS_IDLE = Gauge(
+    'upstream_pool_connections_idle',
+    'Idle keep-alive upstream connections',
+    ['service_name'],
+    multiprocess_mode='livesum'
+)
+
+CIRCUIT_BREAKER_STATE = Gauge(
+    'upstream_circuit_breaker_state',
+    'Upstream circuit breaker state (0 - closed, 1 - half-open, 2 - open)',
+    ['service_name'],
+    multiprocess_mode='livemax'
+)
+
+UPSTREAM_TIMEOUT_SECONDS = Gauge(
+    'upstream_adaptive_timeout_seconds',
+    'Current adaptive timeout for upstream requests',
+    ['service_name'],
+    multiprocess_mode='livemax'
+)
+
+HEDGED_REQUESTS = Counter(
+    'upstream_hedged_requests_total',
+    'Duplicate upstream requests issued after the hedge delay',
+    ['service_name']
+)
+
+HEDGE_WINS = Counter(
+    'upstream_hedge_wins_total',
+    'Hedged upstream requests that answered before the original',
+    ['service_name']
+)
+
+LOCAL_CACHE_ENTRIES = Gauge(
+    'local_cache_entries',
+    'Entries held in an in-process cache',
+    ['cache'],
+    multiprocess_mode='livesum'
+)
+
+LOCAL_CACHE_BYTES = Gauge(
+    'local_cache_bytes',
+    'Estimated bytes held in an in-process cache',
+    ['cache'],
+    multiprocess_mode='livesum'
+)
+
+LOCAL_CACHE_EVICTIONS = Counter(
+    'local_cache_evictions_total',
+    'Entries evicted from an in-process cache to stay within its limits',
+    ['cache']
+)
+
+LOCAL_CACHE_EXPIRATIONS = Counter(
+    'local_cache_expirations_total',
+    'Expired entries removed from an in-process cache',
+    ['cache']
+)
+
+BATCH_SIZE = Histogram(
+    'upstream_batch_size',
+    'Number of keys per micro-batched upstream request',
+    ['loader'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+
+BATCH_WAIT = Histogram(
+    'upstream_batch_wait_seconds',
+    'Time the first key of a micro-batch waited before the batch was sent',
+    ['loader'],
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1)
+)
+
+
+ADMISSION_REJECTED = Counter(
+    'admission_rejected_total',
+    'Requests rejected before processing by the rate limiter or the concurrency limit',
+    ['reason']
+)
+
+ADMISSION_CONCURRENCY_LIMIT = Gauge(
+    'admission_concurrency_limit',
+    'Current adaptive limit of concurrent requests',
+    multiprocess_mode='livesum'
+)
+
+RATE_LIMIT_DECISIONS = Counter(
+    'rate_limit_decisions_total',
+    'Rate limit decisions by where they were made (local lease or Redis)',
+    ['source']
+)
+
+# Каждый воркер читает поток событий целиком, поэтому суммы по воркерам кратны их числу
+CHANGE_EVENTS = Counter(
+    'cache_change_events_total',
+    'Change events consumed from the event stream',
+    ['type']
+)
+
+CHANGE_EVENT_INVALIDATIONS = Counter(
+    'cache_event_invalidations_total',
+    'Cache keys invalidated by change events',
+    ['cache']
+)
+
+CHANGE_EVENT_LAG = Histogram(
+    'cache_change_event_lag_seconds',
+    'Delay between publishing a change event and invalidating the cache',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+)
+
+
+TRACES_KEPT = Counter(
+    'tracing_traces_kept_total',
+    'Traces queued for export by sampling reason (head, error, slow)',
+    ['reason']
+)
+
+TRACES_DROPPED = Counter(
+    'tracing_traces_dropped_total',
+    'Kept traces dropped because the export queue was full or the exporter failed'
+)
+
+TRACING_OVERHEAD = Histogram(
+    'tracing_overhead_seconds',
+    'Time spent in tracing code per recorded request',
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.0002, 0.0005, 0.001, 0.005)
+)
+
+
+LOG_RECORDS_DROPPED = Counter(
+    'log_records_dropped_total',
+    'Log records dropped because the log queue was full'
+)
+
+LOG_RECORDS_SUPPRESSED = Counter(
+    'log_records_suppressed_total',
+    'Repetitive log records suppressed by the log sampler'
+)
+
+
+def render_metrics() -> bytes:
+    """Метрики в текстовом формате Prometheus; в multiprocess-режиме — сумма по воркерам"""
+    if not MULTIPROCESS:
+        return generate_latest()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
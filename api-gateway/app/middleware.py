@@ -0,0 +1,226 @@
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import orjson
+import structlog
+
+from app import tracing
+from app.admission import AdaptiveConcurrencyLimit, RateLimiter, retry_after_header
+from app.metrics import ACTIVE_REQUESTS, ADMISSION_REJECTED, REQUEST_COUNT, REQUEST_LATENCY
+
+logger = structlog.get_logger()
+
+# Метка для запросов, не попавших ни в один маршрут (404): не плодим серии по URL
+UNMATCHED_ENDPOINT = "<unmatched>"
+
+
+class PrometheusMiddleware:
+    """ASGI middleware метрик HTTP-запросов
+
+    Метка endpoint — шаблон маршрута (/api/profile/{user_id}), а не URL, чтобы
+    число временных рядов не росло с числом пользователей. Дочерние метрики для
+    каждого сочетания меток создаются один раз и кэшируются.
+    """
+
+    def __init__(self, app, skip_paths: Tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = frozenset(skip_paths)
+        self._route_templates: Dict[Callable, str] = {}
+        self._latency_children: Dict[Tuple[str, str], object] = {}
+        self._count_children: Dict[Tuple[str, str, int], object] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start_time = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        ACTIVE_REQUESTS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            status_code = 500
+            logger.error("request_error",
+                         method=scope["method"],
+                         path=scope["path"],
+                         error=str(e))
+            raise
+        finally:
+            ACTIVE_REQUESTS.dec()
+            endpoint = self._endpoint_label(scope)
+            self._latency(scope["method"], endpoint).observe(time.perf_counter() - start_time)
+            self._count(scope["method"], endpoint, status_code).inc()
+
+    def _endpoint_label(self, scope) -> str:
+        # Роутер дописывает найденный маршрут (или его обработчик) в тот же scope
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ENDPOINT
+        template = self._route_templates.get(endpoint)
+        if template is None:
+            template = self._find_template(scope.get("app"), endpoint) or UNMATCHED_ENDPOINT
+            self._route_templates[endpoint] = template
+        return template
+
+    @staticmethod
+    def _find_template(app, endpoint: Callable) -> Optional[str]:
+        for route in getattr(app, "routes", ()):
+            if getattr(route, "endpoint", None) is endpoint:
+                return route.path
+        return None
+
+    def _latency(self, method: str, endpoint: str):
+        key = (method, endpoint)
+        child = self._latency_children.get(key)
+        if child is None:
+            child = self._latency_children[key] = REQUEST_LATENCY.labels(method=method, endpoint=endpoint)
+        return child
+
+    def _count(self, method: str, endpoint: str, status_code: int):
+        key = (method, endpoint, status_code)
+        child = self._count_children.get(key)
+        if child is None:
+            child = self._count_children[key] = REQUEST_COUNT.labels(
+                method=method, endpoint=endpoint, status=status_code
+            )
+        return child
+
+
+class AdmissionMiddleware:
+    """ASGI middleware допуска запросов: лимит частоты клиента и предел одновременных запросов
+
+    Лишние запросы не ждут в очереди: сразу 429 (клиент превысил лимит) или 503
+    (воркер перегружен) с заголовком Retry-After. Клиент — значение заголовка
+    API-ключа, иначе IP (из X-Forwarded-For, если прокси доверенный).
+    """
+
+    def __init__(self, app, rate_limiter: Optional[RateLimiter] = None,
+                 concurrency_limit: Optional[AdaptiveConcurrencyLimit] = None,
+                 exempt_paths: Tuple[str, ...] = (), api_key_header: str = "X-API-Key",
+                 trust_forwarded: bool = False):
+        self.app = app
+        self.rate_limiter = rate_limiter
+        self.concurrency_limit = concurrency_limit
+        self.exempt_paths = frozenset(exempt_paths)
+        self.api_key_header = api_key_header.lower().encode("latin-1")
+        self.trust_forwarded = trust_forwarded
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if self.rate_limiter is not None:
+            allowed, retry_after = await self.rate_limiter.check(self._client_id(scope))
+            if not allowed:
+                ADMISSION_REJECTED.labels(reason="rate_limited").inc()
+                await self._reject(send, 429, "Превышен лимит запросов", retry_after,
+                                   [(b"x-ratelimit-limit", str(self.rate_limiter.rate).encode())])
+                return
+
+        limit = self.concurrency_limit
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        if not limit.try_acquire():
+            ADMISSION_REJECTED.labels(reason="concurrency").inc()
+            await self._reject(send, 503, "Шлюз перегружен", 1.0)
+            return
+
+        start_time = time.perf_counter()
+        latency = None
+
+        async def send_with_latency(message):
+            nonlocal latency
+            # Задержка до начала ответа: потоковые списки не искажают оценку
+            if message["type"] == "http.response.start":
+                latency = time.perf_counter() - start_time
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_latency)
+        finally:
+            limit.release(latency)
+
+    def _client_id(self, scope) -> str:
+        forwarded = None
+        for name, value in scope["headers"]:
+            if name == self.api_key_header:
+                return "key:" + value.decode("latin-1")
+            if name == b"x-forwarded-for":
+                forwarded = value
+        if forwarded is not None and self.trust_forwarded:
+            return "ip:" + forwarded.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    @staticmethod
+    async def _reject(send, status: int, detail: str, retry_after: float, headers: list = ()):
+        body = orjson.dumps({"detail": detail})
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", retry_after_header(retry_after).encode()),
+                *headers,
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class TracingMiddleware:
+    """ASGI middleware трассировки: корневой span запроса и заголовок X-Trace-Id
+
+    Входящий traceparent продолжает трассу вызывающего. Имя корневого span —
+    метод и шаблон маршрута, как метка endpoint в метриках.
+    """
+
+    def __init__(self, app, skip_paths: Tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = frozenset(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        root, token = tracing.begin(scope["method"], traceparent)
+        trace_id = root.trace.trace_id.encode()
+        status_code = 500
+
+        async def send_with_trace_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = [*message.get("headers", ()), (b"x-trace-id", trace_id)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        except Exception as e:
+            root.fail(str(e) or type(e).__name__)
+            raise
+        finally:
+            route = scope.get("route")
+            root.name = f"{scope['method']} {route.path if route is not None else UNMATCHED_ENDPOINT}"
+            root.set("http.method", scope["method"])
+            root.set("http.target", scope["path"])
+            tracing.end(root, token, status_code)
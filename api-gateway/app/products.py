@@ -0,0 +1,126 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+from app import cache, config
+from app.batching import BatchLoader, BatchLoadError
+from app.cache import CacheCounters
+from app.codec import json_dumps
+from app.local_cache import LocalCache
+from app.metrics import CACHE_HITS, CACHE_MISSES
+from app.upstream import fetch_service
+
+# Карточки товаров меняются редко, поэтому кэшируем их по product_id:
+# L1 в памяти процесса, L2 — ключи product:{id} в Redis
+product_cache = LocalCache(
+    max_entries=config.PRODUCT_CACHE_MAX_ENTRIES,
+    max_bytes=config.PRODUCT_CACHE_MAX_BYTES,
+    default_ttl=config.PRODUCT_CACHE_TTL,
+    name="product",
+)
+product_counters = CacheCounters()
+
+
+def _redis_key(product_id: str) -> str:
+    return f"product:{product_id}"
+
+
+def _remember(product: dict) -> int:
+    # При наличии Redis L1 живёт недолго, чтобы изменения доходили до всех реплик
+    ttl = config.L1_CACHE_TTL if cache.USE_REDIS else None
+    size = len(json_dumps(product))
+    product_cache.set(product["id"], product, size=size, ttl=ttl)
+    return size
+
+
+async def _fetch_products_batch(product_ids: list) -> Optional[Dict[str, dict]]:
+    """Один запрос /products/batch на все накопленные промахи"""
+    products = await fetch_service(
+        "product_service",
+        f"{config.PRODUCT_SERVICE_URL}/products/batch",
+        method="POST",
+        json={"product_ids": product_ids},
+        hedge=True
+    )
+    if products is None:
+        return None
+    loaded = {product["id"]: product for product in products}
+    # Заполняем кэш один раз на batch, а не в каждом ожидающем запросе
+    local_bytes = sum(_remember(product) for product in loaded.values())
+    product_counters.writes += len(loaded)
+    if cache.USE_REDIS:
+        # Как и для профилей: с Redis — байты записанных в Redis значений, без него — размер в памяти
+        product_counters.bytes_written += await cache.set_many(
+            {_redis_key(product_id): product for product_id, product in loaded.items()},
+            ttl=config.PRODUCT_CACHE_TTL
+        )
+    else:
+        product_counters.bytes_written += local_bytes
+    return loaded
+
+
+# Промахи одновременных сборок профилей объединяются в один batch-запрос
+product_loader = BatchLoader(
+    "product_service",
+    _fetch_products_batch,
+    window=config.PRODUCT_BATCH_WINDOW_MS / 1000,
+    max_batch_size=config.PRODUCT_BATCH_MAX_SIZE,
+)
+
+
+async def get_products(product_ids: Iterable[str]) -> Tuple[Dict[str, dict], bool]:
+    """Карточки товаров: L1, затем один MGET в Redis, недостающие — batch-запросом
+
+    Возвращает найденные товары и признак того, что product-service ответил
+    (или не понадобился).
+    """
+    products_data = {}
+    missing = []
+    product_ids = list(product_ids)
+    product_counters.lookups += len(product_ids)
+    for product_id in product_ids:
+        product = product_cache.get(product_id)
+        if product is not None:
+            products_data[product_id] = product
+        else:
+            missing.append(product_id)
+    if products_data:
+        CACHE_HITS.labels(cache_type='product', tier='l1').inc(len(products_data))
+        product_counters.hit("l1", len(products_data))
+    if not missing:
+        return products_data, True
+    CACHE_MISSES.labels(cache_type='product', tier='l1').inc(len(missing))
+
+    if cache.USE_REDIS:
+        found = await cache.get_many([_redis_key(product_id) for product_id in missing])
+        for product_id in missing:
+            product = found.get(_redis_key(product_id))
+            if product is not None:
+                products_data[product_id] = product
+                _remember(product)
+        still_missing = [product_id for product_id in missing if product_id not in products_data]
+        hits = len(missing) - len(still_missing)
+        missing = still_missing
+        if hits:
+            CACHE_HITS.labels(cache_type='product', tier='l2').inc(hits)
+            product_counters.hit("l2", hits)
+        if not missing:
+            return products_data, True
+        CACHE_MISSES.labels(cache_type='product', tier='l2').inc(len(missing))
+
+    try:
+        fetched = await product_loader.load_many(missing)
+    except BatchLoadError:
+        return products_data, False
+
+    products_data.update(
+        (product_id, product) for product_id, product in fetched.items() if product is not None
+    )
+    return products_data, True
+
+
+async def forget(product_ids: Iterable[str]):
+    """Сброс карточек товаров из L1 этого процесса и из Redis"""
+    product_ids = list(product_ids)
+    for product_id in product_ids:
+        product_cache.delete(product_id)
+    product_counters.invalidations += len(product_ids)
+    await cache.delete_keys([_redis_key(product_id) for product_id in product_ids])
@@ -0,0 +1,117 @@
+import time
+from collections import deque
+from typing import Optional
+
+
+class LatencyTracker:
+    """Скользящее окно задержек успешных ответов микросервиса"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, latency: float):
+        self._samples.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def adaptive_timeout(self, q: float, multiplier: float,
+                         min_timeout: float, max_timeout: float, min_samples: int = 20) -> float:
+        """Таймаут по наблюдаемому перцентилю задержки, пока данных мало — максимальный"""
+        if len(self._samples) < min_samples:
+            return max_timeout
+        return max(min_timeout, min(max_timeout, self.percentile(q) * multiplier))
+
+
+class CircuitBreaker:
+    """Предохранитель closed → open → half_open по доле ошибок и медленных ответов"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: float, min_requests: int, window: int,
+                 open_seconds: float, slow_call_seconds: float, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.min_requests = min_requests
+        self.open_seconds = open_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)  # True — вызов неудачный или медленный
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+    def allow_request(self) -> bool:
+        """Можно ли сейчас обращаться к микросервису"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                return False
+            self.state = self.HALF_OPEN
+            self._half_open_calls = 0
+        if self.state == self.HALF_OPEN:
+            if self._half_open_calls >= self.half_open_max_calls:
+                return False
+            self._half_open_calls += 1
+        return True
+
+    def release(self):
+        """Вызов отменён, не дав результата: место пробного запроса освобождается,
+        иначе предохранитель навсегда остался бы в half_open"""
+        if self.state == self.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def record_success(self, latency: float):
+        slow = latency >= self.slow_call_seconds
+        if self.state == self.HALF_OPEN:
+            if slow:
+                self._trip()
+            else:
+                self._reset()
+            return
+        self._record(slow)
+
+    def record_failure(self):
+        if self.state == self.HALF_OPEN:
+            self._trip()
+            return
+        self._record(True)
+
+    def _record(self, failed: bool):
+        self._outcomes.append(failed)
+        if len(self._outcomes) >= self.min_requests:
+            if sum(self._outcomes) / len(self._outcomes) >= self.failure_threshold:
+                self._trip()
+
+    def _trip(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def _reset(self):
+        self.state = self.CLOSED
+        self._outcomes.clear()
+
+
+class HedgeBudget:
+    """Бюджет дублирующих запросов: не больше ratio от общего числа запросов"""
+
+    def __init__(self, ratio: float, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = 0.0
+
+    def on_request(self):
+        self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
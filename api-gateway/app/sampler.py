@@ -0,0 +1,123 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Optional
+
+import psutil
+import structlog
+
+from app import cache, config
+from app.upstream import get_client
+
+logger = structlog.get_logger()
+
+HEALTH_ENDPOINTS = {
+    "user_service": f"{config.USER_SERVICE_URL}/health",
+    "order_service": f"{config.ORDER_SERVICE_URL}/health",
+    "product_service": f"{config.PRODUCT_SERVICE_URL}/health",
+}
+
+# Снимки состояния; /health и /api/system/info отдают их без обращений к ОС и микросервисам.
+# До первого снимка состояние сервисов неизвестно
+system_snapshot: dict = {}
+health_snapshot: dict = {
+    "services": {service_name: "unknown" for service_name in [*HEALTH_ENDPOINTS, "redis"]},
+    "checked_at": None,
+}
+
+_process = psutil.Process(os.getpid())
+_task: Optional[asyncio.Task] = None
+
+
+def _sample_system() -> dict:
+    """Снимок системы и процесса; вызывается в отдельном потоке
+
+    cpu_percent без interval считает загрузку с предыдущего вызова и не спит,
+    а дорогой перебор соединений процесса не блокирует event loop.
+    """
+    memory_info = _process.memory_info()
+    return {
+        "system": {
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory_percent": psutil.virtual_memory().percent,
+            "disk_usage": psutil.disk_usage('/').percent
+        },
+        "process": {
+            "pid": _process.pid,
+            "memory_mb": round(memory_info.rss / 1024 / 1024, 2),
+            "cpu_percent": _process.cpu_percent(interval=None),
+            "threads": _process.num_threads(),
+            "connections": len(_process.connections())
+        },
+        "start_time": datetime.fromtimestamp(_process.create_time()).isoformat(),
+        "sampled_at": datetime.now().isoformat()
+    }
+
+
+async def _probe(service_name: str, url: str) -> bool:
+    """GET /health напрямую через пул соединений, минуя предохранитель и учёт задержек:
+    быстрые ответы /health занижали бы адаптивный таймаут и порог хеджирования"""
+    try:
+        response = await get_client(service_name).get(url, timeout=config.HEALTH_CHECK_TIMEOUT)
+    except Exception as e:
+        logger.warning("health_check_failed", service=service_name, error=str(e) or type(e).__name__)
+        return False
+    return response.status_code == 200
+
+
+async def _sample_health() -> dict:
+    """Проверка микросервисов и Redis параллельно"""
+    results = await asyncio.gather(*(
+        _probe(service_name, url) for service_name, url in HEALTH_ENDPOINTS.items()
+    ))
+    services = {
+        service_name: "healthy" if result else "unhealthy"
+        for service_name, result in zip(HEALTH_ENDPOINTS, results)
+    }
+    if cache.USE_REDIS:
+        services["redis"] = "healthy" if await cache.ping() else "unhealthy"
+    else:
+        services["redis"] = "disconnected"
+    return {"services": services, "checked_at": datetime.now().isoformat()}
+
+
+async def refresh():
+    """Обновление обоих снимков"""
+    global system_snapshot, health_snapshot
+    try:
+        system_snapshot = await asyncio.to_thread(_sample_system)
+    except Exception as e:
+        logger.error("system_sample_error", error=str(e))
+    try:
+        health_snapshot = await _sample_health()
+    except Exception as e:
+        logger.error("health_sample_error", error=str(e))
+
+
+async def _run():
+    while True:
+        started = time.monotonic()
+        await refresh()
+        await asyncio.sleep(max(0.0, config.HEALTH_SAMPLE_INTERVAL - (time.monotonic() - started)))
+
+
+async def start():
+    """Запуск фонового сбора снимков"""
+    global _task
+    # Первый вызов cpu_percent только задаёт точку отсчёта и всегда возвращает 0
+    psutil.cpu_percent(interval=None)
+    _process.cpu_percent(interval=None)
+    _task = asyncio.create_task(_run())
+
+
+async def stop():
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
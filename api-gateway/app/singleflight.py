@@ -0,0 +1,36 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from app.metrics import COALESCED_REQUESTS
+
+
+class SingleFlight:
+    """Объединение одновременных вызовов с одинаковым ключом в один"""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполнить fn() или дождаться уже идущего вызова с тем же ключом"""
+        task = self._calls.get(key)
+        if task is not None:
+            COALESCED_REQUESTS.labels(scope='local').inc()
+        else:
+            # Отдельная задача: отмена запроса-инициатора не отменяет ожидающих
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Помечаем исключение как полученное, даже если ждать было некому
+            task.exception()
@@ -0,0 +1,379 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Deque, Iterable, List, Optional, Tuple
+
+import httpx
+import structlog
+
+from app import config
+from app.codec import json_dumps
+from app.metrics import TRACES_DROPPED, TRACES_KEPT, TRACING_OVERHEAD
+
+logger = structlog.get_logger()
+
+# Значения OTLP: вид span и код статуса
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_ERROR = 2
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+_queue: Deque[Tuple["Trace", str]] = deque()
+_task: Optional[asyncio.Task] = None
+_http: Optional[httpx.AsyncClient] = None
+
+state = {
+    "tail_sampling": config.TRACING_TAIL_SAMPLING,
+    "overhead_us": 0.0,
+    "kept": 0,
+    "dropped": 0,
+    "exported": 0,
+    "export_errors": 0,
+}
+
+
+class Trace:
+    """Спаны одного запроса к шлюзу
+
+    recording=False — спаны не записываются, но trace_id передаётся в
+    микросервисы и пишется в логи.
+    """
+
+    __slots__ = ("trace_id", "sampled", "recording", "spans", "error", "finished", "overhead_ns")
+
+    def __init__(self, trace_id: str, sampled: bool, recording: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.recording = recording
+        self.spans: List[Span] = []
+        self.error = False
+        self.finished = False
+        self.overhead_ns = 0
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns",
+                 "attributes", "status", "links")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], kind: int = SPAN_KIND_INTERNAL,
+                 attributes: Optional[dict] = None, links: Optional[list] = None):
+        self.trace = trace
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self.status = 0
+        self.links = links
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace.trace_id}-{self.span_id}-{'01' if self.trace.sampled else '00'}"
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def fail(self, message: str):
+        self.status = STATUS_ERROR
+        self.attributes["error.message"] = message
+        self.trace.error = True
+
+
+class _NoopSpan:
+    """Заглушка, когда трасса не записывается: вызовы ничего не стоят"""
+
+    def set(self, key: str, value):
+        pass
+
+    def fail(self, message: str):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _new_id(bits: int) -> str:
+    # Идентификаторы не секретны: getrandbits заметно быстрее os.urandom
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, parent_id, sampled) из заголовка traceparent; None, если он некорректен"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == "ff":
+        return None
+    version, trace_id, parent_id, flags = parts[:4]
+    if version == "00" and len(parts) != 4:
+        return None
+    if len(trace_id) != 32 or len(parent_id) != 16 or len(flags) != 2:
+        return None
+    try:
+        int(trace_id, 16), int(parent_id, 16)
+        sampled = bool(int(flags, 16) & 1)
+    except ValueError:
+        return None
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id.lower(), parent_id.lower(), sampled
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def inject(headers: Optional[dict] = None) -> dict:
+    """Заголовки запроса к микросервису с traceparent текущего span"""
+    headers = {} if headers is None else headers
+    current = _current_span.get()
+    if current is not None:
+        headers["traceparent"] = current.traceparent
+    return headers
+
+
+def begin(name: str, traceparent: Optional[str] = None) -> Tuple[Span, Token]:
+    """Корневой span запроса; продолжает трассу из входящего traceparent
+
+    Решение head-сэмплинга наследуется от вызывающего, иначе принимается с
+    вероятностью TRACING_SAMPLE_RATE. Трассы, не отобранные head-сэмплингом,
+    записываются только ради tail-сэмплинга, пока он не выключен бюджетом.
+    Корневой span становится текущим; token передаётся в end().
+    """
+    started = time.perf_counter_ns()
+    parsed = parse_traceparent(traceparent)
+    if parsed is not None:
+        trace_id, parent_id, sampled = parsed
+    else:
+        trace_id, parent_id = _new_id(128), None
+        sampled = random.random() < config.TRACING_SAMPLE_RATE
+    # Без экспортёра спаны некуда выгружать: остаются только traceparent и trace_id в логах
+    trace = Trace(trace_id, sampled, (sampled or state["tail_sampling"]) and exporting())
+    root = Span(trace, name, parent_id, SPAN_KIND_SERVER)
+    if trace.recording:
+        trace.spans.append(root)
+    token = _current_span.set(root)
+    trace.overhead_ns += time.perf_counter_ns() - started
+    return root, token
+
+
+def end(root: Span, token: Token, status_code: int):
+    """Завершение запроса: решение tail-сэмплинга и постановка трассы в очередь экспорта"""
+    started = time.perf_counter_ns()
+    _current_span.reset(token)
+    trace = root.trace
+    trace.finished = True
+    root.end_ns = time.time_ns()
+    if not trace.recording:
+        return
+    root.set("http.status_code", status_code)
+    if status_code >= 500:
+        root.status = STATUS_ERROR
+        trace.error = True
+
+    if trace.sampled:
+        reason = "head"
+    elif trace.error:
+        reason = "error"
+    elif root.end_ns - root.start_ns >= config.TRACING_SLOW_MS * 1_000_000:
+        reason = "slow"
+    else:
+        reason = None
+    if reason is not None:
+        if len(_queue) >= config.TRACING_EXPORT_QUEUE:
+            TRACES_DROPPED.inc()
+            state["dropped"] += 1
+        else:
+            _queue.append((trace, reason))
+            TRACES_KEPT.labels(reason=reason).inc()
+            state["kept"] += 1
+
+    trace.overhead_ns += time.perf_counter_ns() - started
+    _record_overhead(trace.overhead_ns)
+
+
+def _record_overhead(overhead_ns: int):
+    """Скользящее среднее накладных расходов и включение/выключение tail-сэмплинга"""
+    TRACING_OVERHEAD.observe(overhead_ns / 1e9)
+    budget = config.TRACING_OVERHEAD_BUDGET_US
+    # Одиночная пауза GC внутри замера не должна выключать tail-сэмплинг
+    overhead_us = min(overhead_ns / 1000, budget * 4)
+    state["overhead_us"] += (overhead_us - state["overhead_us"]) * 0.05
+    if not config.TRACING_TAIL_SAMPLING:
+        return
+    if state["tail_sampling"] and state["overhead_us"] > budget:
+        state["tail_sampling"] = False
+        logger.warning("tracing_tail_sampling_paused", overhead_us=round(state["overhead_us"], 1), budget_us=budget)
+    elif not state["tail_sampling"] and state["overhead_us"] < budget * 0.5:
+        state["tail_sampling"] = True
+        logger.info("tracing_tail_sampling_resumed", overhead_us=round(state["overhead_us"], 1))
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, links: Optional[Iterable[Span]] = None, **attributes):
+    """Дочерний span текущего; вне записываемой трассы — заглушка"""
+    parent = _current_span.get()
+    if parent is None or not parent.trace.recording or parent.trace.finished \
+            or len(parent.trace.spans) >= config.TRACING_MAX_SPANS:
+        # Например, фоновое обновление профиля пережило свой запрос
+        yield NOOP_SPAN
+        return
+    started = time.perf_counter_ns()
+    trace = parent.trace
+    current = Span(trace, name, parent.span_id, kind, attributes,
+                   [(link.trace.trace_id, link.span_id) for link in links if link is not parent] if links else None)
+    trace.spans.append(current)
+    token = _current_span.set(current)
+    trace.overhead_ns += time.perf_counter_ns() - started
+    try:
+        yield current
+    except Exception as e:
+        current.fail(str(e) or type(e).__name__)
+        raise
+    finally:
+        started = time.perf_counter_ns()
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace.overhead_ns += time.perf_counter_ns() - started
+
+
+def add_trace_context(logger, method_name, event_dict):
+    """Процессор structlog: trace_id и span_id текущего запроса в каждой записи лога"""
+    current = _current_span.get()
+    if current is not None:
+        event_dict["trace_id"] = current.trace.trace_id
+        event_dict["span_id"] = current.span_id
+    return event_dict
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def _otlp_span(span: Span, reason: str) -> dict:
+    data = {
+        "traceId": span.trace.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        # Незавершённые спаны (запрос отменён) закрываются концом трассы
+        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+        "attributes": [_attribute(key, value) for key, value in span.attributes.items()],
+        "status": {"code": span.status},
+    }
+    if span.parent_id:
+        data["parentSpanId"] = span.parent_id
+    if span.links:
+        data["links"] = [{"traceId": trace_id, "spanId": span_id} for trace_id, span_id in span.links]
+    if span is span.trace.spans[0]:
+        data["attributes"].append(_attribute("sampling.reason", reason))
+    return data
+
+
+def to_otlp(traces: Iterable[Tuple[Trace, str]]) -> dict:
+    """Пакет трасс в формате OTLP/JSON (ExportTraceServiceRequest)"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                _attribute("service.name", config.TRACING_SERVICE_NAME),
+                _attribute("process.pid", os.getpid()),
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": "app.tracing"},
+                "spans": [_otlp_span(span, reason) for trace, reason in traces for span in trace.spans],
+            }],
+        }]
+    }
+
+
+def _write_file(path: str, data: bytes):
+    # Одна запись с O_APPEND: строки воркеров не перемешиваются
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+async def export_pending():
+    """Выгрузка накопленных трасс одной строкой OTLP/JSON в файл и/или на OTLP/HTTP"""
+    if not _queue:
+        return
+    batch = [_queue.popleft() for _ in range(len(_queue))]
+    payload = json_dumps(to_otlp(batch))
+    try:
+        if config.TRACING_EXPORT_PATH:
+            await asyncio.to_thread(_write_file, config.TRACING_EXPORT_PATH, payload + b"\n")
+        if config.TRACING_OTLP_ENDPOINT and _http is not None:
+            response = await _http.post(
+                config.TRACING_OTLP_ENDPOINT, content=payload, headers={"content-type": "application/json"}
+            )
+            response.raise_for_status()
+    except Exception as e:
+        state["export_errors"] += 1
+        state["dropped"] += len(batch)
+        TRACES_DROPPED.inc(len(batch))
+        logger.error("tracing_export_error", error=str(e), traces=len(batch))
+        return
+    state["exported"] += len(batch)
+
+
+async def _run():
+    while True:
+        await asyncio.sleep(config.TRACING_EXPORT_INTERVAL)
+        await export_pending()
+
+
+def exporting() -> bool:
+    return bool(config.TRACING_EXPORT_PATH or config.TRACING_OTLP_ENDPOINT)
+
+
+def start():
+    """Запуск фоновой выгрузки трасс"""
+    global _task, _http
+    if not config.TRACING_ENABLED or not exporting():
+        return
+    if config.TRACING_OTLP_ENDPOINT:
+        _http = httpx.AsyncClient(timeout=5.0)
+    _task = asyncio.create_task(_run())
+
+
+async def stop():
+    global _task, _http
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+        await export_pending()
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
+def stats() -> dict:
+    return {
+        "enabled": config.TRACING_ENABLED,
+        "sample_rate": config.TRACING_SAMPLE_RATE,
+        "slow_ms": config.TRACING_SLOW_MS,
+        "overhead_budget_us": config.TRACING_OVERHEAD_BUDGET_US,
+        "queued": len(_queue),
+        **state,
+        "overhead_us": round(state["overhead_us"], 1),
+    }
@@ -0,0 +1,274 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+import httpx
+import structlog
+
+from app import config, tracing
+from app.codec import json_loads
+from app.metrics import (
+    UPSTREAM_CONNECTIONS_IN_USE, UPSTREAM_CONNECTIONS_IDLE,
+    CIRCUIT_BREAKER_STATE, UPSTREAM_TIMEOUT_SECONDS, HEDGED_REQUESTS, HEDGE_WINS, SERVICE_ERRORS
+)
+from app.resilience import CircuitBreaker, HedgeBudget, LatencyTracker
+
+logger = structlog.get_logger()
+
+# Базовые адреса микросервисов, для каждого держим отдельный пул соединений
+UPSTREAMS = {
+    "user_service": config.USER_SERVICE_URL,
+    "order_service": config.ORDER_SERVICE_URL,
+    "product_service": config.PRODUCT_SERVICE_URL,
+}
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+# Предохранитель и история задержек для каждого микросервиса
+breakers = {
+    service_name: CircuitBreaker(
+        failure_threshold=config.BREAKER_FAILURE_THRESHOLD,
+        min_requests=config.BREAKER_MIN_REQUESTS,
+        window=config.BREAKER_WINDOW,
+        open_seconds=config.BREAKER_OPEN_SECONDS,
+        slow_call_seconds=config.BREAKER_SLOW_CALL_SECONDS,
+    )
+    for service_name in UPSTREAMS
+}
+latencies = {service_name: LatencyTracker() for service_name in UPSTREAMS}
+hedge_budgets = {service_name: HedgeBudget(config.HEDGE_BUDGET_RATIO) for service_name in UPSTREAMS}
+
+_BREAKER_STATE_VALUES = {
+    CircuitBreaker.CLOSED: 0,
+    CircuitBreaker.HALF_OPEN: 1,
+    CircuitBreaker.OPEN: 2,
+}
+
+
+def _create_client(service_name: str) -> httpx.AsyncClient:
+    """Создание долгоживущего клиента с пулом keep-alive соединений"""
+    limits = httpx.Limits(
+        max_connections=config.UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=config.UPSTREAM_MAX_KEEPALIVE,
+        keepalive_expiry=config.UPSTREAM_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        base_url=UPSTREAMS.get(service_name, ""),
+        timeout=config.UPSTREAM_TIMEOUT,
+        limits=limits,
+        http2=config.UPSTREAM_HTTP2,
+    )
+
+
+def get_client(service_name: str) -> httpx.AsyncClient:
+    """Клиент микросервиса; создаётся лениво, если пулы ещё не открыты"""
+    client = _clients.get(service_name)
+    if client is None or client.is_closed:
+        client = _create_client(service_name)
+        _clients[service_name] = client
+    return client
+
+
+async def open_clients():
+    """Открытие пулов соединений при запуске приложения"""
+    for service_name in UPSTREAMS:
+        get_client(service_name)
+    logger.info("upstream_pools_opened",
+                services=list(UPSTREAMS),
+                max_connections=config.UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive=config.UPSTREAM_MAX_KEEPALIVE,
+                keepalive_expiry=config.UPSTREAM_KEEPALIVE_EXPIRY,
+                http2=config.UPSTREAM_HTTP2)
+
+
+async def close_clients():
+    """Закрытие пулов соединений при остановке приложения"""
+    for service_name, client in list(_clients.items()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.error("upstream_pool_close_error", service=service_name, error=str(e))
+    _clients.clear()
+
+
+def get_timeout(service_name: str) -> float:
+    """Таймаут запроса по наблюдаемому распределению задержек микросервиса"""
+    tracker = latencies.get(service_name)
+    if tracker is None:
+        return config.UPSTREAM_TIMEOUT
+    return tracker.adaptive_timeout(
+        config.ADAPTIVE_TIMEOUT_PERCENTILE,
+        config.ADAPTIVE_TIMEOUT_MULTIPLIER,
+        config.ADAPTIVE_TIMEOUT_MIN,
+        config.UPSTREAM_TIMEOUT,
+    )
+
+
+def get_hedge_delay(service_name: str) -> Optional[float]:
+    """Через сколько секунд дублировать запрос; None — хеджирование сейчас не нужно"""
+    tracker = latencies.get(service_name)
+    if not config.HEDGE_ENABLED or tracker is None or len(tracker) < 20:
+        return None
+    return tracker.percentile(config.HEDGE_PERCENTILE)
+
+
+async def send(service_name: str, method: str, url: str, timeout: float,
+               json: Optional[dict] = None, hedge: bool = False) -> httpx.Response:
+    """HTTP-запрос к микросервису; с hedge=True медленный запрос дублируется
+
+    Запрос несёт traceparent текущего span (у дубля — тот же).
+    """
+    client = get_client(service_name)
+    headers = tracing.inject()
+    delay = get_hedge_delay(service_name) if hedge else None
+    if delay is None:
+        return await client.request(method, url, json=json, timeout=timeout, headers=headers)
+
+    budget = hedge_budgets[service_name]
+    budget.on_request()
+    primary = asyncio.ensure_future(client.request(method, url, json=json, timeout=timeout, headers=headers))
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done or not budget.try_acquire():
+        return await primary
+
+    HEDGED_REQUESTS.labels(service_name=service_name).inc()
+    hedged = asyncio.ensure_future(client.request(method, url, json=json, timeout=timeout, headers=headers))
+    pending = {primary, hedged}
+    error = None
+    try:
+        # Берём первый успешный ответ, проигравший запрос отменяем
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedged:
+                        HEDGE_WINS.labels(service_name=service_name).inc()
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def is_available(service_name: str) -> bool:
+    """False, если предохранитель микросервиса разомкнут"""
+    breaker = breakers.get(service_name)
+    return breaker is None or breaker.state != CircuitBreaker.OPEN
+
+
+def update_breaker_metrics():
+    """Экспорт состояния предохранителей и текущих таймаутов"""
+    for service_name, breaker in breakers.items():
+        CIRCUIT_BREAKER_STATE.labels(service_name=service_name).set(_BREAKER_STATE_VALUES[breaker.state])
+        UPSTREAM_TIMEOUT_SECONDS.labels(service_name=service_name).set(get_timeout(service_name))
+
+
+def _pool_connections(client: httpx.AsyncClient) -> Optional[list]:
+    # httpx не даёт публичного API для статистики пула, читаем её из httpcore
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    return getattr(pool, "connections", None)
+
+
+def update_pool_metrics():
+    """Обновление gauge-метрик занятых и простаивающих соединений"""
+    for service_name in UPSTREAMS:
+        client = _clients.get(service_name)
+        connections = _pool_connections(client) if client else None
+        if connections is None:
+            in_use, idle = 0, 0
+        else:
+            idle = sum(1 for conn in connections if conn.is_idle())
+            in_use = sum(1 for conn in connections if not conn.is_idle() and not conn.is_closed())
+        UPSTREAM_CONNECTIONS_IN_USE.labels(service_name=service_name).set(in_use)
+        UPSTREAM_CONNECTIONS_IDLE.labels(service_name=service_name).set(idle)
+
+
+async def open_stream(service_name: str, url: str, params: Optional[dict] = None) -> Optional[httpx.Response]:
+    """Потоковый GET к микросервису: тело не читается целиком, а отдаётся по частям
+
+    Возвращает ответ с непрочитанным телом (его нужно закрыть через aclose) или
+    None, если предохранитель разомкнут или микросервис недоступен.
+    """
+    breaker = breakers[service_name]
+    if not breaker.allow_request():
+        return None
+    client = get_client(service_name)
+    try:
+        start_time = time.time()
+        request = client.build_request(
+            "GET", url, params=params, timeout=config.UPSTREAM_TIMEOUT, headers=tracing.inject()
+        )
+        response = await client.send(request, stream=True)
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    except Exception as e:
+        logger.error("service_unavailable", service=service_name, error=str(e), url=url)
+        SERVICE_ERRORS.labels(service_name=service_name).inc()
+        breaker.record_failure()
+        return None
+    if response.status_code >= 500:
+        logger.error("service_error", service=service_name, status_code=response.status_code, url=url)
+        SERVICE_ERRORS.labels(service_name=service_name).inc()
+        breaker.record_failure()
+        await response.aclose()
+        return None
+    # Учитываем время до заголовков ответа: длина потока зависит от размера коллекции
+    breaker.record_success(time.time() - start_time)
+    return response
+
+
+async def fetch_service(service_name: str, url: str, timeout: Optional[float] = None,
+                        method: str = "GET", json: Optional[dict] = None, hedge: bool = False):
+    """Запрос к микросервису через общий пул соединений с предохранителем и адаптивным таймаутом
+
+    hedge=True разрешает дублирующий запрос (только для идемпотентных вызовов).
+    Каждый вызов — отдельный client-span трассы.
+    """
+    with tracing.span(f"{method} {service_name}", tracing.SPAN_KIND_CLIENT,
+                      **{"peer.service": service_name, "http.method": method, "http.url": url}) as span:
+        return await _fetch_service(span, service_name, url, timeout, method, json, hedge)
+
+
+async def _fetch_service(span, service_name: str, url: str, timeout: Optional[float],
+                         method: str, json: Optional[dict], hedge: bool):
+    breaker = breakers[service_name]
+    if not breaker.allow_request():
+        # Предохранитель разомкнут — не ждём таймаут, сразу отдаём отказ
+        span.fail("circuit open")
+        return None
+    if timeout is None:
+        timeout = get_timeout(service_name)
+    try:
+        start_time = time.time()
+        response = await send(service_name, method, url, timeout, json=json, hedge=hedge)
+        latency = time.time() - start_time
+        span.set("http.status_code", response.status_code)
+
+        if latency > 1.0:  # Логируем медленные ответы
+            logger.warning("service_slow_response", service=service_name, latency=latency, url=url)
+
+        if response.status_code == 200:
+            breaker.record_success(latency)
+            latencies[service_name].record(latency)
+            return json_loads(response.content)
+        else:
+            logger.error("service_error", service=service_name, status_code=response.status_code, url=url)
+            SERVICE_ERRORS.labels(service_name=service_name).inc()
+            if response.status_code >= 500:
+                span.fail(f"HTTP {response.status_code}")
+                breaker.record_failure()
+            else:
+                breaker.record_success(latency)
+            return None
+    except asyncio.CancelledError:
+        # Отмена (клиент ушёл, ответил хедж или collect_profile бросил заказы) — не сбой микросервиса
+        breaker.release()
+        raise
+    except Exception as e:
+        logger.error("service_unavailable", service=service_name, error=str(e), url=url)
+        SERVICE_ERRORS.labels(service_name=service_name).inc()
+        breaker.record_failure()
+        span.fail(str(e) or type(e).__name__)
+        return None
@@ -0,0 +1,28 @@
+# Запуск шлюза несколькими воркерами: gunicorn -c gunicorn.conf.py app.main:app
+import os
+import shutil
+import tempfile
+
+bind = os.getenv("GATEWAY_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GATEWAY_WORKERS", 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+keepalive = 5
+graceful_timeout = 10
+
+# Метрики воркеров пишутся в файлы общего каталога; переменная должна быть
+# задана до импорта prometheus_client в воркерах, поэтому выставляем её здесь
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "gateway-metrics"))
+
+
+def on_starting(server):
+    """Файлы метрик прошлого запуска удаляем, иначе счётчики продолжат старые значения"""
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Gauge-метрики завершившегося воркера больше не учитываются в live-режимах"""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,124 @@
+"""
+Нагрузочный тест: простой event loop при обращениях к кэшу.
+
+Поднимает локальный stub Redis с искусственной задержкой ответа и прогоняет
+одинаковую нагрузку через синхронный redis.Redis (как было раньше) и через
+асинхронный кэш шлюза. Параллельно фоновая корутина измеряет, насколько
+event loop опаздывает с пробуждением.
+
+    python benchmarks/bench_cache_event_loop.py --requests 200 --latency-ms 5
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+import redis
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api-gateway"))
+
+
+class SlowRedisStub:
+    """Минимальный RESP-сервер: отвечает на любую команду с задержкой"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.loop = asyncio.new_event_loop()
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+
+    async def _handle(self, reader, writer):
+        while True:
+            header = await reader.readline()
+            if not header:
+                break
+            args = []
+            for _ in range(int(header[1:])):
+                await reader.readline()
+                args.append((await reader.readline()).strip().upper())
+            await asyncio.sleep(self.latency)
+            command = args[0] if args else b""
+            if command == b"PING":
+                writer.write(b"+PONG\r\n")
+            elif command == b"GET":
+                writer.write(b"$-1\r\n")
+            else:
+                writer.write(b"+OK\r\n")
+            await writer.drain()
+        writer.close()
+
+    def start(self):
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", self.port))
+            self.loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        time.sleep(0.2)
+
+
+async def measure_stalls(stop: asyncio.Event, interval: float = 0.001) -> list:
+    """Сколько event loop опаздывает с пробуждением таймера"""
+    stalls = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(max(0.0, time.perf_counter() - start - interval))
+    return stalls
+
+
+async def run_load(get, total: int, concurrency: int) -> list:
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(measure_stalls(stop))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await get(f"profile:user{i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    stalls = await monitor
+    return [elapsed, sum(stalls), max(stalls, default=0.0)]
+
+
+def report(name: str, result: list):
+    elapsed, stall_total, stall_max = result
+    print(f"{name:<10} wall={elapsed * 1000:8.1f}ms "
+          f"loop_stall_total={stall_total * 1000:8.1f}ms "
+          f"loop_stall_max={stall_max * 1000:6.1f}ms")
+
+
+async def main(args):
+    stub = SlowRedisStub(args.latency_ms / 1000)
+    stub.start()
+    os.environ.update(REDIS_HOST="127.0.0.1", REDIS_PORT=str(stub.port), REDIS_PASSWORD="")
+
+    from app import cache
+
+    blocking_client = redis.Redis(host="127.0.0.1", port=stub.port)
+
+    async def blocking_get(key: str):
+        blocking_client.get(key)
+
+    await cache.init_cache()
+    try:
+        report("blocking", await run_load(blocking_get, args.requests, args.concurrency))
+        report("async", await run_load(cache.get_cache, args.requests, args.concurrency))
+    finally:
+        blocking_client.close()
+        await cache.close_cache()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    asyncio.run(main(parser.parse_args()))
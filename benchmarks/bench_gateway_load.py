@@ -0,0 +1,415 @@
+"""
+Нагрузочный тест шлюза с фиксированным RPS против stub-микросервисов.
+
+Поднимает stub user/order/product-service (benchmarks/stub_upstreams.py) с
+заданной задержкой, разбросом и долей ошибок, Redis (redis-server, fakeredis
+или без Redis; fakeredis сам упирается в CPU и годится только для проверки
+работоспособности) и шлюз под gunicorn, затем прогоняет сценарии:
+
+    cold      каждый запрос — новый пользователь, кэш не помогает
+    hot       небольшой прогретый набор пользователей
+    mixed     доля --hot-ratio запросов к прогретому набору, остальные холодные
+    degraded  холодные запросы при сбоящих order/product-service
+
+Нагрузка открытая: запросы отправляются по расписанию с фиксированным RPS
+независимо от ответов, задержка считается от запланированного момента, поэтому
+очередь перед перегруженным шлюзом видна в p99. Для каждого сценария шлюз
+перезапускается. Результаты (пропускная способность, p50/p95/p99, CPU шлюза на
+запрос) печатаются таблицей и сохраняются в JSON для сравнения между коммитами:
+
+    python benchmarks/bench_gateway_load.py --rps 200 --duration 20 --output before.json
+    python benchmarks/bench_gateway_load.py --rps 200 --duration 20 --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import psutil
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+STUBS = {
+    "user": "USER_SERVICE_URL",
+    "order": "ORDER_SERVICE_URL",
+    "product": "PRODUCT_SERVICE_URL",
+}
+
+
+@dataclass
+class Scenario:
+    name: str
+    hot_ratio: float
+    # Параметры stub-сервисов на время сценария поверх базовых: задержка и доля ошибок
+    faults: Dict[str, dict] = field(default_factory=dict)
+
+
+def scenarios(args) -> Dict[str, Scenario]:
+    degraded_latency = args.latency_ms * args.degraded_latency_factor
+    return {
+        "cold": Scenario("cold", hot_ratio=0.0),
+        "hot": Scenario("hot", hot_ratio=1.0),
+        "mixed": Scenario("mixed", hot_ratio=args.hot_ratio),
+        "degraded": Scenario("degraded", hot_ratio=0.0, faults={
+            "order": {"latency_ms": degraded_latency, "error_rate": args.degraded_error_rate},
+            "product": {"latency_ms": degraded_latency, "error_rate": args.degraded_error_rate},
+        }),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} не поднялся за {timeout} секунд")
+
+
+def wait_port(port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"порт {port} не открылся за {timeout} секунд")
+
+
+def start_stubs(args) -> Tuple[Dict[str, str], list]:
+    urls, processes = {}, []
+    for service in STUBS:
+        port = free_port()
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.join(ROOT, "benchmarks", "stub_upstreams.py"),
+            "--service", service, "--port", str(port),
+            "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+            "--error-rate", str(args.error_rate), "--orders-per-user", str(args.orders_per_user),
+        ]))
+        urls[service] = f"http://127.0.0.1:{port}"
+        wait_ready(f"{urls[service]}/health")
+    return urls, processes
+
+
+def set_faults(stub_urls: Dict[str, str], args, overrides: Dict[str, dict]):
+    """Базовые параметры stub-сервисов, поверх них — сбои сценария"""
+    for service, url in stub_urls.items():
+        faults = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "error_rate": args.error_rate}
+        faults.update(overrides.get(service, {}))
+        httpx.post(f"{url}/_stub/faults", json=faults).raise_for_status()
+
+
+def start_redis(mode: str) -> Tuple[Optional[Tuple[str, int]], Optional[subprocess.Popen]]:
+    """(адрес, процесс) Redis по режиму: auto, none, fake, server или host:port"""
+    if mode == "auto":
+        mode = "server" if shutil.which("redis-server") else "none"
+    if mode == "none":
+        return None, None
+    if mode not in ("fake", "server"):
+        host, _, port = mode.rpartition(":")
+        return (host or "127.0.0.1", int(port)), None
+    port = free_port()
+    if mode == "server":
+        if shutil.which("redis-server") is None:
+            raise RuntimeError("redis-server не найден; используйте --redis fake или --redis none")
+        command = ["redis-server", "--port", str(port), "--save", "", "--appendonly", "no"]
+    else:
+        command = [sys.executable, "-c",
+                   "import sys; from fakeredis import TcpFakeServer; "
+                   "TcpFakeServer(('127.0.0.1', int(sys.argv[1])), server_type='redis').serve_forever()",
+                   str(port)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    wait_port(port)
+    return ("127.0.0.1", port), process
+
+
+def flush_redis(address: Optional[Tuple[str, int]]):
+    if address is None:
+        return
+    import redis
+
+    client = redis.Redis(host=address[0], port=address[1])
+    client.flushall()
+    client.close()
+
+
+def start_gateway(args, stub_urls: Dict[str, str], redis_address) -> Tuple[str, subprocess.Popen]:
+    port = free_port()
+    env = {
+        **os.environ,
+        **{STUBS[service]: url for service, url in stub_urls.items()},
+        "GATEWAY_WORKERS": str(args.workers),
+        "GATEWAY_BIND": f"127.0.0.1:{port}",
+        "PROMETHEUS_MULTIPROC_DIR": tempfile.mkdtemp(prefix="gateway-metrics-"),
+    }
+    if redis_address is not None:
+        env.update(REDIS_HOST=redis_address[0], REDIS_PORT=str(redis_address[1]), REDIS_PASSWORD="")
+    else:
+        # На свободном порту Redis нет: шлюз работает на in-memory кэше
+        env.update(REDIS_HOST="127.0.0.1", REDIS_PORT=str(free_port()))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", "app.main:app"],
+        cwd=os.path.join(ROOT, "api-gateway"),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=None if args.gateway_logs else subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    wait_ready(f"{url}/health/live")
+    return url, process
+
+
+def stop(process: Optional[subprocess.Popen]):
+    if process is not None:
+        process.terminate()
+        process.wait()
+
+
+def cpu_seconds(process: subprocess.Popen) -> float:
+    """Процессорное время мастера gunicorn и всех его воркеров"""
+    total = 0.0
+    root = psutil.Process(process.pid)
+    for proc in [root, *root.children(recursive=True)]:
+        try:
+            times = proc.cpu_times()
+        except psutil.NoSuchProcess:
+            continue
+        total += times.user + times.system
+    return total
+
+
+def hot_ids(count: int) -> List[str]:
+    return [f"hot-{n}" for n in range(count)]
+
+
+async def generate_load(url: str, rps: float, duration: float, hot_ratio: float, hot_count: int,
+                        max_inflight: int, prefix: str) -> dict:
+    """Открытая нагрузка: запросы уходят по расписанию, не дожидаясь предыдущих"""
+    latencies, statuses = [], Counter()
+    dropped = 0
+    inflight = 0
+    hot = hot_ids(hot_count)
+    rng = random.Random(prefix)
+    limits = httpx.Limits(max_connections=max_inflight, max_keepalive_connections=max_inflight)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+        async def one(path: str, scheduled: float):
+            nonlocal inflight
+            try:
+                response = await client.get(path)
+                statuses[response.status_code] += 1
+                latencies.append(time.perf_counter() - scheduled)
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            finally:
+                inflight -= 1
+
+        tasks = []
+        started = time.perf_counter()
+        total = int(rps * duration)
+        for n in range(total):
+            scheduled = started + n / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if inflight >= max_inflight:
+                dropped += 1
+                continue
+            if rng.random() < hot_ratio:
+                user_id = rng.choice(hot)
+            else:
+                user_id = f"cold-{prefix}-{n}"
+            inflight += 1
+            tasks.append(asyncio.ensure_future(one(f"/api/profile/{user_id}", scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    return {"latencies": latencies, "statuses": dict(statuses), "dropped": dropped, "elapsed": elapsed}
+
+
+def run_client(params) -> dict:
+    return asyncio.run(generate_load(*params))
+
+
+def percentile(samples: list, q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def ms(value: Optional[float]) -> Optional[float]:
+    return round(value * 1000, 3) if value is not None else None
+
+
+def run_scenario(args, scenario: Scenario, stub_urls: Dict[str, str], redis_address) -> dict:
+    flush_redis(redis_address)
+    set_faults(stub_urls, args, {})
+    url, gateway = start_gateway(args, stub_urls, redis_address)
+    try:
+        if scenario.hot_ratio > 0:
+            with httpx.Client(base_url=url, timeout=30.0) as client:
+                for user_id in hot_ids(args.hot_users):
+                    client.get(f"/api/profile/{user_id}")
+        set_faults(stub_urls, args, scenario.faults)
+
+        nonce = uuid.uuid4().hex[:8]
+        params = [
+            (url, args.rps / args.clients, args.duration, scenario.hot_ratio, args.hot_users,
+             args.max_inflight, f"{nonce}-{n}")
+            for n in range(args.clients)
+        ]
+        cpu_before = cpu_seconds(gateway)
+        with multiprocessing.Pool(args.clients) as pool:
+            parts = pool.map(run_client, params)
+        cpu_used = cpu_seconds(gateway) - cpu_before
+    finally:
+        stop(gateway)
+        set_faults(stub_urls, args, {})
+
+    latencies = [latency for part in parts for latency in part["latencies"]]
+    statuses = Counter()
+    for part in parts:
+        statuses.update(part["statuses"])
+    elapsed = max(part["elapsed"] for part in parts)
+    completed = len(latencies)
+    ok = statuses.get(200, 0)
+    return {
+        "scenario": scenario.name,
+        "target_rps": args.rps,
+        "duration_s": round(elapsed, 3),
+        "sent": completed + sum(v for k, v in statuses.items() if not isinstance(k, int)),
+        "completed": completed,
+        "ok": ok,
+        "dropped": sum(part["dropped"] for part in parts),
+        "statuses": {str(k): v for k, v in sorted(statuses.items(), key=lambda item: str(item[0]))},
+        "throughput_rps": round(completed / elapsed, 2),
+        "ok_rps": round(ok / elapsed, 2),
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 0.50)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(max(latencies) if latencies else None),
+        },
+        "cpu_ms_per_request": round(cpu_used * 1000 / completed, 3) if completed else None,
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results: List[dict], baseline: Optional[Dict[str, dict]] = None):
+    print(f"{'scenario':<9} {'req/s':>8} {'ok/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'cpu ms/req':>10} {'dropped':>7} {'errors':>6}")
+    for result in results:
+        latency = result["latency_ms"]
+        errors = result["completed"] - result["ok"] + result["sent"] - result["completed"]
+        print(f"{result['scenario']:<9} {result['throughput_rps']:>8.1f} {result['ok_rps']:>8.1f} "
+              f"{latency['p50'] or 0:>8.2f} {latency['p95'] or 0:>8.2f} {latency['p99'] or 0:>8.2f} "
+              f"{result['cpu_ms_per_request'] or 0:>10.3f} {result['dropped']:>7} {errors:>6}")
+        previous = (baseline or {}).get(result["scenario"])
+        if previous:
+            print(f"{'  Δ%':<9} {delta(result['throughput_rps'], previous['throughput_rps']):>8} "
+                  f"{delta(result['ok_rps'], previous['ok_rps']):>8} "
+                  + " ".join(f"{delta(latency[q], previous['latency_ms'][q]):>8}" for q in ("p50", "p95", "p99"))
+                  + f" {delta(result['cpu_ms_per_request'], previous['cpu_ms_per_request']):>10}")
+
+
+def delta(current: Optional[float], previous: Optional[float]) -> str:
+    if not current or not previous:
+        return "-"
+    return f"{(current - previous) / previous * 100:+.1f}"
+
+
+def main(args):
+    available = scenarios(args)
+    unknown = set(args.scenarios) - set(available)
+    if unknown:
+        raise SystemExit(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {result["scenario"]: result for result in json.load(f)["results"]}
+
+    stub_urls, stubs = start_stubs(args)
+    redis_address, redis_process = start_redis(args.redis)
+    args.redis_address = ":".join(map(str, redis_address)) if redis_address else None
+    results = []
+    try:
+        for name in args.scenarios:
+            results.append(run_scenario(args, available[name], stub_urls, redis_address))
+    finally:
+        stop(redis_process)
+        for process in stubs:
+            stop(process)
+
+    print_table(results, baseline)
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "gateway_logs")},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", default=["cold", "hot", "mixed", "degraded"])
+    parser.add_argument("--rps", type=float, default=200.0, help="целевой RPS на сценарий")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=1, help="воркеров gunicorn у шлюза")
+    parser.add_argument("--clients", type=int, default=2, help="процессов-генераторов нагрузки")
+    parser.add_argument("--max-inflight", type=int, default=256,
+                        help="одновременных запросов на процесс; сверх лимита запрос считается dropped")
+    parser.add_argument("--redis", default="auto",
+                        help="auto (redis-server, если установлен, иначе none), none, fake, server или host:port")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="базовая задержка stub-сервисов")
+    parser.add_argument("--jitter-ms", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--orders-per-user", type=int, default=3)
+    parser.add_argument("--hot-users", type=int, default=50, help="размер прогретого набора")
+    parser.add_argument("--hot-ratio", type=float, default=0.8, help="доля горячих запросов в mixed")
+    parser.add_argument("--degraded-error-rate", type=float, default=0.3)
+    parser.add_argument("--degraded-latency-factor", type=float, default=10.0)
+    parser.add_argument("--gateway-logs", action="store_true", help="не скрывать логи шлюза")
+    parser.add_argument("--output", help="куда сохранить результаты в JSON")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    main(parser.parse_args())
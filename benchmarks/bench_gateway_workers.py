@@ -0,0 +1,152 @@
+"""
+Бенчмарк: пропускная способность шлюза при 1/2/4/8 воркерах gunicorn.
+
+Поднимает user/order/product-service и шлюз (gunicorn -c gunicorn.conf.py) на
+свободных портах, нагружает /api/profile/{id} из нескольких процессов и
+сверяет число отправленных запросов с суммой http_requests_total из /metrics,
+т.е. проверяет, что метрики агрегируются по всем воркерам.
+
+    python benchmarks/bench_gateway_workers.py --workers 1 2 4 8 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Tuple
+
+import httpx
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SERVICES = {
+    "USER_SERVICE_URL": "user-service",
+    "ORDER_SERVICE_URL": "order-service",
+    "PRODUCT_SERVICE_URL": "product-service",
+}
+PROFILE_IDS = ("user123", "user456")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} не поднялся за {timeout} секунд")
+
+
+def start_services() -> Tuple[dict, list]:
+    env, processes = {}, []
+    for variable, directory in SERVICES.items():
+        port = free_port()
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "error"],
+            cwd=os.path.join(ROOT, directory)
+        ))
+        env[variable] = f"http://127.0.0.1:{port}"
+        wait_ready(f"{env[variable]}/health")
+    return env, processes
+
+
+def start_gateway(workers: int, service_env: dict) -> Tuple[str, subprocess.Popen]:
+    port = free_port()
+    env = {
+        **os.environ,
+        **service_env,
+        "GATEWAY_WORKERS": str(workers),
+        "GATEWAY_BIND": f"127.0.0.1:{port}",
+        "PROMETHEUS_MULTIPROC_DIR": tempfile.mkdtemp(prefix="gateway-metrics-"),
+        # Redis не нужен: каждый воркер использует свой in-memory кэш
+        "REDIS_HOST": "127.0.0.1",
+        "REDIS_PORT": str(free_port()),
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", "app.main:app"],
+        cwd=os.path.join(ROOT, "api-gateway"),
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    wait_ready(f"{url}/")
+    return url, process
+
+
+async def client_loop(url: str, duration: float, concurrency: int) -> list:
+    latencies = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=10.0) as client:
+        async def worker(index: int):
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.get(f"/api/profile/{PROFILE_IDS[index % len(PROFILE_IDS)]}")
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                index += 1
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return latencies
+
+
+def run_client(args) -> list:
+    return asyncio.run(client_loop(*args))
+
+
+def percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def profile_requests_total(url: str) -> int:
+    text = httpx.get(f"{url}/metrics").text
+    pattern = r'^http_requests_total\{[^}]*endpoint="/api/profile/[^"]+"[^}]*status="200"[^}]*\} ([0-9.e+]+)$'
+    return int(sum(float(value) for value in re.findall(pattern, text, re.MULTILINE)))
+
+
+def main(args):
+    service_env, services = start_services()
+    try:
+        print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'sent':>8} {'metrics':>8}")
+        for workers in args.workers:
+            url, gateway = start_gateway(workers, service_env)
+            try:
+                for profile_id in PROFILE_IDS:  # прогрев кэша
+                    httpx.get(f"{url}/api/profile/{profile_id}")
+                baseline = profile_requests_total(url)
+                with multiprocessing.Pool(args.clients) as pool:
+                    results = pool.map(run_client, [(url, args.duration, args.concurrency)] * args.clients)
+                latencies = [latency for result in results for latency in result]
+                counted = profile_requests_total(url) - baseline
+                print(f"{workers:>7} {len(latencies) / args.duration:>9.0f} "
+                      f"{percentile(latencies, 0.50) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f} "
+                      f"{len(latencies):>8} {counted:>8}")
+            finally:
+                gateway.terminate()
+                gateway.wait()
+    finally:
+        for process in services:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=4, help="процессов-генераторов нагрузки")
+    parser.add_argument("--concurrency", type=int, default=32, help="одновременных запросов на процесс")
+    main(parser.parse_args())
@@ -0,0 +1,112 @@
+"""
+Бенчмарк: сериализация профиля и обработка попадания в кэш с разными кодеками.
+
+1. dumps/loads профиля: json (стандартная библиотека), orjson, msgpack (если установлен).
+2. Запросов в секунду на одно ядро для отдачи закэшированного профиля:
+   прежний путь (json.loads → dict → jsonable_encoder → JSONResponse) против
+   отдачи сохранённых байтов записи кэша (entry.json_body()) с полями ответа
+   в заголовках, как в profile_response шлюза.
+
+    python benchmarks/bench_json_codec.py --orders 50 --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI, Response
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api-gateway"))
+
+from app.cache import CacheEntry  # noqa: E402
+from app.codec import get_codec  # noqa: E402
+
+
+def build_profile(orders: int) -> dict:
+    return {
+        "user": {"id": "user123", "username": "ivan_ivanov", "email": "ivan@example.com",
+                 "full_name": "Иван Иванов", "is_active": True, "created_at": "2023-01-15T10:30:00Z"},
+        "orders": [
+            {"id": f"order{i}", "user_id": "user123", "status": "доставлен", "total_amount": 299.99,
+             "items": [{"product_id": f"prod{i % 20}", "quantity": 2, "price": 99.99}],
+             "created_at": "2023-11-15T14:30:00Z"}
+            for i in range(orders)
+        ],
+        "products": {
+            f"prod{i}": {"id": f"prod{i}", "name": "Ноутбук", "description": "Мощный ноутбук для работы и игр",
+                         "price": 999.99, "category": "Электроника", "stock_quantity": 50}
+            for i in range(min(orders, 20))
+        },
+        "metadata": {"user_id": "user123", "orders_count": orders, "products_count": min(orders, 20),
+                     "aggregated_at": "2023-12-01T09:15:00", "cache_ttl": 30, "degraded": False}
+    }
+
+
+def bench_codecs(profile: dict, iterations: int):
+    print(f"{'codec':<8} {'bytes':>8} {'dumps/s':>10} {'loads/s':>10}")
+    for name in ("json", "orjson", "msgpack"):
+        try:
+            codec = get_codec(name)
+        except RuntimeError:
+            print(f"{name:<8} не установлен")
+            continue
+        data = codec.dumps(profile)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            codec.dumps(profile)
+        dumps_rate = iterations / (time.perf_counter() - start)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            codec.loads(data)
+        loads_rate = iterations / (time.perf_counter() - start)
+        print(f"{name:<8} {len(data):>8} {dumps_rate:>10.0f} {loads_rate:>10.0f}")
+
+
+def build_app(profile: dict) -> FastAPI:
+    legacy_payload = json.dumps(profile).encode("utf-8")
+    entry = CacheEntry.create(profile, ttl=30)
+    app = FastAPI()
+
+    @app.get("/legacy")
+    async def legacy():
+        cached = json.loads(legacy_payload.decode("utf-8"))
+        return {**cached, "metadata": {**cached["metadata"], "cached": True, "cache_status": "fresh"}}
+
+    @app.get("/bytes")
+    async def raw_bytes():
+        headers = {"X-Cache": "HIT", "X-Cache-Status": "fresh", "X-Response-Time-Ms": "0.1"}
+        return Response(content=entry.json_body(), media_type="application/json", headers=headers)
+
+    return app
+
+
+async def bench_requests(app: FastAPI, requests: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in ("/legacy", "/bytes"):
+            for _ in range(min(requests, 200)):  # прогрев
+                await client.get(path)
+            # Один процесс и один event loop — это пропускная способность одного ядра
+            start = time.perf_counter()
+            for _ in range(requests):
+                await client.get(path)
+            elapsed = time.perf_counter() - start
+            print(f"{path:<8} {requests / elapsed:>8.0f} req/s на ядро")
+
+
+def main(args):
+    profile = build_profile(args.orders)
+    bench_codecs(profile, args.iterations)
+    print()
+    asyncio.run(bench_requests(build_app(profile), args.requests))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=5000)
+    main(parser.parse_args())
@@ -0,0 +1,157 @@
+"""
+Бенчмарк: пропускная способность запросов с логированием и без.
+
+Обработчик пишет в лог то же, что сборка профиля при сбое микросервиса:
+несколько service_unavailable и profile_aggregated на запрос. Режимы:
+
+    off     — уровень CRITICAL, записи отбрасываются до рендеринга
+    before  — прежняя настройка: stdlib logging, JSONRenderer на json, запись в обработчике
+    sync    — новый конвейер (orjson, отбор повторов), но запись в обработчике (LOG_ASYNC=false)
+    async   — новый конвейер с очередью и фоновым потоком записи
+
+Отбор повторов касается только записей от LOG_SAMPLE_LEVEL (warning): число
+service_unavailable ограничивается, profile_aggregated пишется на каждый запрос.
+
+--slow-write-ms добавляет задержку к каждой записи в поток вывода (медленный
+stdout или драйвер логов Docker): синхронная запись блокирует event loop.
+
+    python benchmarks/bench_logging.py --requests 5000 --slow-write-ms 0.2
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+import structlog
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api-gateway"))
+
+from app import config, log_pipeline  # noqa: E402
+
+MODES = ("off", "before", "sync", "async")
+
+
+class SlowStream:
+    """Поток вывода с задержкой на каждую запись"""
+
+    def __init__(self, stream, delay: float):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, data):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def configure_before(stream):
+    """Настройка логирования шлюза до перехода на очередь"""
+    handler = logging.StreamHandler(stream)
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    structlog.reset_defaults()
+    structlog.configure(
+        processors=[
+            structlog.stdlib.filter_by_level,
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+            structlog.processors.UnicodeDecoder(),
+            structlog.processors.JSONRenderer()
+        ],
+        context_class=dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        cache_logger_on_first_use=True,
+    )
+
+
+class TextStream:
+    """stdlib StreamHandler пишет строки, а файл вывода открыт в двоичном режиме"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text: str):
+        self.stream.write(text.encode("utf-8"))
+
+    def flush(self):
+        self.stream.flush()
+
+
+def configure(mode: str, stream):
+    logging.getLogger().handlers[:] = []
+    if mode == "before":
+        configure_before(TextStream(stream))
+        return
+    structlog.reset_defaults()
+    log_pipeline.configure(level="CRITICAL" if mode == "off" else "INFO", use_queue=mode != "sync", stream=stream)
+
+
+def build_app(failing_calls: int) -> FastAPI:
+    app = FastAPI()
+    # Логгер создаётся после настройки режима: structlog кэширует его при первом использовании
+    logger = structlog.get_logger()
+
+    @app.get("/api/profile/{user_id}")
+    async def get_profile(user_id: str):
+        for service in ("order_service", "product_service", "user_service")[:failing_calls]:
+            logger.error("service_unavailable", service=service, error="All connection attempts failed",
+                         url=f"http://{service}/batch")
+        logger.info("profile_aggregated", user_id=user_id, response_time_ms=12.5, cached=False)
+        return {"user_id": user_id}
+
+    return app
+
+
+async def drive(app: FastAPI, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for i in range(requests):
+            await client.get(f"/api/profile/user{i % 1000}")
+        return requests / (time.perf_counter() - start)
+
+
+def main(args):
+    config.LOG_SAMPLE_BURST = args.sample_burst
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in MODES:
+            path = os.path.join(tmp, f"{mode}.log")
+            with open(path, "ab") as output:
+                configure(mode, SlowStream(output, args.slow_write_ms / 1000))
+                log_pipeline.state.update(written=0, dropped=0, suppressed=0)
+                rate = asyncio.run(drive(build_app(args.failing_calls), args.requests))
+                log_pipeline.flush()
+            with open(path, "rb") as f:
+                lines = sum(1 for _ in f)
+            extra = ""
+            if mode in ("sync", "async"):
+                extra = (f"  suppressed={log_pipeline.state['suppressed']}"
+                         f"  dropped={log_pipeline.state['dropped']}")
+            print(f"{mode:<7} {rate:>8.0f} req/s  lines={lines:<7}{extra}")
+    log_pipeline.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--failing-calls", type=int, default=2, choices=(0, 1, 2, 3),
+                        help="записей service_unavailable на запрос")
+    parser.add_argument("--slow-write-ms", type=float, default=0.0,
+                        help="задержка каждой записи в поток вывода")
+    parser.add_argument("--sample-burst", type=int, default=config.LOG_SAMPLE_BURST,
+                        help="LOG_SAMPLE_BURST, 0 — без отбора повторов")
+    main(parser.parse_args())
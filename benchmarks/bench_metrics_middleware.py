@@ -0,0 +1,95 @@
+"""
+Бенчмарк: накладные расходы метрик HTTP-запросов до и после перехода на ASGI middleware.
+
+"before" — прежний @app.middleware("http") с меткой endpoint=request.url.path и
+вызовом .labels() на каждый запрос; "after" — PrometheusMiddleware шлюза
+(шаблон маршрута, закэшированные дочерние метрики). Запросы идут к
+/api/profile/{user_id} с разными user_id; кроме req/s выводится число
+временных рядов и время формирования /metrics.
+
+    python benchmarks/bench_metrics_middleware.py --requests 5000 --users 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api-gateway"))
+
+from app.middleware import PrometheusMiddleware  # noqa: E402
+
+
+def add_routes(app: FastAPI):
+    @app.get("/api/profile/{user_id}")
+    async def profile(user_id: str):
+        return {"user_id": user_id}
+
+    @app.get("/metrics")
+    async def metrics():
+        return {}
+
+
+def build_before(registry: CollectorRegistry) -> FastAPI:
+    request_count = Counter('http_requests_total', 'Total HTTP requests',
+                            ['method', 'endpoint', 'status'], registry=registry)
+    request_latency = Histogram('http_request_duration_seconds', 'HTTP request latency in seconds',
+                                ['method', 'endpoint'], registry=registry)
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def prometheus_middleware(request: Request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        if request.url.path != "/metrics":
+            request_latency.labels(method=request.method, endpoint=request.url.path).observe(time.time() - start_time)
+            request_count.labels(method=request.method, endpoint=request.url.path,
+                                 status=response.status_code).inc()
+        return response
+
+    add_routes(app)
+    return app
+
+
+def build_after() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(PrometheusMiddleware)
+    add_routes(app)
+    return app
+
+
+async def drive(app: FastAPI, requests: int, users: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for i in range(requests):
+            await client.get(f"/api/profile/user{i % users}")
+        return requests / (time.perf_counter() - start)
+
+
+def report(name: str, rate: float, registry):
+    start = time.perf_counter()
+    text = generate_latest(registry)
+    render_ms = (time.perf_counter() - start) * 1000
+    series = sum(1 for line in text.decode().splitlines()
+                 if line.startswith(("http_requests_total{", "http_request_duration_seconds_bucket{")))
+    print(f"{name:<8} {rate:>8.0f} req/s  series={series:<7} /metrics={render_ms:7.2f}ms ({len(text)} bytes)")
+
+
+def main(args):
+    from prometheus_client import REGISTRY
+
+    before_registry = CollectorRegistry()
+    report("before", asyncio.run(drive(build_before(before_registry), args.requests, args.users)), before_registry)
+    report("after", asyncio.run(drive(build_after(), args.requests, args.users)), REGISTRY)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=1000, help="разных user_id в URL")
+    main(parser.parse_args())
@@ -0,0 +1,100 @@
+"""
+Бенчмарк: линейный перебор списка заказов против индексированных хранилищ order-service.
+
+Генерирует --orders заказов для --users пользователей и измеряет p50/p99
+задержки поиска заказов пользователя и заказа по id для каждого варианта.
+
+    python benchmarks/bench_order_store.py --orders 1000000 --users 100000 --lookups 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "order-service"))
+
+from store import InMemoryOrderStore, SQLiteOrderStore  # noqa: E402
+
+
+def generate_orders(total: int, users: int) -> list:
+    rng = random.Random(42)
+    return [
+        {
+            "id": f"order{i}",
+            "user_id": f"user{rng.randrange(users)}",
+            "status": "доставлен",
+            "total_amount": 99.99,
+            "items": [{"product_id": f"prod{rng.randrange(1000)}", "quantity": 1, "price": 99.99}]
+        }
+        for i in range(total)
+    ]
+
+
+class LinearScan:
+    """Прежняя реализация: список и полный перебор на каждый запрос"""
+
+    def __init__(self, orders: list):
+        self.orders = orders
+
+    def list_by_user(self, user_id: str, limit: int):
+        return [order for order in self.orders if order["user_id"] == user_id][:limit], None
+
+    def get(self, order_id: str):
+        return next((order for order in self.orders if order["id"] == order_id), None)
+
+
+def measure(fn, keys: list) -> list:
+    samples = []
+    for key in keys:
+        start = time.perf_counter()
+        fn(key)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def report(name: str, samples: list):
+    print(f"{name:<24} p50={percentile(samples, 0.50) * 1000:9.3f}ms "
+          f"p99={percentile(samples, 0.99) * 1000:9.3f}ms "
+          f"mean={statistics.mean(samples) * 1000:9.3f}ms")
+
+
+def main(args):
+    orders = generate_orders(args.orders, args.users)
+    rng = random.Random(7)
+    user_keys = [f"user{rng.randrange(args.users)}" for _ in range(args.lookups)]
+    order_keys = [f"order{rng.randrange(args.orders)}" for _ in range(args.lookups)]
+
+    memory = InMemoryOrderStore()
+    start = time.perf_counter()
+    for order in orders:
+        memory.add(order)
+    print(f"memory: загрузка {args.orders} заказов за {time.perf_counter() - start:.2f}s")
+
+    sqlite = SQLiteOrderStore(":memory:")
+    start = time.perf_counter()
+    sqlite.add_many(orders)
+    print(f"sqlite: загрузка {args.orders} заказов за {time.perf_counter() - start:.2f}s")
+
+    stores = (("linear", LinearScan(orders)), ("memory", memory), ("sqlite", sqlite))
+    for name, store in stores:
+        # Перебор миллиона заказов медленный, поэтому для него хватит небольшой выборки
+        count = args.linear_lookups if name == "linear" else args.lookups
+        report(f"{name} by user", measure(lambda key: store.list_by_user(key, args.limit), user_keys[:count]))
+        report(f"{name} by id", measure(store.get, order_keys[:count]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--linear-lookups", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=100)
+    main(parser.parse_args())
@@ -0,0 +1,128 @@
+"""
+Бенчмарк: накладные расходы трассировки шлюза на запрос.
+
+Маршрут повторяет форму сборки профиля: поиск в кэше, два параллельных этапа
+с запросами к «микросервисам» (traceparent в заголовках), выделение id товаров,
+запрос товаров и сериализация — всего около десяти спанов. Режимы:
+
+    off        — без TracingMiddleware
+    propagate  — trace_id и traceparent без записи спанов (экспортёр не настроен)
+    tail       — все спаны записываются ради tail-сэмплинга, трасса не сохраняется
+    head       — каждая трасса сохраняется и выгружается в OTLP/JSON
+
+Накладные расходы — разница времени на запрос с режимом off (лучший из
+--repeat прогонов) и собственный замер модуля трассировки. Код выхода 1, если
+режим tail превышает бюджет TRACING_OVERHEAD_BUDGET_US.
+
+    python benchmarks/bench_tracing_overhead.py --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI, Response
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api-gateway"))
+
+from app import config, tracing  # noqa: E402
+from app.codec import json_dumps  # noqa: E402
+from app.middleware import TracingMiddleware  # noqa: E402
+
+MODES = ("off", "propagate", "tail", "head")
+
+
+async def fake_upstream(name: str) -> dict:
+    with tracing.span(f"POST {name}", tracing.SPAN_KIND_CLIENT, **{"peer.service": name}) as span:
+        headers = tracing.inject()
+        await asyncio.sleep(0)
+        span.set("http.status_code", 200)
+        return headers
+
+
+def build_app(traced: bool) -> FastAPI:
+    app = FastAPI()
+    profile = {"user": {"id": "user1"}, "orders": [{"id": f"o{i}", "items": [{"product_id": f"p{i}"}]}
+                                                   for i in range(20)]}
+
+    @app.get("/api/profile/{user_id}")
+    async def get_profile(user_id: str):
+        with tracing.span("cache.lookup") as span:
+            span.set("cache.hit", False)
+
+        async def stage(name: str, upstream: str):
+            with tracing.span(f"aggregate.{name}"):
+                return await fake_upstream(upstream)
+
+        await asyncio.gather(stage("user", "user_service"), stage("orders", "order_service"))
+        with tracing.span("aggregate.product_ids"):
+            product_ids = [item["product_id"] for order in profile["orders"] for item in order["items"]]
+        await stage("products", "product_service")
+        with tracing.span("profile.serialize") as span:
+            body = json_dumps({**profile, "products": product_ids})
+            span.set("body.bytes", len(body))
+        return Response(body, media_type="application/json")
+
+    if traced:
+        app.add_middleware(TracingMiddleware)
+    return app
+
+
+def configure(mode: str, export_path: str):
+    config.TRACING_EXPORT_PATH = "" if mode == "propagate" else export_path
+    config.TRACING_SAMPLE_RATE = 1.0 if mode == "head" else 0.0
+    config.TRACING_SLOW_MS = 1e9
+    # Бюджет проверяется здесь, а не в шлюзе: tail-сэмплинг не отключается на время замера
+    config.TRACING_TAIL_SAMPLING = mode != "propagate"
+    tracing.state.update(tail_sampling=config.TRACING_TAIL_SAMPLING, overhead_us=0.0)
+    tracing._queue.clear()
+
+
+async def drive(app: FastAPI, requests: int) -> float:
+    """Микросекунды на запрос, включая выгрузку сохранённых трасс"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(50):  # прогрев
+            await client.get(f"/api/profile/user{i}")
+        tracing._queue.clear()
+        start = time.perf_counter()
+        for i in range(requests):
+            await client.get(f"/api/profile/user{i}")
+            if len(tracing._queue) >= 500:
+                await tracing.export_pending()
+        await tracing.export_pending()
+        return (time.perf_counter() - start) / requests * 1e6
+
+
+def main(args) -> int:
+    budget = args.budget_us if args.budget_us is not None else config.TRACING_OVERHEAD_BUDGET_US
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        export_path = os.path.join(tmp, "traces.jsonl")
+        for mode in MODES:
+            configure(mode, export_path)
+            app = build_app(traced=mode != "off")
+            results[mode] = min(asyncio.run(drive(app, args.requests)) for _ in range(args.repeat))
+            self_us = tracing.state["overhead_us"] if mode in ("tail", "head") else None
+            delta = results[mode] - results["off"]
+            print(f"{mode:<10} {results[mode]:8.1f} us/req  overhead={delta:7.1f} us"
+                  + (f"  self-measured={self_us:6.1f} us" if self_us is not None else ""))
+        exported = os.path.getsize(export_path) if os.path.exists(export_path) else 0
+        print(f"exported {exported / 1024:.0f} KiB OTLP/JSON")
+
+    overhead = results["tail"] - results["off"]
+    verdict = "OK" if overhead <= budget else "OVER BUDGET"
+    print(f"tail-sampling overhead {overhead:.1f} us vs budget {budget:.0f} us: {verdict}")
+    return 0 if overhead <= budget else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget-us", type=float, default=None,
+                        help="бюджет на запрос, по умолчанию TRACING_OVERHEAD_BUDGET_US")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,106 @@
+"""
+Бенчмарк: новый httpx.AsyncClient на каждый запрос против общего пула соединений.
+
+Поднимает локальный stub user-service на свободном порту и измеряет p50/p99
+задержки запроса к нему в обоих режимах.
+
+    python benchmarks/bench_upstream_pool.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api-gateway"))
+
+
+def build_stub() -> FastAPI:
+    stub = FastAPI()
+
+    @stub.get("/users/{user_id}")
+    async def get_user(user_id: str):
+        return {"id": user_id, "username": "stub"}
+
+    return stub
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(build_stub(), host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def per_call_client(url: str) -> float:
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=5.0) as client:
+        await client.get(url)
+    return time.perf_counter() - start
+
+
+async def pooled_client(url: str) -> float:
+    from app import upstream
+
+    start = time.perf_counter()
+    await upstream.get_client("user_service").get(url)
+    return time.perf_counter() - start
+
+
+async def run(mode, url: str, total: int, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await mode(url)
+
+    return await asyncio.gather(*(one() for _ in range(total)))
+
+
+def percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def report(name: str, samples: list):
+    print(f"{name:<12} p50={percentile(samples, 0.50) * 1000:7.2f}ms "
+          f"p99={percentile(samples, 0.99) * 1000:7.2f}ms "
+          f"mean={statistics.mean(samples) * 1000:7.2f}ms")
+
+
+async def main(args):
+    from app import upstream
+
+    port = free_port()
+    server = start_stub(port)
+    url = f"http://127.0.0.1:{port}/users/user123"
+    upstream.UPSTREAMS["user_service"] = f"http://127.0.0.1:{port}"
+    await upstream.open_clients()
+    try:
+        for name, mode in (("per-call", per_call_client), ("pooled", pooled_client)):
+            await run(mode, url, min(args.requests, 100), args.concurrency)  # прогрев
+            report(name, await run(mode, url, args.requests, args.concurrency))
+    finally:
+        await upstream.close_clients()
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,165 @@
+"""
+Stub-версии user/order/product-service для нагрузочных тестов шлюза.
+
+Отвечают на те же запросы, что делает шлюз, для любого id (данные
+детерминированно выводятся из id), с настраиваемой задержкой, разбросом и
+долей ошибок 503. Параметры можно поменять на лету: POST /_stub/faults
+{"latency_ms": 5, "jitter_ms": 2, "error_rate": 0.1}.
+
+    python benchmarks/stub_upstreams.py --service order --port 9002 --latency-ms 5
+"""
+import argparse
+import asyncio
+import random
+import zlib
+from dataclasses import asdict, dataclass
+from typing import List
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+SERVICES = ("user", "order", "product")
+
+
+@dataclass
+class Faults:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+
+
+class FaultsUpdate(BaseModel):
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+
+
+class UsersBatch(BaseModel):
+    user_ids: List[str]
+
+
+class ProductsBatch(BaseModel):
+    product_ids: List[str]
+
+
+def make_user(user_id: str) -> dict:
+    return {
+        "id": user_id,
+        "username": f"stub_{user_id}",
+        "email": f"{user_id}@example.com",
+        "full_name": f"Stub {user_id}",
+        "is_active": True,
+        "created_at": "2023-01-15T10:30:00Z"
+    }
+
+
+def make_orders(user_id: str, orders_per_user: int, products: int) -> list:
+    seed = zlib.crc32(user_id.encode())
+    orders = []
+    for n in range(orders_per_user):
+        items = [
+            {"product_id": f"prod{(seed + n * 7 + k * 13) % products}", "quantity": 1 + k, "price": 99.99}
+            for k in range(2)
+        ]
+        orders.append({
+            "id": f"order-{user_id}-{n}",
+            "user_id": user_id,
+            "status": "доставлен",
+            "total_amount": round(sum(item["price"] * item["quantity"] for item in items), 2),
+            "items": items,
+            "created_at": "2023-11-15T10:30:00Z"
+        })
+    return orders
+
+
+def make_product(product_id: str) -> dict:
+    return {
+        "id": product_id,
+        "name": f"Товар {product_id}",
+        "description": "Тестовый товар",
+        "price": 99.99,
+        "category": "stub",
+        "in_stock": True
+    }
+
+
+def build_app(service: str, faults: Faults, orders_per_user: int = 3, products: int = 1000) -> FastAPI:
+    stub = FastAPI(title=f"Stub {service}-service", default_response_class=ORJSONResponse)
+
+    async def simulate():
+        """Задержка с разбросом; None или ответ 503 с вероятностью error_rate"""
+        delay = faults.latency_ms + random.uniform(0, faults.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if faults.error_rate and random.random() < faults.error_rate:
+            return ORJSONResponse({"error": "stub failure"}, status_code=503)
+        return None
+
+    @stub.get("/health")
+    async def health():
+        return {"status": "healthy", "service": f"{service}-service", "stub": True}
+
+    @stub.get("/_stub/faults")
+    async def get_faults():
+        return asdict(faults)
+
+    @stub.post("/_stub/faults")
+    async def set_faults(update: FaultsUpdate):
+        faults.latency_ms, faults.jitter_ms, faults.error_rate = update.latency_ms, update.jitter_ms, update.error_rate
+        return asdict(faults)
+
+    if service == "user":
+        @stub.get("/users/{user_id}")
+        async def get_user(user_id: str):
+            return await simulate() or ORJSONResponse(make_user(user_id))
+
+        @stub.post("/users/batch")
+        async def get_users_batch(request: UsersBatch):
+            return await simulate() or ORJSONResponse([make_user(uid) for uid in request.user_ids])
+
+    elif service == "order":
+        @stub.get("/orders/user/{user_id}")
+        async def get_user_orders(user_id: str):
+            return await simulate() or ORJSONResponse(make_orders(user_id, orders_per_user, products))
+
+        @stub.post("/orders/batch-by-user")
+        async def get_orders_batch_by_user(request: UsersBatch):
+            return await simulate() or ORJSONResponse({
+                uid: make_orders(uid, orders_per_user, products) for uid in request.user_ids
+            })
+
+    elif service == "product":
+        @stub.get("/products/{product_id}")
+        async def get_product(product_id: str):
+            return await simulate() or ORJSONResponse(make_product(product_id))
+
+        @stub.post("/products/batch")
+        async def get_products_batch(request: ProductsBatch):
+            return await simulate() or ORJSONResponse([make_product(pid) for pid in request.product_ids])
+
+    else:
+        raise ValueError(f"Неизвестный сервис: {service}")
+
+    return stub
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--service", choices=SERVICES, required=True)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--orders-per-user", type=int, default=3)
+    parser.add_argument("--products", type=int, default=1000, help="размер каталога товаров")
+    args = parser.parse_args()
+    app = build_app(
+        args.service,
+        Faults(args.latency_ms, args.jitter_ms, args.error_rate),
+        orders_per_user=args.orders_per_user,
+        products=args.products,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="error")
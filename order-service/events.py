@@ -0,0 +1,60 @@
+import os
+import time
+from typing import Iterable, Optional
+
+import redis
+
+# События изменений пишутся в Redis Stream; шлюз читает его и сбрасывает затронутые профили
+CHANGE_EVENTS_ENABLED = os.getenv("CHANGE_EVENTS_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+CHANGE_EVENTS_STREAM = os.getenv("CHANGE_EVENTS_STREAM", "change-events")
+CHANGE_EVENTS_MAXLEN = int(os.getenv("CHANGE_EVENTS_MAXLEN", 10000))
+
+
+class EventPublisher:
+    """Публикация событий изменений в Redis Stream
+
+    Ошибка Redis не отменяет запись: событие теряется, и профиль обновится по
+    TTL кэша шлюза. Длина потока ограничена примерно CHANGE_EVENTS_MAXLEN.
+    """
+
+    def __init__(self, stream: str = CHANGE_EVENTS_STREAM, enabled: bool = CHANGE_EVENTS_ENABLED):
+        self.stream = stream
+        self.enabled = enabled
+        self.published = 0
+        self.failed = 0
+        self._client: Optional[redis.Redis] = None
+
+    def _redis(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.Redis(
+                host=os.getenv("REDIS_HOST", "redis"),
+                port=int(os.getenv("REDIS_PORT", 6379)),
+                db=int(os.getenv("REDIS_DB", 0)),
+                password=os.getenv("REDIS_PASSWORD", "redispass123"),
+                socket_connect_timeout=0.5,
+                socket_timeout=0.5,
+            )
+        return self._client
+
+    def publish(self, event_type: str, **fields) -> bool:
+        """Событие event_type; списки в полях передаются через запятую"""
+        if not self.enabled:
+            return False
+        payload = {"type": event_type, "ts": repr(time.time())}
+        for name, value in fields.items():
+            if value is None:
+                continue
+            if not isinstance(value, str) and isinstance(value, Iterable):
+                value = ",".join(value)
+            payload[name] = value
+        try:
+            self._redis().xadd(self.stream, payload, maxlen=CHANGE_EVENTS_MAXLEN, approximate=True)
+        except redis.RedisError as e:
+            self.failed += 1
+            print(f"  Не удалось опубликовать событие {event_type}: {e}")
+            return False
+        self.published += 1
+        return True
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "stream": self.stream, "published": self.published, "failed": self.failed}
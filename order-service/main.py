@@ -1,9 +1,29 @@
-from fastapi import FastAPI
+import os
+import uuid
+from datetime import datetime, timezone
 
-app = FastAPI(title="Order Service")
+import orjson
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Iterable, List, Literal, Optional
+
+from events import EventPublisher
+from store import create_store
+from tracing import SpanExporter, TracingMiddleware
+
+app = FastAPI(title="Order Service", default_response_class=ORJSONResponse)
+span_exporter = SpanExporter("order-service")
+app.add_middleware(TracingMiddleware, exporter=span_exporter)
+
+# Хранилище заказов: memory (по умолчанию) или sqlite
+ORDER_STORE = os.getenv("ORDER_STORE", "memory")
+ORDER_DB_PATH = os.getenv("ORDER_DB_PATH", "orders.db")
+DEFAULT_PAGE_LIMIT = int(os.getenv("ORDERS_PAGE_LIMIT", 100))
+MAX_PAGE_LIMIT = int(os.getenv("ORDERS_MAX_PAGE_LIMIT", 1000))
 
 # Тестовые данные заказов
-orders_db = [
+seed_orders = [
     {
         "id": "order123",
         "user_id": "user123",
@@ -37,23 +57,147 @@ orders_db = [
     }
 ]
 
+store = create_store(ORDER_STORE, ORDER_DB_PATH)
+if store.count() == 0:
+    for order in seed_orders:
+        store.add(order)
+
+# События изменений заказов для инвалидации профилей в шлюзе
+events = EventPublisher()
+
+class BatchByUserRequest(BaseModel):
+    user_ids: List[str]
+
+class OrderItem(BaseModel):
+    product_id: str
+    quantity: int = Field(ge=1)
+    price: float = Field(ge=0)
+
+class OrderCreate(BaseModel):
+    user_id: str
+    items: List[OrderItem] = Field(min_length=1)
+    status: str = "ожидает"
+
+class OrderUpdate(BaseModel):
+    status: Optional[str] = None
+    items: Optional[List[OrderItem]] = Field(None, min_length=1)
+
 @app.get("/")
 def root():
     return {
         "service": "order-service",
         "description": "Сервис управления заказами",
-        "endpoints": ["/health", "/orders/user/{user_id}", "/orders"]
+        "endpoints": [
+            "/health",
+            "/orders/user/{user_id}?limit=&cursor=&format=json|ndjson",
+            "/orders/batch-by-user (POST)",
+            "/orders/{order_id}",
+            "/orders?limit=&cursor=&format=json|ndjson",
+            "/orders (POST)",
+            "/orders/{order_id} (PATCH)"
+        ]
     }
 
 @app.get("/health")
 def health():
-    return {"status": "healthy", "service": "order-service"}
+    return {"status": "healthy", "service": "order-service", "events": events.stats(), "tracing": span_exporter.stats()}
+
+def page(response: Response, result):
+    """Страница списка; курсор следующей страницы — в заголовке X-Next-Cursor"""
+    orders, next_cursor = result
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return orders
+
+def ndjson(records: Iterable[dict]) -> StreamingResponse:
+    """Потоковая выдача по одной записи на строку, без сборки всего списка в памяти"""
+    lines = (orjson.dumps(record) + b"\n" for record in records)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
 @app.get("/orders/user/{user_id}")
-def get_user_orders(user_id: str):
-    user_orders = [order for order in orders_db if order["user_id"] == user_id]
-    return user_orders
+def get_user_orders(
+    user_id: str,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json"
+):
+    try:
+        if format == "ndjson":
+            return ndjson(store.iter_by_user(user_id, cursor))
+        return page(response, store.list_by_user(user_id, limit, cursor))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/orders/batch-by-user")
+def get_orders_batch_by_user(request: BatchByUserRequest):
+    # Для каждого запрошенного пользователя — все его заказы (возможно, пустой список):
+    # внутренний эндпоинт шлюза, профиль не должен обрезаться первой страницей
+    # Горячий путь шлюза: отдаём ORJSONResponse напрямую, минуя jsonable_encoder
+    return ORJSONResponse({
+        uid: list(store.iter_by_user(uid))
+        for uid in request.user_ids
+    })
+
+@app.get("/orders/{order_id}")
+def get_order(order_id: str):
+    order = store.get(order_id)
+    if not order:
+        return {"error": "Заказ не найден"}
+    return order
 
 @app.get("/orders")
-def get_orders():
-    return orders_db
+def get_orders(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json"
+):
+    try:
+        if format == "ndjson":
+            return ndjson(store.iter_all(cursor))
+        return page(response, store.list_all(limit, cursor))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def order_total(items: List[dict]) -> float:
+    return round(sum(item["price"] * item["quantity"] for item in items), 2)
+
+def publish_order_event(event_type: str, order: dict, previous: Optional[dict] = None):
+    """Событие об изменении заказа: шлюз сбросит профили его владельцев"""
+    user_ids = {order["user_id"]}
+    product_ids = {item["product_id"] for item in order["items"]}
+    if previous is not None:
+        user_ids.add(previous["user_id"])
+        product_ids.update(item["product_id"] for item in previous["items"])
+    events.publish(event_type, order_id=order["id"], user_ids=sorted(user_ids), product_ids=sorted(product_ids))
+
+@app.post("/orders", status_code=201)
+def create_order(request: OrderCreate):
+    items = [item.model_dump() for item in request.items]
+    order = {
+        "id": f"order-{uuid.uuid4().hex[:12]}",
+        "user_id": request.user_id,
+        "status": request.status,
+        "total_amount": order_total(items),
+        "items": items,
+        "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    }
+    store.add(order)
+    publish_order_event("order.created", order)
+    return order
+
+@app.patch("/orders/{order_id}")
+def update_order(order_id: str, request: OrderUpdate):
+    previous = store.get(order_id)
+    if not previous:
+        raise HTTPException(status_code=404, detail="Заказ не найден")
+    order = dict(previous)
+    if request.status is not None:
+        order["status"] = request.status
+    if request.items is not None:
+        order["items"] = [item.model_dump() for item in request.items]
+        order["total_amount"] = order_total(order["items"])
+    store.add(order)
+    publish_order_event("order.updated", order, previous)
+    return order
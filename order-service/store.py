@@ -0,0 +1,192 @@
+import base64
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+def encode_cursor(seq: int) -> str:
+    """Непрозрачный курсор: позиция последнего отданного заказа"""
+    return base64.urlsafe_b64encode(str(seq).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        seq = int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Некорректный курсор")
+    if seq < 0:
+        raise ValueError("Некорректный курсор")
+    return seq
+
+
+class OrderStore(ABC):
+    """Хранилище заказов с первичным индексом по id и вторичным по user_id
+
+    Неполная реализация не создаётся (TypeError при запуске сервиса), а не
+    падает посреди запроса.
+    """
+
+    @abstractmethod
+    def add(self, order: dict):
+        """Добавление заказа или замена заказа с тем же id"""
+
+    @abstractmethod
+    def get(self, order_id: str) -> Optional[dict]:
+        """Заказ по id; None, если его нет"""
+
+    @abstractmethod
+    def list_by_user(self, user_id: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """Страница заказов пользователя и курсор следующей страницы"""
+
+    @abstractmethod
+    def list_all(self, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """Страница всех заказов и курсор следующей страницы"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Число заказов"""
+
+    def iter_by_user(self, user_id: str, cursor: Optional[str] = None, page_size: int = 500) -> Iterator[dict]:
+        """Все заказы пользователя по порядку; в памяти держится только одна страница"""
+        return self._iterate(lambda limit, cursor: self.list_by_user(user_id, limit, cursor), cursor, page_size)
+
+    def iter_all(self, cursor: Optional[str] = None, page_size: int = 500) -> Iterator[dict]:
+        return self._iterate(self.list_all, cursor, page_size)
+
+    @staticmethod
+    def _iterate(list_page: Callable, cursor: Optional[str], page_size: int) -> Iterator[dict]:
+        # Курсор проверяем сразу, а не при первой итерации, когда ответ уже начат
+        decode_cursor(cursor)
+
+        def pages():
+            next_cursor = cursor
+            while True:
+                orders, next_cursor = list_page(page_size, next_cursor)
+                yield from orders
+                if not next_cursor:
+                    return
+
+        return pages()
+
+
+class InMemoryOrderStore(OrderStore):
+    """Заказы в памяти: поиск по id и по пользователю без полного перебора"""
+
+    def __init__(self):
+        self._seqs: Dict[str, int] = {}           # order_id -> seq
+        self._orders: List[dict] = []             # seq - 1 -> заказ
+        self._by_user: Dict[str, List[int]] = {}  # user_id -> seq заказов по возрастанию
+        self._lock = threading.Lock()
+
+    def add(self, order: dict):
+        with self._lock:
+            seq = self._seqs.get(order["id"])
+            if seq is not None:
+                previous = self._orders[seq - 1]
+                if previous["user_id"] != order["user_id"]:
+                    self._by_user[previous["user_id"]].remove(seq)
+                    self._insert_user_seq(order["user_id"], seq)
+                self._orders[seq - 1] = order
+                return
+            self._orders.append(order)
+            seq = len(self._orders)
+            self._seqs[order["id"]] = seq
+            self._by_user.setdefault(order["user_id"], []).append(seq)
+
+    def _insert_user_seq(self, user_id: str, seq: int):
+        seqs = self._by_user.setdefault(user_id, [])
+        seqs.insert(bisect_right(seqs, seq), seq)
+
+    def get(self, order_id: str) -> Optional[dict]:
+        seq = self._seqs.get(order_id)
+        return self._orders[seq - 1] if seq else None
+
+    def list_by_user(self, user_id, limit, cursor=None):
+        seqs = self._by_user.get(user_id, [])
+        start = bisect_right(seqs, decode_cursor(cursor))
+        page = seqs[start:start + limit]
+        next_cursor = encode_cursor(page[-1]) if start + limit < len(seqs) else None
+        return [self._orders[seq - 1] for seq in page], next_cursor
+
+    def list_all(self, limit, cursor=None):
+        start = decode_cursor(cursor)
+        page = self._orders[start:start + limit]
+        next_cursor = encode_cursor(start + limit) if start + limit < len(self._orders) else None
+        return page, next_cursor
+
+    def count(self) -> int:
+        return len(self._orders)
+
+
+class SQLiteOrderStore(OrderStore):
+    """Заказы в SQLite с индексами по id и (user_id, seq)"""
+
+    def __init__(self, path: str = ":memory:"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS orders ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " id TEXT NOT NULL UNIQUE,"
+                " user_id TEXT NOT NULL,"
+                " data TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS orders_user_seq ON orders (user_id, seq)")
+
+    def add(self, order: dict):
+        self.add_many([order])
+
+    def add_many(self, orders: List[dict]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO orders (id, user_id, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET user_id = excluded.user_id, data = excluded.data",
+                [(order["id"], order["user_id"], json.dumps(order)) for order in orders]
+            )
+
+    def get(self, order_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM orders WHERE id = ?", (order_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _page(self, sql: str, params: tuple, limit: int) -> Tuple[List[dict], Optional[str]]:
+        # Берём на одну строку больше, чтобы узнать, есть ли следующая страница
+        with self._lock:
+            rows = self._conn.execute(sql, params + (limit + 1,)).fetchall()
+        page = rows[:limit]
+        next_cursor = encode_cursor(page[-1][0]) if len(rows) > limit else None
+        return [json.loads(data) for _, data in page], next_cursor
+
+    def list_by_user(self, user_id, limit, cursor=None):
+        return self._page(
+            "SELECT seq, data FROM orders WHERE user_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (user_id, decode_cursor(cursor)),
+            limit
+        )
+
+    def list_all(self, limit, cursor=None):
+        return self._page(
+            "SELECT seq, data FROM orders WHERE seq > ? ORDER BY seq LIMIT ?",
+            (decode_cursor(cursor),),
+            limit
+        )
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+
+def create_store(kind: str, path: str = ":memory:") -> OrderStore:
+    """Хранилище по имени: memory или sqlite"""
+    if kind == "memory":
+        return InMemoryOrderStore()
+    if kind == "sqlite":
+        return SQLiteOrderStore(path)
+    raise ValueError(f"Неизвестное хранилище заказов: {kind}")
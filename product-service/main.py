@@ -1,8 +1,21 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import List
+import base64
+import itertools
+import os
+from bisect import bisect_right
+from operator import itemgetter
 
-app = FastAPI(title="Product Service")
+import orjson
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Iterable, List, Literal, Optional
+
+from events import EventPublisher
+from tracing import SpanExporter, TracingMiddleware
+
+app = FastAPI(title="Product Service", default_response_class=ORJSONResponse)
+span_exporter = SpanExporter("product-service")
+app.add_middleware(TracingMiddleware, exporter=span_exporter)
 
 # Тестовые данные товаров
 products_db = {
@@ -32,9 +45,37 @@ products_db = {
     }
 }
 
+# Порядок выдачи для постраничных списков: пары (seq, id), seq растёт с каждым добавлением.
+# Курсор — seq последней отданной записи (как в order-service), поэтому удаление
+# товара не сдвигает следующие страницы
+_product_seq = itertools.count(1)
+product_order = [(next(_product_seq), product_id) for product_id in products_db]
+product_seq_by_id = {product_id: seq for seq, product_id in product_order}
+
+DEFAULT_PAGE_LIMIT = int(os.getenv("PRODUCTS_PAGE_LIMIT", 100))
+MAX_PAGE_LIMIT = int(os.getenv("PRODUCTS_MAX_PAGE_LIMIT", 1000))
+
+# События изменений товаров для инвалидации кэшей шлюза
+events = EventPublisher()
+
 class BatchRequest(BaseModel):
     product_ids: List[str]
 
+class ProductCreate(BaseModel):
+    id: str
+    name: str
+    description: str = ""
+    price: float = Field(ge=0)
+    category: str = ""
+    stock_quantity: int = Field(0, ge=0)
+
+class ProductUpdate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = Field(None, ge=0)
+    category: Optional[str] = None
+    stock_quantity: Optional[int] = Field(None, ge=0)
+
 @app.get("/")
 def root():
     return {
@@ -44,13 +85,15 @@ def root():
             "/health",
             "/products/{product_id}",
             "/products/batch (POST)",
-            "/products"
+            "/products?limit=&cursor=&format=json|ndjson",
+            "/products (POST)",
+            "/products/{product_id} (PATCH, DELETE)"
         ]
     }
 
 @app.get("/health")
 def health():
-    return {"status": "healthy", "service": "product-service"}
+    return {"status": "healthy", "service": "product-service", "events": events.stats(), "tracing": span_exporter.stats()}
 
 @app.get("/products/{product_id}")
 def get_product(product_id: str):
@@ -65,8 +108,77 @@ def get_products_batch(request: BatchRequest):
     for pid in request.product_ids:
         if pid in products_db:
             products.append(products_db[pid])
-    return products
+    # Горячий путь шлюза: отдаём ORJSONResponse напрямую, минуя jsonable_encoder
+    return ORJSONResponse(products)
+
+def encode_cursor(seq: int) -> str:
+    """Непрозрачный курсор: seq последней отданной записи"""
+    return base64.urlsafe_b64encode(str(seq).encode()).decode()
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        seq = int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    if seq < 0:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    return seq
+
+def ndjson(records: Iterable[dict]) -> StreamingResponse:
+    """Потоковая выдача по одной записи на строку, без сборки всего списка в памяти"""
+    lines = (orjson.dumps(record) + b"\n" for record in records)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
 @app.get("/products")
-def get_products():
-    return list(products_db.values())
+def get_products(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json"
+):
+    start = bisect_right(product_order, decode_cursor(cursor), key=itemgetter(0))
+    # Срез — снимок порядка выдачи; товар, удалённый во время выдачи, пропускается
+    if format == "ndjson":
+        records = (products_db.get(product_id) for _, product_id in product_order[start:])
+        return ndjson(record for record in records if record is not None)
+    page = product_order[start:start + limit + 1]
+    if len(page) > limit:
+        page = page[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(page[-1][0])
+    records = (products_db.get(product_id) for _, product_id in page)
+    return [record for record in records if record is not None]
+
+@app.post("/products", status_code=201)
+def create_product(request: ProductCreate):
+    if request.id in products_db:
+        raise HTTPException(status_code=409, detail="Товар уже существует")
+    product = request.model_dump()
+    products_db[product["id"]] = product
+    seq = next(_product_seq)
+    product_seq_by_id[product["id"]] = seq
+    product_order.append((seq, product["id"]))
+    events.publish("product.created", product_id=product["id"])
+    return product
+
+@app.patch("/products/{product_id}")
+def update_product(product_id: str, request: ProductUpdate):
+    product = products_db.get(product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Товар не найден")
+    # Новый словарь, а не правка на месте: параллельные чтения видят товар целиком
+    product = {**product, **request.model_dump(exclude_none=True)}
+    products_db[product_id] = product
+    events.publish("product.updated", product_id=product_id)
+    return product
+
+@app.delete("/products/{product_id}", status_code=204)
+def delete_product(product_id: str):
+    if product_id not in products_db:
+        raise HTTPException(status_code=404, detail="Товар не найден")
+    # Сначала убираем из порядка выдачи, чтобы списки не ссылались на удалённый товар
+    product_order.remove((product_seq_by_id.pop(product_id), product_id))
+    del products_db[product_id]
+    events.publish("product.deleted", product_id=product_id)
+    return Response(status_code=204)
@@ -26,24 +26,22 @@ echo ""
 
 echo "2. Получение агрегированного профиля пользователя (первый запрос)..."
 echo ""
-curl -s http://localhost:8000/api/profile/user123 | python3 -c "
+curl -s -D /tmp/profile_headers.txt http://localhost:8000/api/profile/user123 | python3 -c "
 import sys, json
 data = json.load(sys.stdin)
 print(f' Пользователь: {data[\"user\"][\"full_name\"]}')
 print(f' Заказов: {data[\"metadata\"][\"orders_count\"]} шт.')
 print(f' Товаров: {data[\"metadata\"][\"products_count\"]} шт.')
-print(f' Из кэша: {data[\"metadata\"][\"cached\"]}')
 print(f'  Агрегировано: {data[\"metadata\"][\"aggregated_at\"][11:19]}')
 "
+grep -i "^x-cache:" /tmp/profile_headers.txt | sed 's/^/ /'
 echo ""
 
 echo "3. Повторный запрос того же профиля (должен быть из кэша)..."
 echo ""
-curl -s http://localhost:8000/api/profile/user123 | python3 -c "
-import sys, json
-data = json.load(sys.stdin)
-print(f' Из кэша: {data[\"metadata\"][\"cached\"]}')
-"
+curl -s -o /dev/null -D - http://localhost:8000/api/profile/user123 | grep -i "^x-cache\|^etag" | sed 's/^/ /'
+ETAG=$(grep -i "^etag:" /tmp/profile_headers.txt | cut -d' ' -f2- | tr -d '\r')
+echo " Запрос с If-None-Match: $(curl -s -o /dev/null -w '%{http_code}' -H "If-None-Match: $ETAG" http://localhost:8000/api/profile/user123)"
 echo ""
 
 echo "4. Проверка метрик API Gateway..."
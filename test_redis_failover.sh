@@ -0,0 +1,90 @@
+#!/bin/bash
+
+# Переход шлюза на in-memory кэш по ошибкам команд Redis на пути запроса.
+# Фоновая проверка Redis на время теста отключена (интервал 60 секунд), поэтому
+# переключиться шлюз может только по REDIS_FAILURE_THRESHOLD ошибкам запросов.
+
+GATEWAY="http://localhost:8000"
+# Проба недоступного Redis стоит не больше двух попыток подключения по REDIS_CONNECT_TIMEOUT
+MAX_REQUEST_SECONDS=1.5
+status=0
+
+backend() {
+    curl -s "$GATEWAY/health" | python3 -c "
+import sys, json
+backend = json.load(sys.stdin)['cache']['backend']
+reason = (backend.get('last_switch') or {}).get('reason', '-')
+print(backend['backend'], reason, backend['consecutive_failures'], backend['pool_exhausted'])
+"
+}
+
+wait_for_gateway() {
+    for _ in {1..30}; do
+        curl -sf "$GATEWAY/health/live" > /dev/null && return 0
+        sleep 1
+    done
+    echo " Шлюз не поднялся"
+    exit 1
+}
+
+echo "========================================="
+echo "   ТЕСТ: ОТКАЗ REDIS НА ПУТИ ЗАПРОСА"
+echo "========================================="
+echo ""
+
+echo "1. Перезапуск шлюза: один воркер, фоновая проверка Redis раз в 60 секунд..."
+docker-compose start redis > /dev/null
+GATEWAY_WORKERS=1 REDIS_HEALTH_CHECK_INTERVAL=60 docker-compose up -d --force-recreate api-gateway > /dev/null
+wait_for_gateway
+for _ in {1..10}; do
+    [[ "$(backend | cut -d' ' -f1)" == "redis" ]] && break
+    sleep 1
+done
+curl -s -o /dev/null "$GATEWAY/api/profile/user123"
+echo " Бэкенд кэша: $(backend)"
+echo ""
+
+echo "2. Остановка Redis (docker-compose kill redis)..."
+docker-compose kill redis > /dev/null
+echo ""
+
+echo "3. Запросы профилей без Redis в течение 5 секунд (не дольше ${MAX_REQUEST_SECONDS} с каждый)..."
+# Между пробами Redis запросы обходятся без него, поэтому порог ошибок набирается за несколько запросов
+for i in {1..25}; do
+    user_id="user$((i % 2 == 0 ? 123 : 456))"
+    seconds=$(curl -s -o /dev/null -w '%{time_total}' "$GATEWAY/api/profile/$user_id")
+    if ! python3 -c "import sys; sys.exit(0 if $seconds <= $MAX_REQUEST_SECONDS else 1)"; then
+        echo " $user_id: ${seconds} с — дольше ${MAX_REQUEST_SECONDS} с"
+        status=1
+    fi
+    [[ "$(backend | cut -d' ' -f1)" == "memory" ]] && break
+    sleep 0.2
+done
+echo " Отправлено запросов: $i"
+echo ""
+
+echo "4. Проверка переключения..."
+read -r current reason failures exhausted <<< "$(backend)"
+echo " Бэкенд: $current, причина: $reason, ошибок подряд: $failures, нехватка соединений: $exhausted"
+if [[ "$current" == "memory" && "$reason" == "request_errors" ]]; then
+    echo " Шлюз перешёл на in-memory кэш по ошибкам запросов"
+else
+    echo " Шлюз не перешёл на in-memory кэш по ошибкам запросов"
+    status=1
+fi
+echo ""
+
+echo "5. Восстановление Redis и шлюза с обычными настройками..."
+docker-compose start redis > /dev/null
+docker-compose up -d --force-recreate api-gateway > /dev/null
+wait_for_gateway
+echo ""
+
+echo "========================================="
+if [[ $status -eq 0 ]]; then
+    echo "   ТЕСТ ПРОЙДЕН"
+else
+    echo "   ТЕСТ НЕ ПРОЙДЕН"
+fi
+echo "========================================="
+exit $status
@@ -1,6 +1,18 @@
-from fastapi import FastAPI
+import base64
+import os
+from bisect import bisect_right
 
-app = FastAPI(title="User Service")
+import orjson
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel
+from typing import Iterable, List, Literal, Optional
+
+from tracing import SpanExporter, TracingMiddleware
+
+app = FastAPI(title="User Service", default_response_class=ORJSONResponse)
+span_exporter = SpanExporter("user-service")
+app.add_middleware(TracingMiddleware, exporter=span_exporter)
 
 # Тестовые данные пользователей
 users_db = {
@@ -22,17 +34,28 @@ users_db = {
     }
 }
 
+# Порядок выдачи для постраничных списков: user_seqs[i] — seq записи user_ids[i],
+# seq растёт с каждым добавлением. Курсор — seq последней отданной записи (как в order-service)
+user_ids = list(users_db)
+user_seqs = list(range(1, len(user_ids) + 1))
+
+DEFAULT_PAGE_LIMIT = int(os.getenv("USERS_PAGE_LIMIT", 100))
+MAX_PAGE_LIMIT = int(os.getenv("USERS_MAX_PAGE_LIMIT", 1000))
+
+class BatchRequest(BaseModel):
+    user_ids: List[str]
+
 @app.get("/")
 def root():
     return {
         "service": "user-service",
         "description": "Сервис управления пользователями",
-        "endpoints": ["/health", "/users/{user_id}", "/users"]
+        "endpoints": ["/health", "/users/{user_id}", "/users/batch (POST)", "/users?limit=&cursor=&format=json|ndjson"]
     }
 
 @app.get("/health")
 def health():
-    return {"status": "healthy", "service": "user-service"}
+    return {"status": "healthy", "service": "user-service", "tracing": span_exporter.stats()}
 
 @app.get("/users/{user_id}")
 def get_user(user_id: str):
@@ -41,6 +64,46 @@ def get_user(user_id: str):
         return {"error": "Пользователь не найден"}
     return user
 
+@app.post("/users/batch")
+def get_users_batch(request: BatchRequest):
+    users = []
+    for uid in request.user_ids:
+        if uid in users_db:
+            users.append(users_db[uid])
+    # Горячий путь шлюза: отдаём ORJSONResponse напрямую, минуя jsonable_encoder
+    return ORJSONResponse(users)
+
+def encode_cursor(seq: int) -> str:
+    """Непрозрачный курсор: seq последней отданной записи"""
+    return base64.urlsafe_b64encode(str(seq).encode()).decode()
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        seq = int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    if seq < 0:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    return seq
+
+def ndjson(records: Iterable[dict]) -> StreamingResponse:
+    """Потоковая выдача по одной записи на строку, без сборки всего списка в памяти"""
+    lines = (orjson.dumps(record) + b"\n" for record in records)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
 @app.get("/users")
-def get_users():
-    return list(users_db.values())
+def get_users(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json"
+):
+    start = bisect_right(user_seqs, decode_cursor(cursor))
+    if format == "ndjson":
+        return ndjson(users_db[user_id] for user_id in user_ids[start:])
+    end = start + limit
+    if end < len(user_ids):
+        response.headers["X-Next-Cursor"] = encode_cursor(user_seqs[end - 1])
+    return [users_db[user_id] for user_id in user_ids[start:end]]
@@ -0,0 +1,158 @@
+import os
+import random
+import threading
+import time
+import urllib.request
+from collections import deque
+from typing import Optional, Tuple
+
+import orjson
+
+# Трассировка: серверный span каждого запроса продолжает трассу шлюза из заголовка traceparent.
+# Span выгружается, если шлюз отобрал трассу (флаг sampled) или запрос медленный/с ошибкой
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+TRACING_SLOW_MS = float(os.getenv("TRACING_SLOW_MS", 200.0))
+TRACING_EXPORT_PATH = os.getenv("TRACING_EXPORT_PATH", "")
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "")
+TRACING_EXPORT_INTERVAL = float(os.getenv("TRACING_EXPORT_INTERVAL", 1.0))
+TRACING_EXPORT_QUEUE = int(os.getenv("TRACING_EXPORT_QUEUE", 2000))
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, parent_id, sampled) из заголовка traceparent; None, если он некорректен"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or parts[0] != "00":
+        return None
+    _, trace_id, parent_id, flags = parts
+    if len(trace_id) != 32 or len(parent_id) != 16 or len(flags) != 2:
+        return None
+    try:
+        int(trace_id, 16), int(parent_id, 16)
+        sampled = bool(int(flags, 16) & 1)
+    except ValueError:
+        return None
+    return trace_id.lower(), parent_id.lower(), sampled
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+class SpanExporter:
+    """Фоновая выгрузка спанов строками OTLP/JSON в файл и/или на OTLP/HTTP
+
+    Запрос только кладёт span в ограниченную очередь; запись идёт в отдельном
+    потоке раз в TRACING_EXPORT_INTERVAL секунд. При переполнении span теряется.
+    """
+
+    def __init__(self, service_name: str):
+        self.service_name = service_name
+        self.enabled = TRACING_ENABLED and bool(TRACING_EXPORT_PATH or TRACING_OTLP_ENDPOINT)
+        self.exported = 0
+        self.dropped = 0
+        self._queue = deque()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, span: dict):
+        if len(self._queue) >= TRACING_EXPORT_QUEUE:
+            self.dropped += 1
+            return
+        self._queue.append(span)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(TRACING_EXPORT_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        if not self._queue:
+            return
+        spans = [self._queue.popleft() for _ in range(len(self._queue))]
+        payload = orjson.dumps({"resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", self.service_name),
+                                        _attribute("process.pid", os.getpid())]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+        }]})
+        try:
+            if TRACING_EXPORT_PATH:
+                with open(TRACING_EXPORT_PATH, "ab") as f:
+                    f.write(payload + b"\n")
+            if TRACING_OTLP_ENDPOINT:
+                request = urllib.request.Request(
+                    TRACING_OTLP_ENDPOINT, data=payload, headers={"Content-Type": "application/json"}
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+        except Exception as e:
+            self.dropped += len(spans)
+            print(f"  Не удалось выгрузить спаны: {e}")
+            return
+        self.exported += len(spans)
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "queued": len(self._queue), "exported": self.exported, "dropped": self.dropped}
+
+
+class TracingMiddleware:
+    """ASGI middleware: серверный span запроса в трассе вызывающего (W3C traceparent)"""
+
+    def __init__(self, app, exporter: SpanExporter):
+        self.app = app
+        self.exporter = exporter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.exporter.enabled:
+            await self.app(scope, receive, send)
+            return
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        parsed = parse_traceparent(traceparent)
+        if parsed is None:
+            # Запрос не из шлюза (или без трассы): спаны без родителя не пишем
+            await self.app(scope, receive, send)
+            return
+
+        trace_id, parent_id, sampled = parsed
+        start_ns = time.time_ns()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            end_ns = time.time_ns()
+            if sampled or status_code >= 500 or end_ns - start_ns >= TRACING_SLOW_MS * 1_000_000:
+                route = scope.get("route")
+                self.exporter.add({
+                    "traceId": trace_id,
+                    "spanId": f"{random.getrandbits(64):016x}",
+                    "parentSpanId": parent_id,
+                    "name": f"{scope['method']} {route.path if route is not None else scope['path']}",
+                    "kind": 2,
+                    "startTimeUnixNano": str(start_ns),
+                    "endTimeUnixNano": str(end_ns),
+                    "attributes": [
+                        _attribute("http.method", scope["method"]),
+                        _attribute("http.target", scope["path"]),
+                        _attribute("http.status_code", status_code),
+                    ],
+                    "status": {"code": 2 if status_code >= 500 else 0},
+                })